@@ -8,16 +8,22 @@ from PySide6.QtWidgets import (QMainWindow, QWidget, QHBoxLayout, QVBoxLayout,
                                   QLineEdit, QLabel, QFileDialog, QProgressBar,
                                   QInputDialog) # <--- Certifique-se que QInputDialog está aqui
 from PySide6.QtCore import Qt, QSettings
-from PySide6.QtGui import QPainter, QImage, QPageLayout
-from PySide6.QtPrintSupport import QPrinter, QPrintDialog
+from PySide6.QtGui import QPageLayout, QPixmap
+from PySide6.QtPrintSupport import QPrinter, QPrintDialog, QAbstractPrintDialog
 from ui.preview_panel import PreviewPanel
 from ui.controls_panel import ControlsPanel
 from ui.log_panel import LogPanel
 from ui.table_panel import TablePanel
-from core.renderer_v3 import NativeRenderer
 from ui.editor.editor_window import EditorWindow
-from core.worker import RenderManager
+from core.worker import RenderManager, DEFAULT_RETRIES
+from core.print_spooler import PrintSpooler, print_files_of, image_size
+from core.render_pool import RenderPool
+from core.sheet_assembler import SheetAssembler
+from core.manifest import load_manifest
+from core.journal import read_journal
 from core.template_v2 import slugify_model_name
+from core.template_v4 import load_template, read_template_file, save_template
+from core.assets import link_or_copy, collect_garbage
 from ui.naming_dialog import NamingDialog
 
 class MainWindow(QMainWindow):
@@ -36,7 +42,12 @@ class MainWindow(QMainWindow):
         root.addWidget(splitter)
 
         self.current_filename_suffix = "" 
+        self.current_output_layout = "" # Subpastas do modo direto (core/naming.OutputLayout)
+        self.current_output_archive = None # Saída em ZIP/TAR (core/archive_sink.py) ou None
+        self._pool = None # RenderPool da sessão (criado no primeiro uso)
+        self._preview_request = 0 # Só o preview mais recente é mostrado
         self.manager = None 
+        self._print_spoolers = [] # PrintSpooler em andamento (a thread não pode ser coletada imprimindo)
 
         # --- Painel ESQUERDO ---
         left = QWidget()
@@ -105,6 +116,30 @@ class MainWindow(QMainWindow):
         self.btn_generate_cards.clicked.connect(self._generate_cards_async)
         left_stack.addWidget(self.btn_generate_cards, 0)
 
+        self.btn_rerun_failed = QPushButton("Reprocessar falhas")
+        self.btn_rerun_failed.setToolTip("Gera de novo só as linhas que falharam no último lote (ver falhas.json)")
+        self.btn_rerun_failed.clicked.connect(self._rerun_failed_rows)
+        self.btn_rerun_failed.setVisible(False)
+        left_stack.addWidget(self.btn_rerun_failed, 0)
+
+        self.btn_patch_batch = QPushButton("Regenerar alterações")
+        self.btn_patch_batch.setToolTip("Refaz num lote já gerado só os cartões/folhas cujas linhas mudaram na tabela")
+        self.btn_patch_batch.clicked.connect(self._regenerate_changes)
+
+        self.btn_resume_batch = QPushButton("Retomar lote...")
+        self.btn_resume_batch.setToolTip("Continua um lote interrompido (journal.jsonl) sem refazer o que já foi gerado")
+        self.btn_resume_batch.clicked.connect(lambda: self.resume_batch())
+
+        self.btn_print_batch = QPushButton("Imprimir lote...")
+        self.btn_print_batch.setToolTip("Imprime todas as folhas (ou um intervalo) de um lote já gerado")
+        self.btn_print_batch.clicked.connect(lambda: self.print_batch())
+
+        ly_batch = QHBoxLayout()
+        ly_batch.addWidget(self.btn_patch_batch)
+        ly_batch.addWidget(self.btn_resume_batch)
+        ly_batch.addWidget(self.btn_print_batch)
+        left_stack.addLayout(ly_batch, 0)
+
         # --- Painel DIREITO ---
         self.table_panel = TablePanel()
         splitter.addWidget(self.table_panel)
@@ -170,13 +205,11 @@ class MainWindow(QMainWindow):
             # 4. Atualiza o JSON interno (senão o nome antigo continua aparecendo na lista)
             json_path = new_dir / "template_v3.json"
             if json_path.exists():
-                with open(json_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
+                data = read_template_file(json_path)
                 
                 data["name"] = new_name
                 
-                with open(json_path, "w", encoding="utf-8") as f:
-                    json.dump(data, f, indent=4, ensure_ascii=False)
+                save_template(json_path, data)
             
             self.log_panel.append(f"Modelo renomeado: '{old_name}' -> '{new_name}'")
             
@@ -214,15 +247,14 @@ class MainWindow(QMainWindow):
             counter += 1
 
         try:
-            shutil.copytree(original_dir, new_dir)
+            # Hardlinks: assets locais não são copiados byte a byte (os do store nem estão na pasta)
+            shutil.copytree(original_dir, new_dir, copy_function=link_or_copy)
             
             json_path = new_dir / "template_v3.json"
             if json_path.exists():
-                with open(json_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
+                data = read_template_file(json_path)
                 data["name"] = new_name
-                with open(json_path, "w", encoding="utf-8") as f:
-                    json.dump(data, f, indent=4, ensure_ascii=False)
+                save_template(json_path, data)
 
             self.log_panel.append(f"Modelo duplicado: '{new_name}'")
             self._reload_models_from_disk(select_name=new_name)
@@ -260,31 +292,37 @@ class MainWindow(QMainWindow):
         # 3. Abre Dialog
         dlg = NamingDialog(self, slug, vars_available, self.current_filename_suffix, 
                            model_size_px=model_size, 
-                           current_imposition=current_imposition)
+                           current_imposition=current_imposition,
+                           current_layout=self.current_output_layout,
+                           current_archive=self.current_output_archive)
         
         if dlg.exec():
             new_suffix = dlg.get_pattern()
             new_imposition = dlg.get_imposition_settings() # Pega novos settings
             
             self.current_filename_suffix = new_suffix
+            self.current_output_layout = dlg.get_layout()
+            self.current_output_archive = dlg.get_archive()
             
             # 4. Salvar tudo no JSON do modelo
             json_path = Path("models") / slug / "template_v3.json"
             if json_path.exists():
                 try:
-                    with open(json_path, "r", encoding="utf-8") as f:
-                        data = json.load(f)
+                    data = read_template_file(json_path)
                     
                     data["output_suffix"] = new_suffix
+                    data["output_layout"] = self.current_output_layout
+                    data["output_archive"] = self.current_output_archive
                     data["imposition_settings"] = new_imposition # Salva a nova seção
                     
                     # Atualiza o cache em memória também
                     if self.cached_model_data:
                         self.cached_model_data["output_suffix"] = new_suffix
+                        self.cached_model_data["output_layout"] = self.current_output_layout
+                        self.cached_model_data["output_archive"] = self.current_output_archive
                         self.cached_model_data["imposition_settings"] = new_imposition
 
-                    with open(json_path, "w", encoding="utf-8") as f:
-                        json.dump(data, f, indent=4, ensure_ascii=False)
+                    save_template(json_path, data)
                 except Exception as e:
                     print(f"Erro ao salvar config: {e}")
 
@@ -314,17 +352,6 @@ class MainWindow(QMainWindow):
             self.log_panel.append(f"ERRO: Modelo '{self.active_model_name}' não encontrado.")
             return
 
-        with open(template_path, "r", encoding="utf-8") as f:
-            tpl_data = json.load(f)
-            model_dir = template_path.parent
-            if tpl_data.get("background_path") and not Path(tpl_data["background_path"]).is_absolute():
-                tpl_data["background_path"] = str(model_dir / tpl_data["background_path"])
-            for sig in tpl_data.get("signatures", []):
-                if not Path(sig["path"]).is_absolute():
-                    sig["path"] = str(model_dir / sig["path"])
-
-        renderer = NativeRenderer(tpl_data)
-
         custom_path = self.txt_output_path.text().strip()
         if custom_path:
             base_dir = Path(custom_path)
@@ -341,11 +368,6 @@ class MainWindow(QMainWindow):
         
         self.log_panel.append(f"📂 Salvando em: {folder_name}")
 
-        self.btn_generate_cards.setEnabled(False)
-        self.btn_generate_cards.setText("Gerando... (Aguarde)")
-        self.progress_bar.setValue(0)
-        self.log_panel.append(f"--- Iniciando lote de {len(rows_plain)} cartões ---")
-
         if self.current_filename_suffix:
             full_pattern = f"{slug}_{self.current_filename_suffix}"
         else:
@@ -354,26 +376,157 @@ class MainWindow(QMainWindow):
         # Recupera config de imposição (se existir)
         imposition_cfg = self.cached_model_data.get("imposition_settings", None)
 
+        self._last_batch = {"template_path": template_path, "output_dir": output_dir,
+                            "pattern": full_pattern, "imposition": imposition_cfg,
+                            "archive": self.current_output_archive}
+        self._start_batch(template_path, rows_plain, rows_rich, output_dir, full_pattern, imposition_cfg,
+                          layout=self.current_output_layout, archive=self.current_output_archive)
+
+    def _rerun_failed_rows(self):
+        """Reprocessa só as linhas do falhas.json do último lote, na mesma pasta."""
+        batch = getattr(self, "_last_batch", None)
+        failures = getattr(self.manager, "failures", [])
+        if not batch or not failures:
+            return
+
+        # Lê a tabela de novo: as linhas podem ter sido corrigidas depois do lote
+        rows_plain, rows_rich = self._scrape_table_data()
+        by_row = {rec["row"] - 1: rec["card"] for rec in failures}
+        indices = [i for i in sorted(by_row) if i < len(rows_plain)]
+        if len(indices) < len(by_row):
+            self.log_panel.append("⚠️ Algumas linhas que falharam não existem mais na tabela e foram ignoradas.")
+        if not indices:
+            return
+
+        imposition_cfg = batch["imposition"]
+        pattern = batch["pattern"]
+        archive = batch.get("archive")
+        if imposition_cfg and imposition_cfg.get("enabled"):
+            # Folhas novas não podem sobrescrever as folhas boas do lote
+            pattern = f"{pattern}_reprocesso"
+        self.log_panel.append(f"🔁 Reprocessando {len(indices)} linha(s) que falharam...")
+        self._start_batch(batch["template_path"], [rows_plain[i] for i in indices], [rows_rich[i] for i in indices],
+                          batch["output_dir"], pattern, imposition_cfg,
+                          row_numbers=indices, card_names=[by_row[i] for i in indices], archive=archive)
+
+    def _regenerate_changes(self):
+        """Atualiza um lote existente (o último, ou um escolhido) pelo manifest.json."""
+        batch = getattr(self, "_last_batch", None)
+        output_dir = batch["output_dir"] if batch else None
+        if output_dir is None or load_manifest(output_dir) is None:
+            start_dir = self.txt_output_path.text() or "output"
+            folder = QFileDialog.getExistingDirectory(self, "Selecionar pasta do lote (Lote_*)", start_dir)
+            if not folder:
+                return
+            output_dir = Path(folder)
+
+        manifest = load_manifest(output_dir)
+        if manifest is None:
+            self.log_panel.append(f"ERRO: {output_dir.name} não tem manifesto; gere um lote novo.")
+            return
+        if manifest.get("archive"):
+            self.log_panel.append(f"ERRO: {output_dir.name} foi gravado em pacote (ZIP/TAR); gere um lote novo.")
+            return
+        template_path = Path(manifest["template_path"]) if manifest.get("template_path") else None
+        if template_path is None or not template_path.exists():
+            self.log_panel.append("ERRO: O modelo usado neste lote não foi encontrado.")
+            return
+
+        rows_plain, rows_rich = self._scrape_table_data()
+        if not rows_plain:
+            self.log_panel.append("AVISO: A tabela está vazia. Nada a gerar.")
+            return
+
+        imposition_cfg = manifest.get("imposition_settings") or {"enabled": False}
+        self._last_batch = {"template_path": template_path, "output_dir": output_dir,
+                            "pattern": manifest["pattern"], "imposition": imposition_cfg}
+        self.log_panel.append(f"🩹 Atualizando lote: {output_dir.name}")
+        self._start_batch(template_path, rows_plain, rows_rich, output_dir, manifest["pattern"], imposition_cfg,
+                          patch=True, layout=manifest.get("layout", ""))
+
+    def resume_batch(self, output_dir=None):
+        """Retoma um lote interrompido pelo journal.jsonl (também usado por main.py --resume)."""
+        if output_dir is None:
+            start_dir = self.txt_output_path.text() or "output"
+            folder = QFileDialog.getExistingDirectory(self, "Selecionar pasta do lote (Lote_*)", start_dir)
+            if not folder:
+                return
+            output_dir = folder
+        output_dir = Path(output_dir)
+
+        plan, done, finished = read_journal(output_dir)
+        if plan is None:
+            self.log_panel.append(f"ERRO: {output_dir.name} não tem diário de lote para retomar.")
+            return
+        if finished:
+            self.log_panel.append(f"Lote {output_dir.name} já foi concluído.")
+            return
+        template_path = Path(plan["template_path"]) if plan.get("template_path") else None
+        if template_path is None or not template_path.exists():
+            self.log_panel.append("ERRO: O modelo usado neste lote não foi encontrado.")
+            return
+
+        self._last_batch = {"template_path": template_path, "output_dir": output_dir,
+                            "pattern": plan["pattern"], "imposition": plan["imposition_settings"],
+                            "archive": plan.get("archive")}
+        self.log_panel.append(f"⏯️ Retomando lote: {output_dir.name} ({len(done)} arquivos já prontos)")
+        self._start_batch(template_path, plan["rows_plain"], plan["rows_rich"], output_dir, plan["pattern"],
+                          plan["imposition_settings"], row_numbers=plan["row_numbers"],
+                          card_names=plan["card_names"], patch=plan["patch"], resume_done=done,
+                          layout=plan.get("layout", ""), archive=plan.get("archive"))
+
+    def _start_batch(self, template_path, rows_plain, rows_rich, output_dir, pattern, imposition_cfg, **kwargs):
+        # Renderer quente do pool; ele é remontado se o modelo ou um asset mudou
+        # no disco (um asset corrigido entra no reprocessamento)
+        pool = self._render_pool()
+        renderer = pool.renderer_for(template_path)
+        tpl_data = renderer.tpl
+
+        self.btn_generate_cards.setEnabled(False)
+        self.btn_generate_cards.setText("Gerando... (Aguarde)")
+        self.btn_patch_batch.setEnabled(False)
+        self.btn_resume_batch.setEnabled(False)
+        self.btn_rerun_failed.setVisible(False)
+        self.progress_bar.setValue(0)
+        self.log_panel.append(f"--- Iniciando lote de {len(rows_plain)} cartões ---")
+        spooler = self._prepare_print_spooler(imposition_cfg, tpl_data, kwargs.get("archive"))
+
         self.manager = RenderManager(
             renderer, 
             rows_plain, 
             rows_rich, 
             output_dir, 
-            full_pattern,
-            imposition_settings=imposition_cfg
+            pattern,
+            imposition_settings=imposition_cfg,
+            retries=int(self.settings.value("render_retries", DEFAULT_RETRIES)),
+            template_path=template_path,
+            spooler=spooler,
+            pool=pool,
+            **kwargs
         )
         
         self.manager.progress_updated.connect(self.progress_bar.setValue)
         self.manager.log_updated.connect(self.log_panel.append)
         self.manager.error_occurred.connect(lambda msg: self.log_panel.append(f"[ERRO] {msg}"))
+        self.manager.stats_updated.connect(self._on_render_stats)
         self.manager.finished_process.connect(self._on_generation_finished)
-        self.manager.finished_process.connect(self._handle_printing_queue)
         
         self.manager.start()
 
+    def _on_render_stats(self, stats: dict):
+        """Mostra os tempos por etapa (p50/p95 em ms) no tooltip da barra de progresso."""
+        lines = [f"{name}: p50 {s['p50'] * 1000:.1f} ms | p95 {s['p95'] * 1000:.1f} ms | n={s['count']}"
+                 for name, s in stats.items()]
+        self.progress_bar.setToolTip("\n".join(lines))
+
     def _on_generation_finished(self):
         self.btn_generate_cards.setEnabled(True)
         self.btn_generate_cards.setText("Gerar cartões")
+        self.btn_patch_batch.setEnabled(True)
+        self.btn_resume_batch.setEnabled(True)
+        failed = len(self.manager.failures)
+        self.btn_rerun_failed.setText(f"Reprocessar falhas ({failed})")
+        self.btn_rerun_failed.setVisible(failed > 0)
         self.log_panel.append("=== Processo Multi-Thread Finalizado ===")
 
     def _on_model_changed(self, name: str):
@@ -381,6 +534,8 @@ class MainWindow(QMainWindow):
         self.log_panel.append(f"Modelo ativo: {name}")
         self.active_model_name = name
         self.current_filename_suffix = ""
+        self.current_output_layout = ""
+        self.current_output_archive = None
 
         if not name: return
 
@@ -389,36 +544,22 @@ class MainWindow(QMainWindow):
 
         if json_path.exists():
             try:
-                with open(json_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    
-                    # [NOVO] Recupera o padrão de nome salvo
-                    self.current_filename_suffix = data.get("output_suffix", "")
-                    if self.current_filename_suffix:
-                         # Feedback visual discreto no log opcional
-                         pass 
-                    
-                    model_dir = json_path.parent
-                    if data.get("background_path") and not Path(data["background_path"]).is_absolute():
-                        data["background_path"] = str(model_dir / data["background_path"])
-                    for sig in data.get("signatures", []):
-                        if not Path(sig["path"]).is_absolute():
-                            sig["path"] = str(model_dir / sig["path"])
-
-                    placeholders = data.get("placeholders", [])
-                    
-                    self._update_table_columns(placeholders)
-                    self.log_panel.append(f"Colunas carregadas: {placeholders}")
-                    
-                    self.cached_model_data = data
-                    
-                    try:
-                        renderer = NativeRenderer(data)
-                        preview_pix = renderer.render_to_pixmap(row_rich=None)
-                        self.preview_panel.set_preview_pixmap(preview_pix)
-                    except Exception as e:
-                        self.log_panel.append(f"Erro ao gerar preview: {e}")
-                        self.preview_panel.set_preview_text("Erro ao gerar preview do modelo")
+                # [v4] Loader único: aceita v3/v4, expande HTML e resolve caminhos
+                data = load_template(json_path)
+                # [NOVO] Recupera o padrão de nome salvo
+                self.current_filename_suffix = data.get("output_suffix", "")
+                self.current_output_layout = data.get("output_layout", "")
+                self.current_output_archive = data.get("output_archive")
+
+                placeholders = data.get("placeholders", [])
+                
+                self._update_table_columns(placeholders)
+                self.log_panel.append(f"Colunas carregadas: {placeholders}")
+                
+                self.cached_model_data = data
+                
+                # Renderiza no pool (e já deixa o modelo quente para o lote)
+                self._request_preview(json_path, row_rich=None)
             except Exception as e:
                 self.log_panel.append(f"Erro ao ler colunas do modelo: {e}")
         else:
@@ -513,6 +654,11 @@ class MainWindow(QMainWindow):
         self.editor_window.modelSaved.connect(self._on_editor_saved)
         self.editor_window.show()
 
+    def _wait_for_editor_saves(self):
+        """Espera os salvamentos de todos os editores abertos (cada clique cria um)."""
+        for editor in self.findChildren(EditorWindow):
+            editor.wait_for_save()
+
     def _on_remove_model(self):
         import shutil
         model_name = (self.preview_panel.cbo_models.currentText() or "").strip()
@@ -526,6 +672,10 @@ class MainWindow(QMainWindow):
         resp = QMessageBox.question(self, "Confirmar exclusão", f"Excluir '{model_name}'?", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if resp != QMessageBox.StandardButton.Yes: return
 
+        # Um salvamento em andamento recriaria a pasta (ou gravaria no store
+        # durante a limpeza abaixo)
+        self._wait_for_editor_saves()
+
         try:
             shutil.rmtree(model_dir)
         except Exception as e:
@@ -533,6 +683,12 @@ class MainWindow(QMainWindow):
             return
 
         self.log_panel.append(f"Modelo excluído: {model_name}")
+
+        # Libera do store os assets que só este modelo usava
+        try:
+            collect_garbage(Path("models"))
+        except Exception as e:
+            self.log_panel.append(f"Aviso: falha ao limpar assets não usados: {e}")
         self._reload_models_from_disk()
 
     def _get_row_data_rich(self, row_idx):
@@ -556,13 +712,31 @@ class MainWindow(QMainWindow):
         row = self.table_panel.table.currentRow()
         if row < 0: return
 
-        try:
-            row_rich = self._get_row_data_rich(row)
-            renderer = NativeRenderer(self.cached_model_data)
-            pix = renderer.render_to_pixmap(row_rich=row_rich)
-            self.preview_panel.set_preview_pixmap(pix)
-        except Exception as e:
-            print(f"Erro no Live Preview: {e}")
+        name = self.preview_panel.cbo_models.currentText()
+        if not name: return
+        json_path = Path("models") / slugify_model_name(name) / "template_v3.json"
+        self._request_preview(json_path, row_rich=self._get_row_data_rich(row))
+
+    # --- Pool de render (preview e lotes) ---
+    def _render_pool(self):
+        if self._pool is None:
+            self._pool = RenderPool.instance()
+            self._pool.preview_ready.connect(self._on_preview_ready)
+            self._pool.preview_failed.connect(self._on_preview_failed)
+        return self._pool
+
+    def _request_preview(self, json_path, row_rich=None):
+        """Preview fora da thread da interface, na pista prioritária do pool."""
+        self._preview_request = self._render_pool().request_preview(json_path, row_rich)
+
+    def _on_preview_ready(self, request_id, image):
+        if request_id == self._preview_request:
+            self.preview_panel.set_preview_pixmap(QPixmap.fromImage(image))
+
+    def _on_preview_failed(self, request_id, error):
+        if request_id == self._preview_request:
+            self.log_panel.append(f"Erro ao gerar preview: {error}")
+            self.preview_panel.set_preview_text("Erro ao gerar preview do modelo")
     
     def _scrape_table_data(self):
         table = self.table_panel.table
@@ -597,86 +771,123 @@ class MainWindow(QMainWindow):
             self.txt_output_path.setText(folder)
             self.settings.setValue("last_output_dir", folder)
 
-    def _handle_printing_queue(self):
+    def _prepare_print_spooler(self, imposition_cfg, tpl_data, archive=None):
         """
-        Chamado quando o processo termina. 
-        Verifica se o usuário pediu para imprimir e abre o diálogo.
+        Chamado antes do lote: se o usuário pediu para imprimir, abre o
+        diálogo agora e devolve um PrintSpooler, que imprime as folhas
+        enquanto o lote ainda está sendo gerado (core/print_spooler.py).
         """
         # 1. Verifica se a opção de imprimir estava marcada no JSON/Config
-        if not self.cached_model_data: return
-        
-        imp_settings = self.cached_model_data.get("imposition_settings", {})
-        should_print = imp_settings.get("print_after_generation", False)
-        
-        if not should_print:
-            return
+        if not imposition_cfg or not imposition_cfg.get("print_after_generation", False):
+            return None
 
-        # 2. Verifica se existem arquivos para imprimir
-        files_to_print = getattr(self.manager, "generated_files", [])
-        if not files_to_print:
-            self.log_panel.append("⚠️ Nenhum arquivo gerado para impressão.")
-            return
+        if archive:
+            self.log_panel.append("⚠️ Impressão automática não disponível com saída em pacote (ZIP/TAR).")
+            return None
 
-        # 3. Configura a Impressora (Diálogo do Sistema)
+        # 2. Orientação pela folha (imposição) ou pelo cartão, sem esperar o primeiro arquivo
+        if imposition_cfg.get("enabled"):
+            asm = SheetAssembler(imposition_cfg.get("target_w_mm", 100), imposition_cfg.get("target_h_mm", 150))
+            width, height = asm.sheet_w, asm.sheet_h
+        else:
+            canvas = tpl_data.get("canvas_size", {})
+            width, height = canvas.get("w", 0), canvas.get("h", 0)
+
+        printer = self._ask_printer(width, height)
+        if printer is None:
+            return None
+
+        self.log_panel.append("🖨️ As folhas serão enviadas para a impressora conforme ficarem prontas.")
+        return self._new_print_spooler(printer)
+
+    def _new_print_spooler(self, printer):
+        """PrintSpooler guardado pela janela até a thread terminar (o lote/gerente pode ser trocado antes)."""
+        spooler = PrintSpooler(printer)
+        spooler.log_updated.connect(self.log_panel.append)
+        spooler.finished.connect(lambda: self._forget_print_spooler(spooler))
+        self._print_spoolers.append(spooler)
+        return spooler
+
+    def _forget_print_spooler(self, spooler):
+        if spooler in self._print_spoolers:
+            self._print_spoolers.remove(spooler)
+        spooler.deleteLater()
+
+    def stop_batch(self):
+        """
+        Interrompe o lote em andamento e espera os workers saírem e o
+        pacote/diário/manifesto serem fechados (fechar a janela, sair do app).
+        """
+        if self.manager is not None:
+            self.manager.stop()
+            self.manager.wait()
+
+    def closeEvent(self, event):
+        # O lote em andamento para antes: senão continuaria alimentando o spooler
+        # (e o stop() cancela o spooler do próprio lote)
+        self.stop_batch()
+        # Termina de enviar as folhas já prontas (as que faltam são puladas)
+        for spooler in list(self._print_spoolers):
+            spooler.finish_input()
+            spooler.wait()
+        super().closeEvent(event)
+
+    def _ask_printer(self, width, height, page_count=None):
+        """
+        Configura a impressora (diálogo do sistema). Com page_count, o diálogo
+        permite escolher um intervalo de páginas (printer.fromPage/toPage).
+        """
+        # A resolução é trocada para o DPI da folha pelo PrintSpooler (impressão 1:1)
         printer = QPrinter(QPrinter.PrinterMode.HighResolution)
-        
-        # [CORREÇÃO] Auto-detectar orientação baseada na primeira folha gerada
-        if files_to_print:
-            first_img_path = self.manager.output_dir / files_to_print[0]
-            if first_img_path.exists():
-                img_check = QImage(str(first_img_path))
-                if not img_check.isNull():
-                    if img_check.width() > img_check.height():
-                        printer.setPageOrientation(QPageLayout.Orientation.Landscape)
-                    else:
-                        printer.setPageOrientation(QPageLayout.Orientation.Portrait)
+        if width > height:
+            printer.setPageOrientation(QPageLayout.Orientation.Landscape)
+        else:
+            printer.setPageOrientation(QPageLayout.Orientation.Portrait)
 
         # [CRÍTICO] Força o modo "Full Page" para permitir impressão 1:1 (Sem Escala)
         # Isso diz ao Qt para considerar as coordenadas do papel inteiro, inclusive as bordas não imprimíveis.
         printer.setFullPage(True)
 
         dialog = QPrintDialog(printer, self)
-        
+        if page_count:
+            dialog.setMinMax(1, page_count)
+            dialog.setOption(QAbstractPrintDialog.PrintDialogOption.PrintPageRange, True)
+
         if dialog.exec() != QPrintDialog.DialogCode.Accepted:
             self.log_panel.append("🖨️ Impressão cancelada pelo usuário.")
+            return None
+        return printer
+
+    def print_batch(self, output_dir=None):
+        """Imprime (um intervalo de páginas de) um lote já gerado."""
+        if output_dir is None:
+            start_dir = self.txt_output_path.text() or "output"
+            folder = QFileDialog.getExistingDirectory(self, "Selecionar pasta do lote (Lote_*)", start_dir)
+            if not folder:
+                return
+            output_dir = folder
+        output_dir = Path(output_dir)
+
+        files = [name for name in print_files_of(output_dir) if (output_dir / name).is_file()]
+        if not files:
+            self.log_panel.append(f"⚠️ {output_dir.name} não tem arquivos para imprimir.")
             return
 
-        # 4. Loop de Impressão (Stream do Disco para o Spooler)
-        self.log_panel.append(f"🖨️ Enviando {len(files_to_print)} páginas para a impressora...")
-        
-        painter = QPainter()
-        if not painter.begin(printer):
-            self.log_panel.append("❌ Erro ao iniciar comunicação com a impressora.")
+        # Orientação pelo cabeçalho do primeiro PNG (sem decodificar a imagem)
+        size = image_size(output_dir / files[0])
+        printer = self._ask_printer(size.width(), size.height(), page_count=len(files))
+        if printer is None:
             return
 
-        try:
-            output_dir = self.manager.output_dir
-            
-            for i, filename in enumerate(files_to_print):
-                # Se não for a primeira página, ejeta a folha anterior
-                if i > 0:
-                    printer.newPage()
-                
-                # Carrega do disco
-                full_path = output_dir / filename
-                if not full_path.exists():
-                    self.log_panel.append(f"❌ Arquivo não encontrado: {filename}")
-                    continue
-                
-                img = QImage(str(full_path))
-                if img.isNull():
-                    self.log_panel.append(f"❌ Falha ao ler imagem: {filename}")
-                    continue
-
-                # [CORREÇÃO ESCALA] Desenha usando o paperRect (Papel Físico) e não pageRect (Área Imprimível).
-                # Isso garante que 1mm na imagem seja 1mm no papel, cortando as margens físicas se necessário,
-                # mas sem distorcer ou encolher o conteúdo central.
-                paper_rect = printer.paperRect(QPrinter.Unit.DevicePixel)
-                painter.drawImage(paper_rect, img)
-                
-            self.log_panel.append("✅ Envio para impressão concluído!")
-            
-        except Exception as e:
-            self.log_panel.append(f"❌ Erro durante impressão: {e}")
-        finally:
-            painter.end()
\ No newline at end of file
+        first, last = 1, len(files)
+        if printer.printRange() == QPrinter.PrintRange.PageRange and printer.fromPage() > 0:
+            first, last = printer.fromPage(), min(printer.toPage() or len(files), len(files))
+        pages = range(first, last + 1)
+        self.log_panel.append(f"🖨️ Enviando {len(pages)} página(s) de {output_dir.name} para a impressora...")
+
+        spooler = self._new_print_spooler(printer)
+        spooler.expect(pages)
+        for page in pages:
+            spooler.submit(page, path=output_dir / files[page - 1])
+        spooler.finish_input()
+        spooler.start()
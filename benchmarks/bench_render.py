@@ -0,0 +1,180 @@
+# benchmarks/bench_render.py
+"""
+Benchmarks do pipeline de render (headless).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_render run                 # 100/1k/10k linhas
+    python -m benchmarks.bench_render run --quick         # só 100 linhas (rápido)
+    python -m benchmarks.bench_render run --save-baseline # grava benchmarks/baseline.json
+    python -m benchmarks.bench_render compare benchmarks/results/<arquivo>.json
+
+O que é medido:
+- render/<modelo>/rows=N:   NativeRenderer.render_to_qimage por cartão
+- sheet/rows=N:             SheetAssembler.render_sheet por folha
+- e2e/<modo>/threads=T:     RenderManager de ponta a ponta (direto e imposição),
+                            uma entrada por nº de threads (curva de escala)
+
+Cada resultado tem 'value' + 'unit' (menor é melhor); `compare` falha
+(exit 1) se algum valor piorar mais que o limite (--threshold, padrão 10%).
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QEventLoop
+from PySide6.QtWidgets import QApplication
+
+from core.renderer_v3 import NativeRenderer
+from core.sheet_assembler import SheetAssembler
+from core.worker import RenderManager
+from benchmarks.common import BENCH_DIR, add_compare_parser, summarize, write_report
+from benchmarks.synthetic import make_assets, make_rows, model_templates, synthetic_templates
+
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+
+DEFAULT_ROWS = (100, 1000, 10000)
+WARMUP = 3
+
+# Tamanho do cartão usado nas medições de imposição (mesmo padrão do app)
+SHEET_CARD_MM = (100, 70.9)
+
+
+def bench_renderer(templates: dict, sizes, results: dict):
+    for name, tpl in templates.items():
+        renderer = NativeRenderer(tpl)
+        placeholders = tpl.get("placeholders", [])
+        for n in sizes:
+            rows_plain, rows_rich = make_rows(placeholders, n)
+            for i in range(min(WARMUP, n)):
+                renderer.render_to_qimage(rows_plain[i], rows_rich[i])
+
+            samples = []
+            for plain, rich in zip(rows_plain, rows_rich):
+                t0 = time.perf_counter()
+                renderer.render_to_qimage(plain, rich)
+                samples.append(time.perf_counter() - t0)
+
+            key = f"render/{name}/rows={n}"
+            results[key] = summarize(samples)
+            print(f"{key:<45} p50={results[key]['p50_ms']:.2f}ms p95={results[key]['p95_ms']:.2f}ms")
+
+
+def bench_sheet(template: dict, sizes, results: dict):
+    """Monta folhas a partir de cartões já renderizados (só o custo do assembler)."""
+    assembler = SheetAssembler(*SHEET_CARD_MM)
+    renderer = NativeRenderer(template)
+    rows_plain, rows_rich = make_rows(template.get("placeholders", []), assembler.capacity)
+    cards = [renderer.render_to_qimage(p, r) for p, r in zip(rows_plain, rows_rich)]
+    assembler.render_sheet(cards)  # aquecimento
+
+    for n in sizes:
+        pages = max(1, n // max(1, assembler.capacity))
+        samples = []
+        for _ in range(pages):
+            t0 = time.perf_counter()
+            assembler.render_sheet(cards)
+            samples.append(time.perf_counter() - t0)
+        key = f"sheet/rows={n}"
+        results[key] = summarize(samples, "ms/sheet")
+        print(f"{key:<45} p50={results[key]['p50_ms']:.2f}ms ({pages} folhas)")
+
+
+def _run_manager(template: dict, rows: int, imposition: bool, threads: int) -> float:
+    """Roda um lote completo com o RenderManager; retorna o tempo de parede (s)."""
+    rows_plain, rows_rich = make_rows(template.get("placeholders", []), rows)
+    out_dir = Path(tempfile.mkdtemp(prefix="gcl_bench_"))
+    settings = {"enabled": imposition, "target_w_mm": SHEET_CARD_MM[0], "target_h_mm": SHEET_CARD_MM[1]}
+    try:
+        manager = RenderManager(NativeRenderer(template), rows_plain, rows_rich, out_dir,
+                                "bench_{" + (template.get("placeholders") or ["x"])[0] + "}",
+                                imposition_settings=settings, num_threads=threads, use_cache=False)
+        loop = QEventLoop()
+        manager.finished_process.connect(loop.quit)
+        manager.error_occurred.connect(lambda msg: print(f"[bench] erro: {msg}"))
+        t0 = time.perf_counter()
+        manager.start()
+        if not all(w.done.is_set() for w in manager.workers):
+            loop.exec()
+        return time.perf_counter() - t0
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def bench_end_to_end(template: dict, rows: int, thread_counts, results: dict):
+    for mode, imposition in (("direct", False), ("imposition", True)):
+        for t in thread_counts:
+            wall = _run_manager(template, rows, imposition, t)
+            key = f"e2e/{mode}/threads={t}"
+            results[key] = {"value": round(wall / rows * 1000, 3), "unit": "ms/card",
+                            "n": rows, "wall_s": round(wall, 3),
+                            "cards_per_s": round(rows / wall, 2)}
+            print(f"{key:<45} {wall:.2f}s ({rows / wall:.1f} cartões/s)")
+
+
+def _default_threads() -> list:
+    cpu = os.cpu_count() or 1
+    counts, t = [], 1
+    while t < cpu:
+        counts.append(t)
+        t *= 2
+    counts.append(cpu)
+    return counts
+
+
+def cmd_run(args) -> int:
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    sizes = [100] if args.quick else [int(x) for x in args.rows.split(",")]
+    threads = [int(x) for x in args.threads.split(",")] if args.threads else _default_threads()
+    e2e_rows = 24 if args.quick else args.e2e_rows
+
+    asset_dir = Path(tempfile.mkdtemp(prefix="gcl_bench_assets_"))
+    try:
+        templates = model_templates()
+        templates.update(synthetic_templates(make_assets(asset_dir)))
+        if args.only:
+            templates = {k: v for k, v in templates.items() if args.only in k}
+
+        results = {}
+        bench_renderer(templates, sizes, results)
+        e2e_tpl = templates.get(args.e2e_template) or next(iter(templates.values()))
+        bench_sheet(e2e_tpl, sizes, results)
+        if not args.skip_e2e:
+            bench_end_to_end(e2e_tpl, e2e_rows, threads, results)
+    finally:
+        shutil.rmtree(asset_dir, ignore_errors=True)
+
+    write_report(results, "bench", args.output, BASELINE_PATH if args.save_baseline else None)
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks do render do GCL")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="executa os benchmarks e grava o JSON de resultados")
+    run.add_argument("--rows", default=",".join(map(str, DEFAULT_ROWS)), help="tamanhos dos datasets (ex: 100,1000)")
+    run.add_argument("--threads", default="", help="nº de threads do e2e (ex: 1,2,4); padrão: 1,2,4..núcleos")
+    run.add_argument("--e2e-rows", type=int, default=200, help="linhas por lote no e2e")
+    run.add_argument("--e2e-template", default="model:promocao", help="modelo usado em sheet/e2e")
+    run.add_argument("--only", default="", help="filtra modelos pelo nome (substring)")
+    run.add_argument("--skip-e2e", action="store_true", help="não roda o RenderManager")
+    run.add_argument("--quick", action="store_true", help="100 linhas, e2e com 24 cartões")
+    run.add_argument("--output", default="", help="arquivo de saída (padrão: benchmarks/results/)")
+    run.add_argument("--save-baseline", action="store_true", help="também grava benchmarks/baseline.json")
+    run.set_defaults(func=cmd_run)
+
+    add_compare_parser(sub, BASELINE_PATH, "benchmarks.bench_render")
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+# benchmarks/bench_ui.py
+"""
+Benchmarks de responsividade da interface (headless, via QTest).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_ui run
+    python -m benchmarks.bench_ui run --quick
+    python -m benchmarks.bench_ui run --save-baseline   # grava benchmarks/baseline_ui.json
+    python -m benchmarks.bench_ui compare benchmarks/results/ui_<arquivo>.json
+
+O número que importa é quanto tempo o event loop fica BLOQUEADO:
+- Interações com trabalho adiado (colar, seleção -> preview, troca de modelo)
+  rodam dentro de um loop real com uma "batida" de 1 ms (LoopProbe); o maior
+  intervalo entre batidas é o congelamento percebido pelo usuário.
+- Interações contínuas (rolar a tabela, arrastar no editor) são medidas por
+  quadro: evento + repaint síncrono do viewport.
+
+Chaves: ui/paste/rows=N, ui/scroll/rows=N, ui/select_preview, ui/model_switch,
+ui/drag/guides=G,boxes=B. 'value' = p50 em ms (menor é melhor).
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import Qt, QTimer, QEventLoop, QMimeData, QPointF, QEvent
+from PySide6.QtGui import QMouseEvent
+from PySide6.QtTest import QTest
+from PySide6.QtWidgets import QApplication, QTableWidgetItem, QMessageBox
+
+from benchmarks.common import BENCH_DIR, add_compare_parser, summarize, write_report
+
+BASELINE_PATH = BENCH_DIR / "baseline_ui.json"
+
+# Intervalo da batida e tempo de espera após a ação para drenar trabalho adiado
+PROBE_INTERVAL_MS = 1
+SETTLE_MS = 40
+
+
+class LoopProbe:
+    """Mede o maior bloqueio do event loop enquanto uma ação (e seus efeitos) rodam."""
+
+    def __init__(self):
+        self._ticks = []
+        self._timer = QTimer()
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.setInterval(PROBE_INTERVAL_MS)
+        self._timer.timeout.connect(lambda: self._ticks.append(time.perf_counter()))
+
+    def run(self, action) -> float:
+        """Executa `action` dentro do loop; retorna o maior bloqueio (s)."""
+        loop = QEventLoop()
+
+        def _fire():
+            self._ticks.append(time.perf_counter())
+            action()
+            QTimer.singleShot(SETTLE_MS, loop.quit)
+
+        self._ticks = []
+        self._timer.start()
+        QTimer.singleShot(0, _fire)
+        loop.exec()
+        self._timer.stop()
+
+        ticks = self._ticks
+        return max((b - a for a, b in zip(ticks, ticks[1:])), default=0.0)
+
+
+def _make_clipboard_table(rows: int, cols: int) -> QMimeData:
+    """Clipboard igual ao do Sheets: TSV + tabela HTML com spans de estilo."""
+    tsv_lines, html_rows = [], []
+    for r in range(rows):
+        cells = [f"Valor {r}-{c}" for c in range(cols)]
+        tsv_lines.append("\t".join(cells))
+        tds = "".join(
+            f'<td><span style="font-weight:bold">{v}</span></td>' if (r + c) % 7 == 0 else f"<td>{v}</td>"
+            for c, v in enumerate(cells))
+        html_rows.append(f"<tr>{tds}</tr>")
+    md = QMimeData()
+    md.setText("\n".join(tsv_lines))
+    md.setHtml(f"<table>{''.join(html_rows)}</table>")
+    return md
+
+
+def _new_table(cols: int):
+    from ui.table_panel import RichTableWidget
+    table = RichTableWidget(0, cols)
+    table.setHorizontalHeaderLabels([f"col_{c}" for c in range(cols)])
+    table.resize(1000, 700)
+    table.show()
+    return table
+
+
+def bench_paste(probe: LoopProbe, sizes, repeats: int, results: dict):
+    cols = 6
+    for n in sizes:
+        table = _new_table(cols)
+        samples = []
+        for _ in range(repeats):
+            table.setRowCount(1)
+            table.clearContents()
+            QApplication.clipboard().setMimeData(_make_clipboard_table(n, cols))
+            table.setCurrentCell(0, 0)
+            samples.append(probe.run(
+                lambda: QTest.keyClick(table, Qt.Key.Key_V, Qt.KeyboardModifier.ControlModifier)))
+        table.close()
+        key = f"ui/paste/rows={n}"
+        results[key] = summarize(samples, "ms blocked")
+        print(f"{key:<45} p50={results[key]['p50_ms']:.1f}ms max={results[key]['max_ms']:.1f}ms")
+
+
+def bench_scroll(sizes, steps: int, results: dict):
+    cols = 6
+    for n in sizes:
+        table = _new_table(cols)
+        table.setRowCount(n)
+        for r in range(n):
+            for c in range(cols):
+                item = QTableWidgetItem(f"Valor {r}-{c}")
+                item.setData(table.RICH_ROLE, f"<b>Valor</b> <i>{r}</i>-{c}")
+                table.setItem(r, c, item)
+        QApplication.processEvents()
+
+        bar = table.verticalScrollBar()
+        step = max(1, bar.maximum() // max(1, steps))
+        samples = []
+        for i in range(steps):
+            t0 = time.perf_counter()
+            bar.setValue((i * step) % (bar.maximum() + 1))
+            table.viewport().repaint()
+            samples.append(time.perf_counter() - t0)
+        table.close()
+        key = f"ui/scroll/rows={n}"
+        results[key] = summarize(samples, "ms/frame")
+        print(f"{key:<45} p50={results[key]['p50_ms']:.1f}ms p95={results[key]['p95_ms']:.1f}ms")
+
+
+def _new_main_window():
+    from app_window import MainWindow
+    w = MainWindow()
+    w.resize(1300, 750)
+    w.show()
+    QApplication.processEvents()
+    return w
+
+
+def bench_select_preview(probe: LoopProbe, repeats: int, results: dict):
+    w = _new_main_window()
+    table = w.table_panel.table
+    table.setRowCount(max(repeats, 2))
+    for r in range(table.rowCount()):
+        for c in range(table.columnCount()):
+            table.setItem(r, c, QTableWidgetItem(f"Valor {r}-{c}"))
+
+    samples = []
+    for i in range(repeats):
+        samples.append(probe.run(lambda i=i: table.selectRow(i % table.rowCount())))
+    w.close()
+    results["ui/select_preview"] = summarize(samples, "ms blocked")
+    print(f"{'ui/select_preview':<45} p50={results['ui/select_preview']['p50_ms']:.1f}ms")
+
+
+def bench_model_switch(probe: LoopProbe, repeats: int, results: dict):
+    w = _new_main_window()
+    cbo = w.preview_panel.cbo_models
+    if cbo.count() < 2:
+        print("[bench] troca de modelo ignorada: menos de 2 modelos em models/")
+        w.close()
+        return
+
+    samples = []
+    for i in range(repeats):
+        samples.append(probe.run(lambda i=i: cbo.setCurrentIndex((cbo.currentIndex() + 1) % cbo.count())))
+    w.close()
+    results["ui/model_switch"] = summarize(samples, "ms blocked")
+    print(f"{'ui/model_switch':<45} p50={results['ui/model_switch']['p50_ms']:.1f}ms")
+
+
+def _send_mouse(widget, ev_type, pos: QPointF, buttons):
+    button = Qt.MouseButton.LeftButton if ev_type != QEvent.Type.MouseMove else Qt.MouseButton.NoButton
+    ev = QMouseEvent(ev_type, pos, widget.mapToGlobal(pos.toPoint()).toPointF(),
+                     button, buttons, Qt.KeyboardModifier.NoModifier)
+    QApplication.sendEvent(widget, ev)
+
+
+def bench_drag(guides: int, boxes: int, steps: int, results: dict):
+    from ui.editor.editor_window import EditorWindow
+    from ui.editor.canvas_items import DesignerBox, Guideline
+
+    editor = EditorWindow()
+    editor.resize(1400, 900)
+    rng = random.Random(0)
+    rect = editor.scene.sceneRect()
+    for i in range(guides):
+        vertical = i % 2 == 0
+        limit = rect.width() if vertical else rect.height()
+        editor.scene.addItem(Guideline(rng.uniform(0, limit), is_vertical=vertical))
+    for _ in range(boxes):
+        editor.scene.addItem(DesignerBox(rng.uniform(0, rect.width() - 300),
+                                         rng.uniform(0, rect.height() - 60), 300, 60, "{campo}"))
+    target = DesignerBox(rect.width() / 3, rect.height() / 3, 300, 60, "{alvo}")
+    editor.scene.addItem(target)
+    editor.show()
+    QApplication.processEvents()
+
+    view = editor.view
+    viewport = view.viewport()
+    start = QPointF(view.mapFromScene(target.sceneBoundingRect().center()))
+    _send_mouse(viewport, QEvent.Type.MouseButtonPress, start, Qt.MouseButton.LeftButton)
+
+    samples = []
+    for i in range(1, steps + 1):
+        pos = start + QPointF((i % 40) * 3, (i % 25) * 2)
+        t0 = time.perf_counter()
+        _send_mouse(viewport, QEvent.Type.MouseMove, pos, Qt.MouseButton.LeftButton)
+        viewport.repaint()
+        samples.append(time.perf_counter() - t0)
+    _send_mouse(viewport, QEvent.Type.MouseButtonRelease, start, Qt.MouseButton.NoButton)
+    editor.close()
+
+    key = f"ui/drag/guides={guides},boxes={boxes}"
+    results[key] = summarize(samples, "ms/frame")
+    print(f"{key:<45} p50={results[key]['p50_ms']:.1f}ms p95={results[key]['p95_ms']:.1f}ms")
+
+
+def cmd_run(args) -> int:
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    # Nenhum diálogo modal pode travar a execução headless
+    QMessageBox.information = lambda *a, **k: None
+    QMessageBox.warning = lambda *a, **k: None
+
+    probe = LoopProbe()
+    results = {}
+    paste_sizes = [50] if args.quick else [int(x) for x in args.paste_rows.split(",")]
+    scroll_sizes = [500] if args.quick else [int(x) for x in args.scroll_rows.split(",")]
+    repeats = 3 if args.quick else args.repeats
+    drag_sets = [(10, 20)] if args.quick else [tuple(int(v) for v in s.split("x")) for s in args.drag.split(",")]
+
+    bench_paste(probe, paste_sizes, repeats, results)
+    bench_scroll(scroll_sizes, 30 if args.quick else 120, results)
+    bench_select_preview(probe, repeats, results)
+    bench_model_switch(probe, repeats, results)
+    for guides, boxes in drag_sets:
+        bench_drag(guides, boxes, 30 if args.quick else 120, results)
+
+    write_report(results, "ui", args.output, BASELINE_PATH if args.save_baseline else None)
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de responsividade da UI do GCL")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="executa os cenários e grava o JSON de resultados")
+    run.add_argument("--paste-rows", default="100,1000", help="linhas coladas por cenário (ex: 100,1000)")
+    run.add_argument("--scroll-rows", default="1000,10000", help="linhas na tabela ao rolar")
+    run.add_argument("--drag", default="10x20,50x100", help="guias x caixas no editor (ex: 10x20,50x100)")
+    run.add_argument("--repeats", type=int, default=10, help="repetições das interações pontuais")
+    run.add_argument("--quick", action="store_true", help="cenários pequenos (rápido)")
+    run.add_argument("--output", default="", help="arquivo de saída (padrão: benchmarks/results/)")
+    run.add_argument("--save-baseline", action="store_true", help="também grava benchmarks/baseline_ui.json")
+    run.set_defaults(func=cmd_run)
+
+    add_compare_parser(sub, BASELINE_PATH, "benchmarks.bench_ui")
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
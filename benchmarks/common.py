@@ -0,0 +1,114 @@
+# benchmarks/common.py
+"""
+Partes compartilhadas pelos benchmarks (render e UI): resumo das amostras,
+metadados do ambiente, gravação do JSON e o comando `compare`.
+
+Formato do JSON: {"meta": {...}, "results": {chave: {"value", "unit", ...}}}
+'value' é sempre "menor é melhor".
+"""
+import json
+import os
+import platform
+import statistics
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from PySide6 import __version__ as PYSIDE_VERSION
+
+BENCH_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = BENCH_DIR / "results"
+DEFAULT_THRESHOLD = 0.10
+
+
+def summarize(samples: list, unit: str = "ms/item") -> dict:
+    """Resumo em ms por amostra; 'value' (p50) é o número comparado."""
+    ms = sorted(s * 1000 for s in samples)
+    p50 = statistics.median(ms)
+    return {
+        "value": round(p50, 3),
+        "unit": unit,
+        "n": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "p50_ms": round(p50, 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(0.95 * (len(ms) - 1)))], 3),
+        "max_ms": round(ms[-1], 3),
+    }
+
+
+def environment_meta() -> dict:
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pyside6": PYSIDE_VERSION,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_report(results: dict, prefix: str, output: str = "", baseline_path: Path | None = None) -> Path:
+    """Grava o JSON em benchmarks/results/ (ou `output`) e, se pedido, como baseline."""
+    report = {"meta": environment_meta(), "results": results}
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    out_path = Path(output) if output else RESULTS_DIR / f"{prefix}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    out_path.write_text(text, encoding="utf-8")
+    print(f"\nResultados: {out_path}")
+
+    if baseline_path:
+        Path(baseline_path).write_text(text, encoding="utf-8")
+        print(f"Baseline atualizada: {baseline_path}")
+    return out_path
+
+
+def compare_reports(baseline: dict, current: dict, threshold: float) -> tuple[list, list]:
+    """Retorna (linhas do relatório, chaves que regrediram além do limite)."""
+    base, cur = baseline.get("results", {}), current.get("results", {})
+    lines, regressions = [], []
+    for key in sorted(set(base) & set(cur)):
+        b, c = base[key]["value"], cur[key]["value"]
+        delta = (c - b) / b if b else 0.0
+        flag = ""
+        if delta > threshold:
+            flag = "  <-- REGRESSÃO"
+            regressions.append(key)
+        elif delta < -threshold:
+            flag = "  (melhorou)"
+        lines.append(f"{key:<45} {b:>10.2f} -> {c:>10.2f} {cur[key]['unit']:<9} {delta:+7.1%}{flag}")
+    for key in sorted(set(cur) - set(base)):
+        lines.append(f"{key:<45} (novo) {cur[key]['value']:.2f} {cur[key]['unit']}")
+    for key in sorted(set(base) - set(cur)):
+        lines.append(f"{key:<45} (ausente na execução atual)")
+    return lines, regressions
+
+
+def cmd_compare(args) -> int:
+    # A baseline é da máquina (não vem no repositório): grave uma antes de comparar
+    if not Path(args.baseline).exists():
+        print(f"Baseline não encontrada: {args.baseline}\n"
+              f"Grave uma nesta máquina antes de comparar:\n"
+              f"    python -m {args.module} run --save-baseline", file=sys.stderr)
+        return 2
+    if not Path(args.current).exists():
+        print(f"Resultado não encontrado: {args.current}", file=sys.stderr)
+        return 2
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    current = json.loads(Path(args.current).read_text(encoding="utf-8"))
+    lines, regressions = compare_reports(baseline, current, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print(f"\n{len(regressions)} regressão(ões) acima de {args.threshold:.0%}.")
+        return 1
+    print(f"\nSem regressões acima de {args.threshold:.0%}.")
+    return 0
+
+
+def add_compare_parser(subparsers, baseline_path: Path, module: str):
+    cmp_ = subparsers.add_parser("compare", help="compara uma execução com a baseline")
+    cmp_.add_argument("current", help="JSON da execução atual")
+    cmp_.add_argument("--baseline", default=str(baseline_path))
+    cmp_.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                      help="piora relativa tolerada (0.10 = 10%%)")
+    cmp_.set_defaults(func=cmd_compare, module=module)
+    return cmp_
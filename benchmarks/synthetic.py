@@ -0,0 +1,126 @@
+# benchmarks/synthetic.py
+"""
+Modelos e dados sintéticos para os benchmarks.
+
+Os modelos seguem a mesma forma que `load_template()` devolve (HTML
+expandido, caminhos absolutos), então vão direto para o NativeRenderer.
+"""
+import random
+from pathlib import Path
+
+from PySide6.QtGui import QImage, QPainter, QColor, QPen
+from PySide6.QtCore import Qt
+
+from core.template_v4 import load_template
+
+CANVAS_W, CANVAS_H = 1748, 1240
+
+_LOREM = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+          "incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud "
+          "exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat. ")
+
+
+def make_assets(asset_dir: Path) -> dict:
+    """Gera um fundo (canvas inteiro) e uma assinatura com transparência."""
+    asset_dir = Path(asset_dir)
+    asset_dir.mkdir(parents=True, exist_ok=True)
+
+    bg = QImage(CANVAS_W, CANVAS_H, QImage.Format.Format_RGB32)
+    painter = QPainter(bg)
+    for y in range(0, CANVAS_H, 40):
+        painter.fillRect(0, y, CANVAS_W, 40, QColor(230, 220 + (y // 40) % 30, 200))
+    painter.end()
+    bg_path = asset_dir / "bg.png"
+    bg.save(str(bg_path))
+
+    sig = QImage(900, 300, QImage.Format.Format_ARGB32)
+    sig.fill(Qt.GlobalColor.transparent)
+    painter = QPainter(sig)
+    painter.setPen(QPen(QColor(20, 20, 120), 6))
+    for i in range(12):
+        painter.drawLine(100 + i * 50, 200 - (i % 3) * 40, 150 + i * 50, 120 + (i % 4) * 30)
+    painter.end()
+    sig_path = asset_dir / "signature.png"
+    sig.save(str(sig_path))
+
+    return {"background": str(bg_path), "signature": str(sig_path)}
+
+
+def _box(x, y, w, h, html, **extra):
+    box = {"id": "", "html": html, "x": x, "y": y, "w": w, "h": h,
+           "font_family": "Arial", "font_size": 16, "align": "left",
+           "vertical_align": "top", "indent_px": 0, "line_height": 1.15}
+    box.update(extra)
+    return box
+
+
+def synthetic_templates(assets: dict) -> dict:
+    """Modelos que estressam partes diferentes do renderizador."""
+    templates = {}
+
+    # Muitas caixas pequenas (custo fixo por caixa: QTextDocument, save/restore)
+    boxes = []
+    placeholders = []
+    for i in range(60):
+        name = f"campo_{i}"
+        placeholders.append(name)
+        boxes.append(_box(40 + (i % 6) * 280, 40 + (i // 6) * 115, 260, 100, f"<p>{{{name}}}</p>"))
+    templates["many_boxes"] = {"name": "many_boxes", "canvas_size": {"w": CANVAS_W, "h": CANVAS_H},
+                               "background_path": assets["background"], "placeholders": placeholders,
+                               "signatures": [], "boxes": boxes}
+
+    # Caixas rotacionadas (caminho com transformação + clip)
+    boxes = [_box(200 + i * 150, 300 + (i % 3) * 200, 500, 120, "<p><b>{nome}</b> {cargo}</p>",
+                  rotation=(i * 17) % 360, align="center", vertical_align="center")
+             for i in range(8)]
+    templates["rotated"] = {"name": "rotated", "canvas_size": {"w": CANVAS_W, "h": CANVAS_H},
+                            "background_path": assets["background"], "placeholders": ["nome", "cargo"],
+                            "signatures": [], "boxes": boxes}
+
+    # Assinaturas (blit de imagens com alfa)
+    signatures = [{"path": assets["signature"], "x": 100 + i * 400, "y": 900,
+                   "width": 360, "height": 120, "longest_side": 360} for i in range(4)]
+    templates["signatures"] = {"name": "signatures", "canvas_size": {"w": CANVAS_W, "h": CANVAS_H},
+                               "background_path": assets["background"], "placeholders": ["nome"],
+                               "signatures": signatures,
+                               "boxes": [_box(200, 200, 1300, 120, "<p>{nome}</p>", font_size=32)]}
+
+    # Texto longo justificado (layout de parágrafo é o custo dominante)
+    templates["long_justified"] = {"name": "long_justified", "canvas_size": {"w": CANVAS_W, "h": CANVAS_H},
+                                   "background_path": assets["background"], "placeholders": ["texto"],
+                                   "signatures": [],
+                                   "boxes": [_box(120, 120, 1500, 1000, "<p>{texto}</p>",
+                                                  align="justify", font_size=14)]}
+    return templates
+
+
+def model_templates(models_root: Path = Path("models")) -> dict:
+    """Modelos reais da pasta models/ (ignora o store e pastas sem template)."""
+    templates = {}
+    for json_path in sorted(Path(models_root).glob("*/template_v3.json")):
+        try:
+            templates[f"model:{json_path.parent.name}"] = load_template(json_path)
+        except Exception as e:
+            print(f"[bench] ignorando {json_path}: {e}")
+    return templates
+
+
+def make_rows(placeholders: list, n: int, seed: int = 0) -> tuple[list, list]:
+    """
+    Gera n linhas (plain, rich) com tamanhos variados; ~10% em <b>.
+    'texto' recebe um parágrafo longo (para o modelo justificado).
+    """
+    rng = random.Random(seed)
+    rows_plain, rows_rich = [], []
+    for i in range(n):
+        plain, rich = {}, {}
+        for p in placeholders:
+            if p == "texto":
+                value = _LOREM * rng.randint(10, 25)
+            else:
+                value = f"{p.title()} {i} " + "x" * rng.randint(0, 20)
+            plain[p] = value
+            rich[p] = f"<b>{value}</b>" if rng.random() < 0.1 else value
+        rows_plain.append(plain)
+        rows_rich.append(rich)
+    return rows_plain, rows_rich
@@ -0,0 +1,92 @@
+# core/archive_sink.py
+"""
+Saída direto em arquivo compactado (ZIP ou TAR) em vez de PNGs soltos.
+
+Os workers codificam o PNG na memória e entregam os bytes aqui; nada é
+gravado como arquivo individual e o pacote para enviar/subir já sai pronto
+(sem reler tudo do disco depois). PNG já é comprimido, então o ZIP usa
+ZIP_STORED. Com split_mb > 0 o pacote é dividido em partes de até ~N MB
+(<nome>.part01.zip, <nome>.part02.zip...); um arquivo nunca é quebrado entre
+partes.
+
+Os workers escrevem em paralelo: a codificação é por thread e só a escrita
+no pacote é serializada (um lock).
+"""
+import io
+import tarfile
+import threading
+import time
+import zipfile
+from pathlib import Path
+
+ARCHIVE_FORMATS = ("zip", "tar")
+_MB = 1024 * 1024
+
+
+class ArchiveSink:
+    """Um pacote (ou série de partes) aberto para escrita durante o lote."""
+
+    def __init__(self, output_dir, name: str, fmt: str = "zip", split_mb: int = 0):
+        if fmt not in ARCHIVE_FORMATS:
+            raise ValueError(f"Formato de pacote desconhecido: {fmt!r}")
+        self.output_dir = Path(output_dir)
+        self.name = name
+        self.fmt = fmt
+        self.split_bytes = max(0, int(split_mb or 0)) * _MB
+        self.parts: list[Path] = []  # caminhos das partes, na ordem
+        self.entries = 0
+        self._lock = threading.Lock()
+        self._archive = None
+        self._part_bytes = 0
+
+    @classmethod
+    def from_settings(cls, output_dir, name: str, settings: dict | None) -> "ArchiveSink | None":
+        """settings = {"format": "zip"|"tar", "split_mb": N} do modelo; None/format vazio = PNGs soltos."""
+        if not settings or not settings.get("format"):
+            return None
+        return cls(output_dir, name, settings["format"], settings.get("split_mb", 0))
+
+    def _part_path(self) -> Path:
+        if self.split_bytes:
+            return self.output_dir / f"{self.name}.part{len(self.parts) + 1:02d}.{self.fmt}"
+        return self.output_dir / f"{self.name}.{self.fmt}"
+
+    def _open_part(self):
+        path = self._part_path()
+        if self.fmt == "zip":
+            self._archive = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED, allowZip64=True)
+        else:
+            self._archive = tarfile.open(path, "w")
+        self.parts.append(path)
+        self._part_bytes = 0
+
+    def _close_part(self):
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
+
+    def add(self, arcname: str, data: bytes):
+        """Acrescenta um arquivo (caminho relativo com "/") ao pacote."""
+        with self._lock:
+            if self._archive is not None and self.split_bytes and self._part_bytes \
+                    and self._part_bytes + len(data) > self.split_bytes:
+                self._close_part()
+            if self._archive is None:
+                self._open_part()
+            if self.fmt == "zip":
+                info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+                info.compress_type = zipfile.ZIP_STORED
+                self._archive.writestr(info, data)
+            else:
+                info = tarfile.TarInfo(arcname)
+                info.size = len(data)
+                info.mtime = int(time.time())
+                self._archive.addfile(info, io.BytesIO(data))
+            self._part_bytes += len(data)
+            self.entries += 1
+
+    def close(self) -> list[Path]:
+        """Fecha a parte atual (grava o índice do ZIP) e retorna as partes."""
+        with self._lock:
+            self._close_part()
+            return list(self.parts)
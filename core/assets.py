@@ -0,0 +1,344 @@
+# core/assets.py
+"""
+Assets dos modelos (fundo e assinaturas).
+
+1) Store compartilhado endereçado por conteúdo: models/_store/<h[:2]>/<sha256>.<ext>
+   Cada arquivo é guardado uma única vez, não importa quantos modelos o usem.
+   Os modelos referenciam o blob por caminho relativo (../_store/...), então
+   renomear/duplicar a pasta do modelo não exige copiar imagens.
+
+2) Derivados "prontos para render" (models/_store/render/), gerados ao salvar:
+   - fundo: opaco (sem alfa) e no tamanho exato de canvas_size;
+   - assinatura: já escalada para width/height salvos e com as margens
+     transparentes recortadas (com o deslocamento do recorte).
+   O nome do derivado leva o hash do original + tamanho, então basta existir
+   para estar atualizado.
+
+3) Cache de imagens decodificadas, chaveado pelo hash do blob: vários modelos
+   (ou vários renderizadores do mesmo modelo) decodificam cada fundo uma vez.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from PySide6.QtGui import QImage, QPainter
+from PySide6.QtCore import Qt
+
+STORE_DIRNAME = "_store"
+RENDER_DIRNAME = "render"
+# Marca dos fundos derivados no tamanho nativo (cortados/completados, sem escala)
+BACKGROUND_DERIVATIVE_SUFFIX = "_native"
+IMAGE_CACHE_MAX_ITEMS = 32
+
+_HASH_CHUNK = 1024 * 1024
+
+
+# --- STORE ENDEREÇADO POR CONTEÚDO ---
+
+_hash_memo: dict[tuple, str] = {}
+_hash_memo_lock = threading.Lock()
+
+
+def file_sha256(path: Path) -> str:
+    """
+    SHA-256 do arquivo. Memoriza por (caminho, mtime, tamanho): salvar o mesmo
+    modelo de novo não relê imagens que não mudaram (caro em rede).
+    """
+    path = Path(path)
+    st = path.stat()
+    key = (str(path.resolve()), st.st_mtime_ns, st.st_size)
+    with _hash_memo_lock:
+        digest = _hash_memo.get(key)
+    if digest is not None:
+        return digest
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _hash_memo_lock:
+        _hash_memo[key] = digest
+    return digest
+
+
+def store_dir_for(model_dir: Path) -> Path:
+    """O store fica ao lado das pastas de modelo (models/_store)."""
+    return Path(model_dir).parent / STORE_DIRNAME
+
+
+def is_store_path(path: Path) -> bool:
+    return STORE_DIRNAME in Path(path).parts
+
+
+def asset_hash(path: Path) -> str:
+    """Hash do conteúdo; para blobs do store o próprio nome já é o hash."""
+    path = Path(path)
+    if is_store_path(path) and RENDER_DIRNAME not in path.parts:
+        return path.stem
+    return file_sha256(path)
+
+
+def store_asset(src: Path, store_dir: Path) -> Path:
+    """
+    Guarda o arquivo no store (se ainda não estiver lá) e retorna o caminho do blob.
+    Escrita atômica: copia para .tmp e renomeia.
+    """
+    src = Path(src)
+    if is_store_path(src):
+        return src
+
+    digest = file_sha256(src)
+    dest = Path(store_dir) / digest[:2] / f"{digest}{src.suffix.lower()}"
+    if dest.exists():
+        return dest
+
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(dest.name + ".tmp")
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+    return dest
+
+
+def link_or_copy(src, dst):
+    """copy_function para copytree: hardlink quando possível, cópia como fallback."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return dst
+
+
+def referenced_store_blobs(models_root: Path) -> set[Path]:
+    """Todos os blobs do store referenciados por algum template_v3.json."""
+    refs = set()
+    for json_path in Path(models_root).glob("*/template_v3.json"):
+        try:
+            data = json.loads(json_path.read_text(encoding="utf-8"))
+        except Exception:
+            continue
+        paths = [data.get("background_path"), data.get("background_render_path")]
+        for sig in data.get("signatures", []):
+            paths += [sig.get("path"), sig.get("render_path")]
+        for p in paths:
+            if p and is_store_path(p):
+                refs.add((json_path.parent / p).resolve())
+    return refs
+
+
+def collect_garbage(models_root: Path) -> int:
+    """Remove do store os blobs que nenhum modelo referencia. Retorna quantos saíram."""
+    store = Path(models_root) / STORE_DIRNAME
+    if not store.exists():
+        return 0
+    refs = referenced_store_blobs(models_root)
+    removed = 0
+    for blob in store.rglob("*"):
+        if blob.is_file() and blob.resolve() not in refs:
+            blob.unlink()
+            removed += 1
+    return removed
+
+
+# --- DERIVADOS PRONTOS PARA RENDER ---
+
+def _save_png_atomic(img: QImage, dest: Path):
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(dest.name + ".tmp")
+    img.save(str(tmp), "PNG")
+    os.replace(tmp, dest)
+
+
+def build_background_derivative(src: Path, canvas_w: int, canvas_h: int, dest_dir: Path) -> Path | None:
+    """
+    Gera o fundo no tamanho do canvas, já composto sobre branco (RGB32).
+    A imagem não é reescalada: fica no tamanho nativo em 0,0 (o que passa do
+    canvas é cortado, o que falta fica branco), igual ao renderizador com o
+    original. Retorna o caminho do derivado (ou None se o original não puder
+    ser lido).
+    """
+    src = Path(src)
+    dest = Path(dest_dir) / f"{asset_hash(src)}_{canvas_w}x{canvas_h}{BACKGROUND_DERIVATIVE_SUFFIX}.png"
+    if dest.exists():
+        return dest
+
+    img = QImage(str(src))
+    if img.isNull():
+        return None
+
+    # Compõe sobre branco (igual ao renderizador) e descarta o canal alfa
+    out = QImage(canvas_w, canvas_h, QImage.Format.Format_RGB32)
+    out.fill(Qt.GlobalColor.white)
+    painter = QPainter(out)
+    painter.drawImage(0, 0, img)
+    painter.end()
+
+    _save_png_atomic(out, dest)
+    return dest
+
+
+def is_current_background_derivative(path) -> bool:
+    """
+    Derivados antigos (sem o sufixo) eram esticados para o canvas; modelos
+    salvos com eles usam o original até serem salvos de novo.
+    """
+    return Path(path).stem.endswith(BACKGROUND_DERIVATIVE_SUFFIX)
+
+
+def _alpha_bounds(img: QImage) -> tuple[int, int, int, int] | None:
+    """
+    Retângulo (x, y, w, h) dos pixels não transparentes.
+    Varre o canal alfa linha a linha com fatias de bytes (rápido, sem loop por pixel).
+    """
+    img = img.convertToFormat(QImage.Format.Format_ARGB32)
+    w, h = img.width(), img.height()
+    bpl = img.bytesPerLine()
+    bits = bytes(img.constBits())
+
+    left, right, top, bottom = w, -1, None, None
+    for y in range(h):
+        # ARGB32 em memória (little endian): B, G, R, A -> alfa no offset 3
+        alpha = bits[y * bpl + 3: y * bpl + w * 4: 4]
+        lead = len(alpha) - len(alpha.lstrip(b"\x00"))
+        if lead == len(alpha):
+            continue
+        trail = len(alpha) - len(alpha.rstrip(b"\x00"))
+        if top is None:
+            top = y
+        bottom = y
+        left = min(left, lead)
+        right = max(right, w - 1 - trail)
+
+    if top is None:
+        return None
+    return left, top, right - left + 1, bottom - top + 1
+
+
+def build_signature_derivative(src: Path, width: int, height: int, dest_dir: Path) -> tuple[Path, int, int] | None:
+    """
+    Gera a assinatura escalada para (width, height) com a mesma regra do
+    renderizador (KeepAspectRatio + Smooth) e recorta as margens transparentes.
+    Retorna (caminho, dx, dy), onde (dx, dy) é o deslocamento do recorte.
+    """
+    src = Path(src)
+    dest = Path(dest_dir) / f"{asset_hash(src)}_{width}x{height}.png"
+
+    img = QImage(str(src))
+    if img.isNull():
+        return None
+
+    # Mesmo formato interno do QPixmap (pré-multiplicado) -> mesmo resultado da escala
+    img = img.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+    scaled = img.scaled(width, height,
+                        Qt.AspectRatioMode.KeepAspectRatio,
+                        Qt.TransformationMode.SmoothTransformation)
+    bounds = _alpha_bounds(scaled)
+    if bounds is None:
+        return None
+    dx, dy, bw, bh = bounds
+
+    if not dest.exists():
+        _save_png_atomic(scaled.copy(dx, dy, bw, bh), dest)
+    return dest, dx, dy
+
+
+def _rel_to(path: Path, model_dir: Path) -> str:
+    return Path(os.path.relpath(path, model_dir)).as_posix()
+
+
+def import_model_asset(source_path: str, model_dir: Path) -> str | None:
+    """
+    Guarda o arquivo no store compartilhado (models/_store, por hash) e
+    retorna o caminho relativo à pasta do modelo (../_store/xx/<hash>.png).
+    Se o conteúdo já estiver no store, nada é copiado.
+    """
+    if not source_path:
+        return None
+
+    src = Path(source_path)
+    if not src.exists():
+        return None
+
+    try:
+        blob = store_asset(src, store_dir_for(model_dir))
+        return _rel_to(blob, model_dir)
+    except Exception as e:
+        print(f"Erro ao importar asset: {e}")
+        return source_path # Fallback para o original
+
+
+def build_render_assets(data: dict, model_dir: Path):
+    """
+    Preenche 'background_render_path' e 'render_path'/'render_x'/'render_y'
+    das assinaturas com derivados na resolução do canvas (_store/render/).
+    """
+    model_dir = Path(model_dir)
+    render_dir = store_dir_for(model_dir) / RENDER_DIRNAME
+
+    def _abs(p):
+        return Path(p) if Path(p).is_absolute() else model_dir / p
+
+    data.pop("background_render_path", None)
+    if data.get("background_path"):
+        cw, ch = data["canvas_size"]["w"], data["canvas_size"]["h"]
+        bg = build_background_derivative(_abs(data["background_path"]), cw, ch, render_dir)
+        if bg:
+            data["background_render_path"] = _rel_to(bg, model_dir)
+
+    for sig in data.get("signatures", []):
+        for key in ("render_path", "render_x", "render_y"):
+            sig.pop(key, None)
+        if not sig.get("path"):
+            continue
+        result = build_signature_derivative(_abs(sig["path"]), sig["width"], sig["height"], render_dir)
+        if result:
+            dest, dx, dy = result
+            sig["render_path"] = _rel_to(dest, model_dir)
+            sig["render_x"] = dx
+            sig["render_y"] = dy
+
+
+# --- CACHE DE IMAGENS DECODIFICADAS ---
+
+_image_cache: "OrderedDict[str, QImage]" = OrderedDict()
+_image_cache_lock = threading.Lock()
+
+
+def _image_cache_key(path: Path) -> str:
+    """Blobs do store: o nome (hash). Outros arquivos: caminho + mtime + tamanho."""
+    if is_store_path(path):
+        return path.name
+    st = path.stat()
+    return f"{path.resolve()}:{st.st_mtime_ns}:{st.st_size}"
+
+
+def load_image(path) -> QImage | None:
+    """
+    Decodifica a imagem uma única vez por conteúdo (LRU limitado).
+    QImage é implicitamente compartilhada, então devolver a mesma instância
+    para várias threads só de leitura (drawImage) é seguro.
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+
+    key = _image_cache_key(path)
+    with _image_cache_lock:
+        img = _image_cache.get(key)
+        if img is not None:
+            _image_cache.move_to_end(key)
+            return img
+
+    img = QImage(str(path))
+    if img.isNull():
+        return None
+
+    with _image_cache_lock:
+        _image_cache[key] = img
+        while len(_image_cache) > IMAGE_CACHE_MAX_ITEMS:
+            _image_cache.popitem(last=False)
+    return img
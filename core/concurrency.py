@@ -0,0 +1,156 @@
+# core/concurrency.py
+"""
+Concorrência adaptativa do RenderManager.
+
+1) Teto por memória: estima quanto cada worker segura (cartões + folha, ver
+   core/memprof.estimate_batch_peak) e limita o nº de workers ao orçamento.
+   Orçamento: parâmetro do RenderManager, ou GCL_MEMORY_BUDGET_MB, ou
+   MEMORY_BUDGET_FRACTION da memória disponível.
+
+2) Ajuste em tempo de execução: os workers puxam tarefas de uma fila
+   compartilhada (SharedTaskQueue), então dá para somar workers no meio do
+   lote. AdaptiveConcurrency começa com poucos workers e vai adicionando
+   enquanto o throughput (cartões/s) subir; quando o último passo não rende
+   ao menos MIN_GAIN, volta ao nível anterior e congela.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from core.memprof import available_memory
+
+MEMORY_BUDGET_ENV = "GCL_MEMORY_BUDGET_MB"
+MEMORY_BUDGET_FRACTION = 0.7
+# Usado quando não dá para medir a memória disponível
+FALLBACK_BUDGET_BYTES = 2 * 1024 * 1024 * 1024
+
+
+class SharedTaskQueue:
+    """Fila thread-safe de tarefas (páginas ou cartões) compartilhada pelos workers."""
+
+    def __init__(self, tasks):
+        self._tasks = deque(tasks)
+        self._lock = threading.Lock()
+
+    def pop(self):
+        """Próxima tarefa, ou None se acabou."""
+        with self._lock:
+            return self._tasks.popleft() if self._tasks else None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._tasks)
+
+
+def iter_tasks(tasks, should_stop, between=None):
+    """
+    Itera sobre uma lista fixa ou uma SharedTaskQueue.
+    Na fila, `should_stop()` é checado ANTES de retirar a próxima tarefa,
+    então um worker aposentado nunca "perde" uma tarefa.
+    `between()` (opcional) roda antes de cada tarefa da fila; o pool de
+    render usa para atender os pedidos de preview no meio do lote.
+    """
+    if isinstance(tasks, SharedTaskQueue):
+        while not should_stop():
+            if between is not None:
+                between()
+            task = tasks.pop()
+            if task is None:
+                return
+            yield task
+    else:
+        for task in tasks:
+            if should_stop():
+                return
+            yield task
+
+
+def memory_budget(explicit_mb: int | None = None) -> int:
+    """Orçamento de memória (bytes) para os workers do lote."""
+    if explicit_mb:
+        return int(explicit_mb) * 1024 * 1024
+    env = os.environ.get(MEMORY_BUDGET_ENV, "").strip()
+    if env.isdigit():
+        return int(env) * 1024 * 1024
+    avail = available_memory()
+    if avail is None:
+        return FALLBACK_BUDGET_BYTES
+    return int(avail * MEMORY_BUDGET_FRACTION)
+
+
+def cpu_ceiling() -> int:
+    """(Núcleos - 2) para deixar o sistema respirar (mesma regra de antes)."""
+    return max(1, (os.cpu_count() or 4) - 2)
+
+
+def max_workers_for(per_worker_bytes: int, budget_bytes: int, task_count: int) -> int:
+    """Maior nº de workers que cabe no orçamento, na CPU e na quantidade de tarefas."""
+    by_memory = budget_bytes // per_worker_bytes if per_worker_bytes > 0 else cpu_ceiling()
+    return max(1, min(cpu_ceiling(), by_memory, task_count))
+
+
+class AdaptiveConcurrency:
+    """
+    Subida de encosta no nº de workers guiada pelo throughput medido.
+    `observe()` é chamado a cada lote de conclusões; retorna quantos workers o lote
+    deveria ter agora (o RenderManager adiciona ou aposenta a diferença).
+    Cresce ~1.5x por passo para chegar rápido a máquinas com muitos núcleos.
+    """
+    # Mínimo de tempo e de conclusões para uma janela de medição valer
+    MIN_WINDOW_S = 1.0
+    MIN_WINDOW_EVENTS = 2
+    # Ganho mínimo para considerar que os workers extras valeram a pena
+    MIN_GAIN = 0.05
+
+    def __init__(self, max_workers: int, start_workers: int = 2):
+        self.max_workers = max(1, max_workers)
+        self.current = max(1, min(start_workers, self.max_workers))
+        self.frozen = self.current >= self.max_workers
+        self._rates = {}  # nº de workers -> cartões/s medido
+        self._previous = None  # nível anterior (para voltar se piorar)
+        self._skip_window = True  # a 1ª janela após mudar inclui o aquecimento
+        self._reset_window(0, time.monotonic())
+
+    def _reset_window(self, done, now):
+        self._win_done = done
+        self._win_start = now
+        self._win_events = 0
+
+    def _next_level(self) -> int:
+        return min(self.max_workers, self.current + max(1, self.current // 2))
+
+    def observe(self, cards_done: int, now: float | None = None, events: int = 1) -> int:
+        """`events` = conclusões desde a última chamada (o gerente agrega por flush)."""
+        now = time.monotonic() if now is None else now
+        self._win_events += events
+        elapsed = now - self._win_start
+        if self.frozen or elapsed < self.MIN_WINDOW_S or self._win_events < max(self.MIN_WINDOW_EVENTS, self.current):
+            return self.current
+
+        rate = (cards_done - self._win_done) / elapsed
+        self._reset_window(cards_done, now)
+        if self._skip_window:
+            self._skip_window = False
+            return self.current
+
+        self._rates[self.current] = rate
+        prev_rate = self._rates.get(self._previous)
+        if prev_rate is not None and rate < prev_rate * (1 + self.MIN_GAIN):
+            # Parou de subir: volta ao nível anterior (workers extras sem ganho
+            # só gastam memória) e congela
+            self.frozen = True
+            self.current = self._previous
+            return self.current
+
+        if self.current < self.max_workers:
+            self._previous = self.current
+            self.current = self._next_level()
+            self._skip_window = True
+        else:
+            self.frozen = True
+        return self.current
+
+    def describe(self) -> str:
+        rates = ", ".join(f"{n}w={r:.1f}/s" for n, r in sorted(self._rates.items()))
+        return f"{self.current} workers (teto {self.max_workers}; medições: {rates or '-'})"
@@ -0,0 +1,106 @@
+# core/journal.py
+"""
+Diário do lote (<pasta Lote_*>/journal.jsonl), só de acréscimo.
+
+1ª linha: {"t": "plan", ...} com tudo que o RenderManager precisa para
+refazer o mesmo plano (linhas, padrão de nome, modelo, imposição).
+Depois: {"t": "done", "file": ...} a cada arquivo gravado, {"t": "fail",
+"row": ...} a cada falha e {"t": "finished"} no fim.
+
+Para retomar (app: "Retomar lote"; CLI: main.py --resume <pasta>), o plano
+é refeito e os arquivos já concluídos (e que ainda existem no disco) são
+pulados. Uma linha final truncada (queda no meio da escrita) é ignorada.
+
+Reprocessar falhas e "Regenerar alterações" escrevem em
+journal_reprocesso.jsonl, para não apagar o plano do lote completo. Ao
+retomar, vale o diário da execução mais recente na pasta.
+"""
+import json
+from pathlib import Path
+
+JOURNAL_NAME = "journal.jsonl"
+REPROCESS_JOURNAL_NAME = "journal_reprocesso.jsonl"
+
+
+def journal_path(output_dir, reprocess: bool = False) -> Path:
+    return Path(output_dir) / (REPROCESS_JOURNAL_NAME if reprocess else JOURNAL_NAME)
+
+
+class BatchJournal:
+    """Escrita do diário; chamado só pela thread do RenderManager."""
+
+    def __init__(self, output_dir, reprocess: bool = False):
+        self.path = journal_path(output_dir, reprocess)
+        self._file = None
+
+    def open(self, plan: dict | None):
+        """plan=None continua o diário existente (retomada); senão começa um novo."""
+        if plan is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        else:
+            self._file = open(self.path, "w", encoding="utf-8")
+            self._write({"t": "plan", **plan})
+            self.flush()
+
+    def _write(self, entry: dict):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def done(self, filename: str):
+        if self._file is not None:
+            self._write({"t": "done", "file": filename})
+
+    def failed(self, row: int):
+        if self._file is not None:
+            self._write({"t": "fail", "row": row})
+
+    def finished(self):
+        if self._file is not None:
+            self._write({"t": "finished"})
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _latest_journal(output_dir) -> Path:
+    """O diário (lote ou reprocessamento) escrito por último."""
+    paths = [journal_path(output_dir), journal_path(output_dir, reprocess=True)]
+    stamps = []
+    for path in paths:
+        try:
+            stamps.append((path.stat().st_mtime_ns, path))
+        except OSError:
+            continue
+    return max(stamps)[1] if stamps else paths[0]
+
+
+def read_journal(output_dir) -> tuple[dict | None, set[str], bool]:
+    """
+    Retorna (plano, arquivos concluídos que existem no disco, terminou?) do
+    diário mais recente da pasta. plano=None se não houver diário legível.
+    """
+    path = _latest_journal(output_dir)
+    plan, done, finished = None, set(), False
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # linha truncada
+                kind = entry.get("t")
+                if kind == "plan":
+                    plan = entry
+                elif kind == "done":
+                    done.add(entry["file"])
+                elif kind == "finished":
+                    finished = True
+    except OSError:
+        return None, set(), False
+    done = {name for name in done if (Path(output_dir) / name).is_file()}
+    return plan, done, finished
@@ -0,0 +1,71 @@
+# core/manifest.py
+"""
+Manifesto de um lote (<pasta Lote_*>/manifest.json).
+
+Guarda, para cada linha da tabela, a chave de conteúdo do cartão
+(core/render_cache.CardKeyer) e onde ele foi parar: o PNG do cartão (modo
+direto) ou a folha/posição (imposição). Com isso, "Regenerar alterações"
+compara a tabela atual com o lote e refaz só os cartões/folhas que mudaram.
+
+Linhas que falharam ficam com key=None, então a próxima regeneração as
+pega de novo. Gravação atômica (.tmp + os.replace).
+"""
+import json
+import os
+from pathlib import Path
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def manifest_path(output_dir) -> Path:
+    return Path(output_dir) / MANIFEST_NAME
+
+
+def load_manifest(output_dir) -> dict | None:
+    """Manifesto do lote, ou None se não existir/for de outra versão."""
+    path = manifest_path(output_dir)
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != MANIFEST_VERSION:
+        return None
+    return data
+
+
+def write_manifest(output_dir, data: dict):
+    data = dict(data, version=MANIFEST_VERSION)
+    path = manifest_path(output_dir)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def changed_rows(old: dict | None, cards: list[dict], output_dir) -> set[int]:
+    """Modo direto: índices cujo conteúdo/nome mudou ou cujo arquivo sumiu."""
+    old_cards = (old or {}).get("cards", [])
+    changed = set()
+    for i, card in enumerate(cards):
+        prev = old_cards[i] if i < len(old_cards) else None
+        if (prev is None or prev.get("key") is None or prev.get("key") != card["key"]
+                or prev.get("file") != card["file"] or not (Path(output_dir) / card["file"]).exists()):
+            changed.add(i)
+    return changed
+
+
+def changed_sheets(old: dict | None, sheets: dict[str, list], output_dir) -> set[str]:
+    """Imposição: folhas cuja lista de chaves (na ordem) mudou ou cujo arquivo sumiu."""
+    old_sheets = (old or {}).get("sheets", {})
+    return {name for name, keys in sheets.items()
+            if old_sheets.get(name) != keys or None in keys or not (Path(output_dir) / name).exists()}
+
+
+def orphan_files(old: dict | None, new_files: set[str]) -> set[str]:
+    """Arquivos do lote antigo que não fazem mais parte do novo plano."""
+    if not old:
+        return set()
+    old_files = {c["file"] for c in old.get("cards", []) if c.get("file")}
+    old_files.update(old.get("sheets", {}))
+    return old_files - new_files
@@ -0,0 +1,221 @@
+# core/memprof.py
+"""
+Instrumentação de memória opcional para os lotes.
+
+Ativação: GCL_MEMPROF=1 (ou `python main.py --memprof`).
+Com ela ligada, o RenderManager:
+- amostra o RSS do processo em background (pico global);
+- contabiliza os QImage vivos de cada worker (cartões + folha), cuja memória
+  é C++ e não aparece no tracemalloc;
+- registra o RSS ao fim de cada etapa (render, assemble, save) por worker;
+- tira snapshots do tracemalloc no início/fim de cada PageRenderWorker.run
+  e guarda as maiores diferenças (alocações Python);
+- escreve um relatório no log ao final.
+
+A estimativa de pico (`estimate_batch_peak`) roda sempre, antes do lote,
+e serve para avisar quando a memória disponível não deve bastar.
+
+psutil é usado se estiver instalado; sem ele, lê /proc (Linux).
+"""
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+try:
+    import psutil
+except ImportError:  # opcional
+    psutil = None
+
+MEMPROF_ENV = "GCL_MEMPROF"
+SAMPLE_INTERVAL_S = 0.1
+TRACEMALLOC_TOP = 5
+
+_NULL = nullcontext()
+_MB = 1024 * 1024
+
+
+def memprof_enabled() -> bool:
+    return os.environ.get(MEMPROF_ENV, "").strip().lower() not in ("", "0", "false", "no")
+
+
+def current_rss() -> int | None:
+    """RSS atual do processo em bytes (None se não der para medir)."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def available_memory() -> int | None:
+    """Memória disponível no sistema em bytes (None se não der para medir)."""
+    if psutil is not None:
+        return psutil.virtual_memory().available
+    try:
+        with open("/proc/meminfo", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def image_bytes(width: int, height: int, bytes_per_pixel: int = 4) -> int:
+    return width * height * bytes_per_pixel
+
+
+def estimate_batch_peak(canvas_w: int, canvas_h: int, num_threads: int, assembler=None) -> int:
+    """
+    Pico estimado (bytes) além do que o processo já usa.
+    - Direto: por thread, 1 cartão + buffer PNG (~metade do cartão).
+    - Imposição: por thread, `capacity` cartões + folha + cópia escalada de
+      um cartão (QPixmap) + buffer PNG da folha.
+    """
+    card = image_bytes(canvas_w, canvas_h)
+    if assembler is None:
+        per_thread = card + card // 2
+    else:
+        sheet = image_bytes(assembler.sheet_w, assembler.sheet_h)
+        scaled = image_bytes(assembler.card_w_px, assembler.card_h_px)
+        per_thread = assembler.capacity * card + sheet + scaled + sheet // 2
+    return per_thread * num_threads
+
+
+class _WorkerMem:
+    __slots__ = ("live_images", "peak_images", "peak_rss")
+
+    def __init__(self):
+        self.live_images = 0
+        self.peak_images = 0
+        self.peak_rss = 0
+
+
+class MemoryProfiler:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._workers = {}
+        self._stage_peak_rss = {}
+        self._tracemalloc_diffs = {}
+        self._peak_rss = 0
+        self._start_rss = 0
+        self._sampler = None
+        self._stop_event = threading.Event()
+        self._started_tracemalloc = False
+
+    @classmethod
+    def from_env(cls) -> "MemoryProfiler":
+        return cls(memprof_enabled())
+
+    # --- Ciclo de vida ---
+    def start(self):
+        if not self.enabled:
+            return
+        self._start_rss = self._peak_rss = current_rss() or 0
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._stop_event.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, name="MemSampler", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        if not self.enabled or self._sampler is None:
+            return
+        self._stop_event.set()
+        self._sampler.join()
+        self._sampler = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _sample_loop(self):
+        while not self._stop_event.wait(SAMPLE_INTERVAL_S):
+            self._note_rss()
+
+    def _note_rss(self) -> int:
+        rss = current_rss() or 0
+        with self._lock:
+            if rss > self._peak_rss:
+                self._peak_rss = rss
+        return rss
+
+    # --- Contabilidade por worker ---
+    def _worker(self, name) -> _WorkerMem:
+        w = self._workers.get(name)
+        if w is None:
+            w = self._workers[name] = _WorkerMem()
+        return w
+
+    def track_image(self, worker: str, img):
+        """Soma um QImage vivo do worker (cartão ou folha)."""
+        if not self.enabled or img is None:
+            return
+        with self._lock:
+            w = self._worker(worker)
+            w.live_images += img.sizeInBytes()
+            w.peak_images = max(w.peak_images, w.live_images)
+
+    def release_images(self, worker: str):
+        """O worker liberou as imagens da folha/cartão atual."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._worker(worker).live_images = 0
+
+    def stage(self, worker: str, name: str):
+        """Registra o RSS ao fim da etapa (pico por etapa e por worker)."""
+        if not self.enabled:
+            return _NULL
+        return self._stage(worker, name)
+
+    @contextmanager
+    def _stage(self, worker, name):
+        try:
+            yield
+        finally:
+            rss = self._note_rss()
+            with self._lock:
+                self._stage_peak_rss[name] = max(self._stage_peak_rss.get(name, 0), rss)
+                w = self._worker(worker)
+                w.peak_rss = max(w.peak_rss, rss)
+
+    @contextmanager
+    def tracemalloc_window(self, worker: str):
+        """Snapshot do tracemalloc antes/depois (ex.: em volta de PageRenderWorker.run)."""
+        if not self.enabled or not tracemalloc.is_tracing():
+            yield
+            return
+        before = tracemalloc.take_snapshot()
+        try:
+            yield
+        finally:
+            after = tracemalloc.take_snapshot()
+            top = after.compare_to(before, "lineno")[:TRACEMALLOC_TOP]
+            with self._lock:
+                self._tracemalloc_diffs[worker] = [str(stat) for stat in top]
+
+    # --- Relatório ---
+    def format_report(self) -> list[str]:
+        if not self.enabled:
+            return []
+        with self._lock:
+            lines = [f"Pico RSS do processo: {self._peak_rss / _MB:.0f} MB "
+                     f"(início: {self._start_rss / _MB:.0f} MB)"]
+            for name in sorted(self._workers):
+                w = self._workers[name]
+                lines.append(f"{name}: pico de imagens vivas {w.peak_images / _MB:.0f} MB, "
+                             f"RSS máx. observado {w.peak_rss / _MB:.0f} MB")
+            for stage, rss in sorted(self._stage_peak_rss.items()):
+                lines.append(f"etapa {stage}: RSS máx. {rss / _MB:.0f} MB")
+            for worker, stats in sorted(self._tracemalloc_diffs.items()):
+                lines.append(f"tracemalloc ({worker}), maiores diferenças:")
+                lines.extend(f"   {s}" for s in stats)
+        return lines
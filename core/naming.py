@@ -1,9 +1,12 @@
+import hashlib
 import re
 from typing import Dict, Iterable, Set
 
 
 _INVALID_WIN_CHARS = r'<>:"/\\|?*'
 _INVALID_WIN_RE = re.compile(f"[{re.escape(_INVALID_WIN_CHARS)}]")
+_SPACES_RE = re.compile(r"\s+")
+_FIELD_RE = re.compile(r"\{([^{}]+)\}")
 
 
 def sanitize_filename(name: str, replacement: str = "_") -> str:
@@ -16,7 +19,7 @@ def sanitize_filename(name: str, replacement: str = "_") -> str:
     name = _INVALID_WIN_RE.sub(replacement, name)
 
     # colapsa espaços
-    name = re.sub(r"\s+", " ", name).strip()
+    name = _SPACES_RE.sub(" ", name).strip()
 
     # Windows não gosta de nomes terminando com ponto/espaço
     name = name.rstrip(". ").strip()
@@ -25,17 +28,33 @@ def sanitize_filename(name: str, replacement: str = "_") -> str:
     return name or "arquivo"
 
 
+def compile_pattern(pattern: str):
+    """
+    Quebra o padrão uma vez em (trechos fixos, colunas) e retorna uma função
+    row -> texto, equivalente a apply_pattern(pattern, row).
+    """
+    parts = _FIELD_RE.split(pattern)
+    literals = parts[0::2]
+    keys = [key.strip() for key in parts[1::2]]
+    if not keys:
+        return lambda row: pattern
+
+    def render(row: Dict[str, str]) -> str:
+        out = [literals[0]]
+        for key, literal in zip(keys, literals[1:]):
+            out.append(str(row.get(key, "")).strip())
+            out.append(literal)
+        return "".join(out)
+
+    return render
+
+
 def apply_pattern(pattern: str, row: Dict[str, str]) -> str:
     """
     Substitui {coluna} pelos valores da linha.
     Se a coluna não existir, substitui por vazio.
     """
-    def repl(match: re.Match) -> str:
-        key = match.group(1).strip()
-        return str(row.get(key, "")).strip()
-
-    # {nome}, {data}, etc.
-    return re.sub(r"\{([^{}]+)\}", repl, pattern)
+    return compile_pattern(pattern)(row)
 
 
 def unique_filename(base: str, used: Set[str]) -> str:
@@ -64,3 +83,95 @@ def build_output_filename(pattern: str, row: Dict[str, str], used: Set[str]) ->
     raw = apply_pattern(pattern, row)
     base = sanitize_filename(raw)
     return unique_filename(base, used)
+
+
+class FilenameAllocator:
+    """
+    Mesmo resultado de build_output_filename linha a linha, sem o custo
+    quadrático: o padrão é compilado uma vez e cada base guarda o próximo
+    contador a testar (nomes nunca são liberados, então os números abaixo
+    dele já estão ocupados).
+    """
+
+    def __init__(self, pattern: str):
+        self._render = compile_pattern(pattern)
+        self._used: Set[str] = set()
+        self._next: Dict[str, int] = {}
+
+    def base_for(self, row: Dict[str, str]) -> str:
+        return sanitize_filename(self._render(row))
+
+    def allocate(self, row: Dict[str, str]) -> str:
+        return self.claim(self.base_for(row))
+
+    def claim(self, base: str) -> str:
+        """Reserva base (ou base_NN, o primeiro livre) e retorna o nome."""
+        used = self._used
+        if base not in used:
+            used.add(base)
+            return base
+
+        i = self._next.get(base, 1)
+        candidate = f"{base}_{i:02d}"
+        while candidate in used:
+            i += 1
+            candidate = f"{base}_{i:02d}"
+        used.add(candidate)
+        self._next[base] = i + 1
+        return candidate
+
+
+class OutputLayout:
+    """
+    Subpastas do modo direto, para lotes grandes (dezenas de milhares de
+    arquivos numa pasta só deixam o gerenciador de arquivos/backup lentos).
+
+    Spec (texto, salvo no modelo como "output_layout"):
+      ""               tudo na pasta do lote (padrão)
+      "count:1000"     0001/, 0002/... a cada N linhas da tabela
+      "column:{curso}" uma pasta por valor (aceita "{curso}/{turma}")
+      "hash:2"         primeiros N dígitos hex do sha1 do nome (16**N pastas)
+
+    place() devolve o caminho relativo "subpasta/nome" (sempre com "/"); é
+    esse caminho que vai para o manifesto, o diário e o falhas.json. Em
+    "count", inserir uma linha no meio da tabela muda a pasta das seguintes:
+    para lotes que serão atualizados com "Regenerar alterações", prefira
+    "column" ou "hash".
+    """
+
+    KINDS = ("count", "column", "hash")
+
+    def __init__(self, spec: str = ""):
+        self.spec = (spec or "").strip()
+        kind, _, arg = self.spec.partition(":")
+        self.kind = kind.strip().lower() if self.spec else ""
+        arg = arg.strip()
+        if self.kind and self.kind not in self.KINDS:
+            raise ValueError(f"Layout de saída desconhecido: {self.spec!r}")
+        if self.kind == "count":
+            self.per_dir = int(arg or 1000)
+            if self.per_dir < 1:
+                raise ValueError("count: o número de arquivos por pasta deve ser >= 1")
+        elif self.kind == "hash":
+            self.digits = min(max(int(arg or 2), 1), 8)
+        elif self.kind == "column":
+            if not _FIELD_RE.search(arg):
+                raise ValueError("column: informe ao menos uma {coluna}")
+            self._parts = [compile_pattern(part) for part in arg.split("/") if part.strip()]
+
+    def __bool__(self):
+        return bool(self.kind)
+
+    def subdir(self, index: int, row: Dict[str, str], name: str) -> str:
+        """Subpasta (relativa, com "/") da linha `index` (posição na tabela)."""
+        if self.kind == "count":
+            return f"{index // self.per_dir + 1:04d}"
+        if self.kind == "hash":
+            return hashlib.sha1(name.encode("utf-8")).hexdigest()[:self.digits]
+        if self.kind == "column":
+            return "/".join(sanitize_filename(render(row), replacement="_") for render in self._parts)
+        return ""
+
+    def place(self, index: int, row: Dict[str, str], name: str) -> str:
+        sub = self.subdir(index, row, name)
+        return f"{sub}/{name}" if sub else name
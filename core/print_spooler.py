@@ -0,0 +1,198 @@
+# core/print_spooler.py
+"""
+Impressão em paralelo com a geração.
+
+O RenderManager avisa quais folhas vêm (expect), os workers entregam cada
+folha assim que ela fica pronta (submit) e o spooler, numa thread própria,
+manda para a impressora na ordem das páginas. Folhas que chegam fora de
+ordem esperam no buffer; folhas que falharam são puladas (skip).
+
+A folha chega como QImage (sem reler o PNG do disco). Para o buffer não
+crescer sem limite quando a impressora é mais lenta que o render, só
+MAX_IMAGES folhas ficam decodificadas; as demais esperam como bytes do PNG
+(saída em pacote) ou caminho do arquivo e são decodificadas na hora.
+
+QPrintDialog é da thread da interface: a impressora chega aqui já
+configurada. Pintar num QPrinter fora da thread da interface é suportado.
+
+A resolução da impressora é ajustada para o DPI da folha (300): uma folha
+A4 gerada pelo SheetAssembler tem exatamente o tamanho do papel em pixels
+do dispositivo e é desenhada 1:1, sem reamostragem. Se a impressora não
+aceitar a resolução (ou a imagem não for do tamanho do papel, ex. cartões
+do modo direto), cai no desenho escalado para o papel.
+
+print_files_of() e image_size() servem para imprimir (um intervalo de
+páginas de) um lote já gerado sem decodificar os PNGs na thread da interface.
+"""
+import threading
+from collections import deque
+from pathlib import Path
+
+from PySide6.QtCore import QThread, Signal, QSize
+from PySide6.QtGui import QImage, QImageReader, QPainter
+from PySide6.QtPrintSupport import QPrinter
+
+from core.manifest import load_manifest
+from core.sheet_assembler import DPI
+
+# Diferença (px) tolerada entre a imagem e o papel para desenhar 1:1
+_MATCH_TOLERANCE_PX = 2
+
+
+def image_size(path) -> QSize:
+    """Tamanho lido só do cabeçalho (não decodifica a imagem)."""
+    return QImageReader(str(path)).size()
+
+
+def print_files_of(output_dir) -> list[str]:
+    """
+    Arquivos de um lote na ordem de impressão (caminhos relativos): as folhas
+    do manifesto (imposição), os cartões do manifesto (modo direto) ou, sem
+    manifesto, os PNGs da pasta em ordem alfabética.
+    """
+    output_dir = Path(output_dir)
+    manifest = load_manifest(output_dir)
+    if manifest is not None and manifest.get("sheets") is not None:
+        return list(manifest["sheets"])
+    if manifest is not None:
+        return list(dict.fromkeys(card["file"] for card in manifest.get("cards", [])))
+    return sorted(p.relative_to(output_dir).as_posix() for p in output_dir.rglob("*.png"))
+
+
+class PrintSpooler(QThread):
+    log_updated = Signal(str)
+
+    # Folhas decodificadas esperando a vez (as demais ficam como bytes/caminho)
+    MAX_IMAGES = 4
+
+    def __init__(self, printer: QPrinter, dpi: int = DPI):
+        super().__init__()
+        self.printer = printer
+        self.dpi = dpi # Resolução das imagens geradas (SheetAssembler)
+        self.scaled = 0 # Páginas que precisaram ser reamostradas
+        self.printed = 0
+        self._cond = threading.Condition()
+        self._expected = None  # deque de páginas na ordem de impressão
+        self._ready = {}  # página -> QImage | bytes | Path
+        self._skipped = set()
+        self._images = 0
+        self._closed = False  # não chega mais nada (lote terminou)
+        self._cancelled = False
+
+    # --- Chamados pelo RenderManager / workers (qualquer thread) ---
+    def expect(self, pages):
+        """Páginas do lote, na ordem em que devem sair."""
+        with self._cond:
+            self._expected = deque(pages)
+            self._cond.notify_all()
+
+    def submit(self, page, image: QImage | None = None, data: bytes | None = None, path=None):
+        """Folha pronta. Passe o que tiver: a imagem em memória, os bytes do PNG e/ou o arquivo."""
+        with self._cond:
+            if image is not None and (self._images < self.MAX_IMAGES or (data is None and path is None)):
+                self._ready[page] = image
+                self._images += 1
+            elif data is not None:
+                self._ready[page] = data
+            else:
+                self._ready[page] = Path(path)
+            self._cond.notify_all()
+
+    def skip(self, page):
+        """A folha não vai sair (falhou): não segura as seguintes."""
+        with self._cond:
+            self._skipped.add(page)
+            self._cond.notify_all()
+
+    def finish_input(self):
+        """Fim do lote: o que não chegou até aqui é pulado."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def cancel(self):
+        with self._cond:
+            self._cancelled = True
+            self._cond.notify_all()
+
+    # --- Thread do spooler ---
+    def _next(self):
+        """Próxima folha na ordem (bloqueia); None quando acabou ou foi cancelado."""
+        with self._cond:
+            while True:
+                if self._cancelled:
+                    return None
+                if self._expected is not None:
+                    if not self._expected:
+                        return None
+                    page = self._expected[0]
+                    if page in self._ready:
+                        self._expected.popleft()
+                        src = self._ready.pop(page)
+                        if isinstance(src, QImage):
+                            self._images -= 1
+                        return page, src
+                    if page in self._skipped or self._closed:
+                        self._expected.popleft()
+                        continue
+                elif self._closed:
+                    return None
+                self._cond.wait()
+
+    def _draw(self, painter: QPainter, img: QImage):
+        # paperRect (papel físico) e não pageRect: 1 mm na imagem = 1 mm no papel
+        paper = self.printer.paperRect(QPrinter.Unit.DevicePixel)
+        if (abs(img.width() - paper.width()) <= _MATCH_TOLERANCE_PX
+                and abs(img.height() - paper.height()) <= _MATCH_TOLERANCE_PX):
+            painter.drawImage(0, 0, img) # 1:1, sem reamostragem
+        else:
+            painter.drawImage(paper, img)
+            self.scaled += 1
+
+    @staticmethod
+    def _decode(src) -> QImage:
+        if isinstance(src, QImage):
+            return src
+        if isinstance(src, bytes):
+            return QImage.fromData(src)
+        return QImage(str(src))
+
+    def run(self):
+        painter = QPainter()
+        started = False
+        try:
+            while True:
+                item = self._next()
+                if item is None:
+                    break
+                page, src = item
+                img = self._decode(src)
+                if img.isNull():
+                    self.log_updated.emit(f"❌ Falha ao ler a folha {page} para impressão.")
+                    continue
+                if not started:
+                    self.printer.setResolution(self.dpi)
+                    if not painter.begin(self.printer):
+                        self.log_updated.emit("❌ Erro ao iniciar comunicação com a impressora.")
+                        return
+                    started = True
+                elif not self.printer.newPage():
+                    self.log_updated.emit("❌ A impressora recusou uma nova página.")
+                    return
+                self._draw(painter, img)
+                self.printed += 1
+        except Exception as e:
+            self.log_updated.emit(f"❌ Erro durante impressão: {e}")
+            return
+        finally:
+            if started:
+                painter.end()
+        if self.scaled:
+            self.log_updated.emit(f"ℹ️ {self.scaled} página(s) reamostrada(s) para o papel "
+                                  f"(impressora a {self.printer.resolution()} DPI).")
+        if self._cancelled:
+            self.log_updated.emit(f"🖨️ Impressão interrompida ({self.printed} página(s) enviada(s)).")
+        elif self.printed:
+            self.log_updated.emit(f"✅ Envio para impressão concluído! ({self.printed} página(s))")
+        else:
+            self.log_updated.emit("⚠️ Nenhum arquivo gerado para impressão.")
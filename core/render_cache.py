@@ -0,0 +1,251 @@
+# core/render_cache.py
+"""
+Cache persistente de renders, endereçado por conteúdo.
+
+Chave = sha256(impressão digital do modelo + valores usados da linha + perfil de saída).
+- Impressão digital do modelo: o template inteiro com os caminhos de assets
+  trocados pelo hash do conteúdo (core/assets.asset_hash). Editar o modelo ou
+  trocar uma imagem muda a chave, então nada precisa ser invalidado à mão.
+- Valores da linha: só as variáveis que as caixas realmente usam; colunas
+  extras da planilha não atrapalham o acerto.
+- Perfil: formato/tamanho do arquivo (cartão avulso ou folha de imposição)
+  e RENDER_CACHE_VERSION (subir quando o render mudar de saída).
+
+Arquivos em cache/render/<k[:2]>/<k>.png. Um acerto é um hardlink (ou cópia)
+para a pasta do lote. O tamanho é limitado (LRU pelo mtime, que é tocado a
+cada acerto); apagar do cache não afeta lotes que já têm o hardlink.
+
+Configuração: GCL_RENDER_CACHE (pasta, ou 0 para desligar) e
+GCL_RENDER_CACHE_MB (limite, padrão RENDER_CACHE_MAX_MB).
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from core.assets import asset_hash, is_current_background_derivative
+
+RENDER_CACHE_VERSION = 1
+RENDER_CACHE_ENV = "GCL_RENDER_CACHE"
+RENDER_CACHE_SIZE_ENV = "GCL_RENDER_CACHE_MB"
+DEFAULT_CACHE_DIR = Path("cache") / "render"
+RENDER_CACHE_MAX_MB = 2048
+
+_VAR_RE = re.compile(r"\{([a-zA-Z0-9_]+)\}")
+_MB = 1024 * 1024
+
+
+def _hash_asset_field(path) -> str:
+    if not path:
+        return ""
+    try:
+        return asset_hash(Path(path))
+    except OSError:
+        return f"missing:{Path(path).name}"
+
+
+def template_fingerprint(tpl: dict) -> str:
+    """Hash do modelo com os assets representados pelo conteúdo (não pelo caminho)."""
+    data = dict(tpl)
+    for key in ("background_path", "background_render_path"):
+        data[key] = _hash_asset_field(tpl.get(key))
+    if tpl.get("background_render_path") and not is_current_background_derivative(tpl["background_render_path"]):
+        data["background_render_path"] = None  # derivado antigo: o renderizador usa o original
+    sigs = []
+    for sig in tpl.get("signatures", []):
+        sig = dict(sig)
+        for key in ("path", "render_path"):
+            sig[key] = _hash_asset_field(sig.get(key))
+        sigs.append(sig)
+    data["signatures"] = sigs
+    blob = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def template_variables(tpl: dict) -> list[str]:
+    """Variáveis ({nome}) usadas pelas caixas, em ordem estável."""
+    found = set()
+    for box in tpl.get("boxes", []):
+        found.update(_VAR_RE.findall(box.get("html", "")))
+    return sorted(found)
+
+
+class CardKeyer:
+    """Calcula as chaves de cache de um lote (modelo e perfil fixos)."""
+
+    def __init__(self, tpl: dict, profile: dict):
+        self._variables = template_variables(tpl)
+        self._prefix = json.dumps(
+            {"v": RENDER_CACHE_VERSION, "tpl": template_fingerprint(tpl), "profile": profile},
+            sort_keys=True)
+
+    def card_key(self, row_rich: dict) -> str:
+        values = {var: str(row_rich.get(var, "")) for var in self._variables}
+        blob = self._prefix + json.dumps(values, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def sheet_key(self, card_keys: list[str]) -> str:
+        """Folha de imposição: depende dos cartões, na ordem, e da geometria (no perfil)."""
+        blob = self._prefix + "|sheet|" + ",".join(card_keys)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _link_or_copy_atomic(src: Path, dest: Path):
+    """Hardlink (ou cópia) via .tmp + os.replace: nunca expõe um arquivo pela metade."""
+    # rename() entre dois hardlinks do mesmo arquivo não faz nada (e deixaria o .tmp)
+    if dest.exists() and os.path.samefile(src, dest):
+        return
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f"{dest.name}.{threading.get_ident()}.tmp")
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+
+
+class RenderCache:
+    """Cache em disco, thread-safe, com limite de tamanho (LRU)."""
+
+    def __init__(self, root: Path = DEFAULT_CACHE_DIR, max_bytes: int = RENDER_CACHE_MAX_MB * _MB):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = None  # OrderedDict chave -> tamanho (mais antigo primeiro)
+        self._total_bytes = 0
+
+    @classmethod
+    def from_env(cls) -> "RenderCache | None":
+        """None se o cache estiver desligado (GCL_RENDER_CACHE=0)."""
+        root = os.environ.get(RENDER_CACHE_ENV, "").strip()
+        if root.lower() in ("0", "false", "no"):
+            return None
+        size_mb = os.environ.get(RENDER_CACHE_SIZE_ENV, "").strip()
+        max_mb = int(size_mb) if size_mb.isdigit() else RENDER_CACHE_MAX_MB
+        return cls(Path(root) if root else DEFAULT_CACHE_DIR, max_mb * _MB)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.png"
+
+    def _load_index(self):
+        """Lê o que já está no disco uma vez (ordenado por mtime = último uso)."""
+        if self._entries is not None:
+            return
+        found = []
+        if self.root.exists():
+            for sub in self.root.iterdir():
+                if not sub.is_dir():
+                    continue
+                for entry in os.scandir(sub):
+                    if entry.name.endswith(".png"):
+                        st = entry.stat()
+                        found.append((st.st_mtime_ns, entry.name[:-4], st.st_size))
+        found.sort()
+        self._entries = OrderedDict((key, size) for _, key, size in found)
+        self._total_bytes = sum(size for _, _, size in found)
+
+    def fetch(self, key: str, dest: Path) -> bool:
+        """Se a chave existir, materializa em `dest` (hardlink/cópia) e retorna True."""
+        with self._lock:
+            self._load_index()
+            known = key in self._entries
+        src = self._path(key)
+        if known:
+            try:
+                _link_or_copy_atomic(src, Path(dest))
+                os.utime(src)
+            except OSError:
+                known = False
+        with self._lock:
+            if known:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            else:
+                self.misses += 1
+                self._forget(key)
+        return known
+
+    def fetch_bytes(self, key: str) -> bytes | None:
+        """Como fetch(), mas devolve o conteúdo (saída em pacote, core/archive_sink.py)."""
+        with self._lock:
+            self._load_index()
+            known = key in self._entries
+        data = None
+        if known:
+            src = self._path(key)
+            try:
+                data = src.read_bytes()
+                os.utime(src)
+            except OSError:
+                data = None
+        with self._lock:
+            if data is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            else:
+                self.misses += 1
+                self._forget(key)
+        return data
+
+    def store(self, key: str, src: Path):
+        """Guarda um arquivo recém-gerado (hardlink quando possível) e aplica o limite."""
+        dest = self._path(key)
+        try:
+            _link_or_copy_atomic(Path(src), dest)
+            size = dest.stat().st_size
+        except OSError:
+            return
+        self._register(key, size)
+
+    def store_bytes(self, key: str, data: bytes):
+        """Guarda um PNG já codificado na memória (.tmp + os.replace)."""
+        dest = self._path(key)
+        try:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp = dest.with_name(f"{dest.name}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, dest)
+        except OSError:
+            return
+        self._register(key, len(data))
+
+    def _register(self, key: str, size: int):
+        with self._lock:
+            self._load_index()
+            self._forget(key)
+            self._entries[key] = size
+            self._total_bytes += size
+            evicted = self._evict()
+        for path in evicted:
+            path.unlink(missing_ok=True)
+
+    def _forget(self, key):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self) -> list[Path]:
+        evicted = []
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            evicted.append(self._path(key))
+        return evicted
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def format_summary(self) -> str:
+        with self._lock:
+            lookups = self.hits + self.misses
+            rate = self.hits / lookups if lookups else 0.0
+            size = self._total_bytes / _MB
+        return (f"{self.hits}/{lookups} acertos ({rate:.0%}), "
+                f"{size:.0f} de {self.max_bytes / _MB:.0f} MB em disco")
@@ -0,0 +1,247 @@
+# core/render_pool.py
+"""
+Pool de render da sessão: threads que ficam vivas de um lote para o outro.
+
+Cada clique em "Gerar cartões" criava threads novas, relia o modelo e
+montava um NativeRenderer do zero; as caches de fonte/glyph do Qt são por
+thread, então todo lote (mesmo de 5 cartões) começava frio. O pool guarda:
+- as threads (criadas sob demanda, até max_threads + 1 de folga);
+- por modelo, o NativeRenderer já montado (imagens decodificadas) e os
+  CardKeyer do cache; revalidados pelo mtime do JSON e dos assets, então
+  editar o modelo ou trocar uma imagem no disco é pego no próximo uso;
+- o RenderCache da sessão (o índice do disco é lido uma vez só).
+
+Pistas de prioridade: LANE_PREVIEW passa na frente de LANE_BATCH. Além da
+thread de folga, os workers do lote atendem os previews pendentes entre um
+cartão/folha e outro (iter_tasks(between=...)), então o preview da tabela
+não espera o lote acabar. Só o pedido de preview mais recente é renderizado.
+
+As threads são threading.Thread (daemon) e só saem em shutdown_pool().
+"""
+import json
+import threading
+from collections import deque
+from pathlib import Path
+
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtGui import QImage
+
+from core.concurrency import cpu_ceiling
+from core.render_cache import RenderCache, CardKeyer
+from core.renderer_v3 import NativeRenderer
+from core.template_v4 import load_template
+
+LANE_PREVIEW = 0
+LANE_BATCH = 1
+
+_instance = None
+
+
+class LanedQueue:
+    """Fila de jobs (callables) com pistas; a pista de menor número sai primeiro."""
+
+    def __init__(self, lanes: int = 2):
+        self._lanes = [deque() for _ in range(lanes)]
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, lane: int, job):
+        with self._cond:
+            self._lanes[lane].append(job)
+            self._cond.notify()
+
+    def get(self):
+        """Próximo job (bloqueia); None quando o pool foi encerrado."""
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+                for lane in self._lanes:
+                    if lane:
+                        return lane.popleft()
+                self._cond.wait()
+
+    def pop_lane(self, lane: int):
+        """Próximo job de uma pista, sem bloquear (None se vazia)."""
+        with self._cond:
+            return self._lanes[lane].popleft() if self._lanes[lane] else None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+def _asset_paths(tpl: dict) -> list[str]:
+    paths = [tpl.get(key) for key in ("background_path", "background_render_path")]
+    for sig in tpl.get("signatures", []):
+        paths += [sig.get("path"), sig.get("render_path")]
+    return [p for p in paths if p]
+
+
+def _stamp(paths) -> tuple:
+    """mtime de cada arquivo (None se sumiu): muda quando o modelo ou um asset muda."""
+    result = []
+    for p in paths:
+        try:
+            result.append(Path(p).stat().st_mtime_ns)
+        except OSError:
+            result.append(None)
+    return tuple(result)
+
+
+class _ModelEntry:
+    def __init__(self, path: Path):
+        tpl = load_template(path)
+        self.paths = [path] + _asset_paths(tpl)
+        self.stamp = _stamp(self.paths)
+        self.renderer = NativeRenderer(tpl)
+        self.keyers = {}  # perfil (json) -> CardKeyer
+
+
+class RenderPool(QObject):
+    # Emite: (id do pedido, imagem) / (id do pedido, erro)
+    preview_ready = Signal(int, QImage)
+    preview_failed = Signal(int, str)
+    # Emite o worker (core/worker.RenderWorker) cujo run() terminou
+    worker_done = Signal(object)
+
+    def __init__(self, max_threads: int | None = None):
+        super().__init__()
+        self.max_threads = max_threads or cpu_ceiling() # Workers de lote simultâneos
+        self._queue = LanedQueue(2)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._models = {}  # caminho do modelo -> _ModelEntry
+        self._render_cache = None
+        self._render_cache_ready = False
+        self._preview_seq = 0
+        self._batch_jobs = 0
+
+    @classmethod
+    def instance(cls) -> "RenderPool":
+        """Pool da sessão, criado no primeiro uso (na thread da interface)."""
+        global _instance
+        if _instance is None:
+            _instance = cls()
+        return _instance
+
+    # --- Threads ---
+    def _ensure_threads(self):
+        """Uma thread por worker de lote em andamento, mais uma de folga para o preview."""
+        with self._lock:
+            wanted = min(self._batch_jobs, self.max_threads) + 1
+            while len(self._threads) < wanted:
+                t = threading.Thread(target=self._thread_main, name=f"RenderPool-{len(self._threads)}",
+                                     daemon=True)
+                self._threads.append(t)
+                t.start()
+
+    def _thread_main(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            job()
+
+    def run_urgent(self):
+        """Executa agora os previews pendentes (chamado pelos workers entre tarefas)."""
+        while True:
+            job = self._queue.pop_lane(LANE_PREVIEW)
+            if job is None:
+                return
+            job()
+
+    def shutdown(self):
+        self._queue.close()
+        for t in self._threads:
+            t.join(timeout=5)
+        self._threads = []
+
+    # --- Modelos e caches ---
+    def renderer_for(self, template_path) -> NativeRenderer:
+        """NativeRenderer do modelo, remontado só se o JSON ou um asset mudou."""
+        return self._entry(template_path).renderer
+
+    def _entry(self, template_path) -> _ModelEntry:
+        path = Path(template_path).resolve()
+        with self._lock:
+            entry = self._models.get(path)
+        if entry is not None and _stamp(entry.paths) == entry.stamp:
+            return entry
+        entry = _ModelEntry(path)
+        with self._lock:
+            self._models[path] = entry
+        return entry
+
+    def keyer_for(self, renderer: NativeRenderer, profile: dict) -> CardKeyer:
+        """CardKeyer do lote; o hash do modelo é calculado uma vez por modelo/perfil."""
+        with self._lock:
+            entry = next((e for e in self._models.values() if e.renderer is renderer), None)
+        if entry is None:
+            return CardKeyer(renderer.tpl, profile)
+        key = json.dumps(profile, sort_keys=True)
+        keyer = entry.keyers.get(key)
+        if keyer is None:
+            keyer = entry.keyers[key] = CardKeyer(renderer.tpl, profile)
+        return keyer
+
+    def render_cache(self) -> RenderCache | None:
+        """RenderCache da sessão (GCL_RENDER_CACHE* lidos no primeiro uso)."""
+        with self._lock:
+            if not self._render_cache_ready:
+                self._render_cache = RenderCache.from_env()
+                self._render_cache_ready = True
+            return self._render_cache
+
+    # --- Pistas ---
+    def request_preview(self, template_path, row_rich: dict | None = None) -> int:
+        """Renderiza o preview fora da interface; resposta em preview_ready/preview_failed."""
+        with self._lock:
+            self._preview_seq += 1
+            seq = self._preview_seq
+
+        def job():
+            if seq != self._preview_seq:
+                return  # já existe um pedido mais novo
+            try:
+                img = self.renderer_for(template_path).render_preview_image(row_rich)
+            except Exception as e:
+                self.preview_failed.emit(seq, str(e))
+                return
+            self.preview_ready.emit(seq, img)
+
+        self._queue.put(LANE_PREVIEW, job)
+        self._ensure_threads()
+        return seq
+
+    def run_worker(self, worker) -> threading.Event:
+        """
+        Roda worker.run() numa thread do pool (pista de lote). O worker é um
+        RenderWorker (QObject, não QThread). Retorna um Event que fica setado
+        quando ele termina; worker_done(worker) também é emitido.
+        """
+        done = threading.Event()
+
+        def job():
+            try:
+                worker.run()
+            finally:
+                with self._lock:
+                    self._batch_jobs -= 1
+                done.set()
+                self.worker_done.emit(worker)
+
+        with self._lock:
+            self._batch_jobs += 1
+        self._queue.put(LANE_BATCH, job)
+        self._ensure_threads()
+        return done
+
+
+def shutdown_pool():
+    """Encerra o pool da sessão, se foi criado (saída do app)."""
+    global _instance
+    if _instance is not None:
+        _instance.shutdown()
+        _instance = None
@@ -1,14 +1,80 @@
 from PySide6.QtGui import QPainter, QImage, QPixmap, QTextDocument
-from PySide6.QtCore import Qt, QRectF
+from PySide6.QtCore import Qt, QRectF, QBuffer, QIODevice
+import os
 import re
 from pathlib import Path
+from core.assets import load_image, is_current_background_derivative
+from core.stats import StageTimer, measure
+
+
+def encode_png(image: QImage, stats=None) -> bytes:
+    """Codifica em PNG na memória (etapa 'encode')."""
+    with measure(stats, "encode"):
+        buf = QBuffer()
+        buf.open(QIODevice.OpenModeFlag.WriteOnly)
+        image.save(buf, "PNG")
+        return buf.data().data()
+
+
+def write_png(image: QImage, out_path: Path, stats=None):
+    """
+    Codifica em PNG na memória e grava em disco (etapas 'encode' e 'write' separadas).
+    Grava em .tmp e troca com os.replace: o arquivo nunca fica pela metade e,
+    se o destino for um hardlink (cache, linha repetida), os outros nomes
+    continuam apontando para o conteúdo antigo.
+    """
+    data = encode_png(image, stats)
+    with measure(stats, "write"):
+        out_path = Path(out_path)
+        tmp = out_path.with_name(out_path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, out_path)
 
 class NativeRenderer:
     def __init__(self, template_data: dict):
         self.tpl = template_data
+        # Imagens decodificadas uma única vez (e não por cartão)
+        self._bg_image = self._load_background()
+        self._sig_images = self._load_signatures()
+
+    def _load_background(self) -> QImage | None:
+        """Usa o derivado pronto (canvas_size, opaco) se existir; senão o original."""
+        path = self.tpl.get("background_render_path")
+        if not path or not is_current_background_derivative(path):
+            path = self.tpl.get("background_path")
+        if not path:
+            return None
+        return load_image(path)
+
+    def _load_signatures(self) -> list:
+        """
+        Lista de (x, y, QImage) já no tamanho final.
+        Derivados (render_path) são usados 1:1; originais são escalados aqui, uma vez.
+        """
+        result = []
+        for sig in self.tpl.get("signatures", []):
+            render_path = sig.get("render_path")
+            img = load_image(render_path) if render_path else None
+            if img is not None:
+                result.append((sig["x"] + sig.get("render_x", 0), sig["y"] + sig.get("render_y", 0), img))
+                continue
+
+            img = load_image(sig["path"])
+            if img is not None:
+                img = img.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+                scaled = img.scaled(sig["width"], sig["height"],
+                                    Qt.AspectRatioMode.KeepAspectRatio,
+                                    Qt.TransformationMode.SmoothTransformation)
+                result.append((sig["x"], sig["y"], scaled))
+        return result
 
     def render_to_pixmap(self, row_rich: dict = None) -> QPixmap:
         """Gera um QPixmap do cartão (para preview em memória)."""
+        return QPixmap.fromImage(self.render_preview_image(row_rich))
+
+    def render_preview_image(self, row_rich: dict = None) -> QImage:
+        """Como render_to_pixmap, mas em QImage (pode rodar fora da thread da interface)."""
         w = self.tpl["canvas_size"]["w"]
         h = self.tpl["canvas_size"]["h"]
         
@@ -27,9 +93,9 @@ class NativeRenderer:
         finally:
             painter.end()
         
-        return QPixmap.fromImage(image)
+        return image
 
-    def render_row(self, row_plain: dict, row_rich: dict, out_path: Path):
+    def render_row(self, row_plain: dict, row_rich: dict, out_path: Path, stats=None):
         """Renderiza e salva em disco."""
         w = self.tpl["canvas_size"]["w"]
         h = self.tpl["canvas_size"]["h"]
@@ -39,13 +105,13 @@ class NativeRenderer:
 
         painter = QPainter(image)
         try:
-            self._paint_card(painter, row_rich)
+            self._paint_card(painter, row_rich, stats)
         finally:
             painter.end()
 
-        image.save(str(out_path), "PNG")
+        write_png(image, out_path, stats)
 
-    def render_to_qimage(self, row_plain: dict, row_rich: dict) -> QImage:
+    def render_to_qimage(self, row_plain: dict, row_rich: dict, stats=None) -> QImage:
         """Renderiza e retorna QImage em memória (para imposição)."""
         w = self.tpl["canvas_size"]["w"]
         h = self.tpl["canvas_size"]["h"]
@@ -55,60 +121,60 @@ class NativeRenderer:
 
         painter = QPainter(image)
         try:
-            self._paint_card(painter, row_rich)
+            self._paint_card(painter, row_rich, stats)
         finally:
             painter.end()
         return image
 
-    def _paint_card(self, painter: QPainter, row_rich: dict):
-        """Desenha as camadas do cartão."""
+    def _paint_card(self, painter: QPainter, row_rich: dict, stats=None):
+        """Desenha as camadas do cartão (tempos por etapa vão para `stats`, se houver)."""
+        timer = StageTimer()
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
         painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
         painter.setRenderHint(QPainter.RenderHint.TextAntialiasing)
 
-        # 1. CAMADA FUNDO
-        if self.tpl.get("background_path"):
-            bg = QPixmap(self.tpl["background_path"])
-            if not bg.isNull():
-                painter.drawPixmap(0, 0, bg)
+        # 1. CAMADA FUNDO (blit 1:1 da imagem já decodificada)
+        if self._bg_image is not None:
+            with timer.stage("paint"):
+                painter.drawImage(0, 0, self._bg_image)
 
         # 2. CAMADA TEXTO
         for box in self.tpl.get("boxes", []):
             # --- Lógica de Renderização Condicional ---
-            # 1. Encontra quais variáveis ({nome}, {data}) esta caixa está pedindo
-            needed_vars = re.findall(r"\{([a-zA-Z0-9_]+)\}", box["html"])
-            
-            should_skip = False
-            for var in needed_vars:
-                # 2. Busca o valor na linha de dados
-                val = row_rich.get(var, "")
+            with timer.stage("resolve"):
+                # 1. Encontra quais variáveis ({nome}, {data}) esta caixa está pedindo
+                needed_vars = re.findall(r"\{([a-zA-Z0-9_]+)\}", box["html"])
                 
-                # 3. Limpa tags HTML simples para verificar se é só espaço vazio
-                # (Isso evita que um '<b> </b>' seja considerado conteúdo)
-                clean_val = re.sub(r"<[^>]+>", "", str(val)).strip()
-                
-                # 4. Se a variável for vazia, condena a caixa inteira à invisibilidade
-                if not clean_val:
-                    should_skip = True
-                    break
+                should_skip = False
+                for var in needed_vars:
+                    # 2. Busca o valor na linha de dados
+                    val = row_rich.get(var, "")
+                    
+                    # 3. Limpa tags HTML simples para verificar se é só espaço vazio
+                    # (Isso evita que um '<b> </b>' seja considerado conteúdo)
+                    clean_val = re.sub(r"<[^>]+>", "", str(val)).strip()
+                    
+                    # 4. Se a variável for vazia, condena a caixa inteira à invisibilidade
+                    if not clean_val:
+                        should_skip = True
+                        break
             
             if should_skip:
                 continue # Pula para a próxima caixa, ignorando esta
             try:
-                html_resolved = self.resolve_html(box["html"], row_rich)
-                self._draw_html_box(painter, box, html_resolved)
+                with timer.stage("resolve"):
+                    html_resolved = self.resolve_html(box["html"], row_rich)
+                self._draw_html_box(painter, box, html_resolved, timer)
             except Exception as e:
                 print(f"[WARN] Erro ao desenhar caixa de texto: {e}")
                 continue
 
-        # 3. CAMADA ASSINATURA
-        for sig in self.tpl.get("signatures", []):
-            if Path(sig["path"]).exists():
-                pix = QPixmap(sig["path"])
-                scaled = pix.scaled(sig["width"], sig["height"], 
-                                   Qt.AspectRatioMode.KeepAspectRatio, 
-                                   Qt.TransformationMode.SmoothTransformation)
-                painter.drawPixmap(sig["x"], sig["y"], scaled)
+        # 3. CAMADA ASSINATURA (já escaladas/recortadas)
+        with timer.stage("paint"):
+            for (x, y, img) in self._sig_images:
+                painter.drawImage(x, y, img)
+
+        timer.commit(stats)
 
     def resolve_html(self, html: str, row_rich: dict) -> str:
         def repl(match):
@@ -117,9 +183,15 @@ class NativeRenderer:
             return str(row_rich.get(key, ""))
         return re.sub(r"\{([a-zA-Z0-9_]+)\}", repl, html)
 
-    def _draw_html_box(self, painter, box_data, html_text):
-        painter.save()
-        
+    def _draw_html_box(self, painter, box_data, html_text, timer=None):
+        timer = timer or StageTimer()
+        with timer.stage("layout"):
+            doc, y_offset = self._layout_html_box(box_data, html_text)
+        with timer.stage("paint"):
+            self._paint_html_box(painter, box_data, doc, y_offset)
+
+    def _layout_html_box(self, box_data, html_text):
+        """Monta o QTextDocument da caixa e calcula o deslocamento vertical."""
         doc = QTextDocument()
         doc.setDocumentMargin(0) # Remove margens padrão
         
@@ -127,7 +199,9 @@ class NativeRenderer:
         # Isso garante que o texto seja renderizado com a fonte correta mesmo sem style inline
         font_family = box_data.get("font_family", "Arial")
         font_size = box_data.get("font_size", 12)
-        doc.setDefaultStyleSheet(f"body {{ color: black; font-family: '{font_family}'; font-size: {font_size}pt; }}")
+        # [v4] 'css' é a folha do <head> original (vem da tabela de estilos do modelo)
+        doc.setDefaultStyleSheet(f"body {{ color: black; font-family: '{font_family}'; font-size: {font_size}pt; }}"
+                                 + box_data.get("css", ""))
         
         doc.setHtml(html_text)
 
@@ -148,7 +222,6 @@ class NativeRenderer:
         
         w = box_data.get("w", 300)
         h = box_data.get("h", 100)
-        rotation = box_data.get("rotation", 0)
         doc.setTextWidth(w)
         
         # Ajuste Vertical
@@ -158,6 +231,14 @@ class NativeRenderer:
             y_offset = max(0, (h - content_h) / 2)
         elif box_data.get("vertical_align") == "bottom":
             y_offset = max(0, h - content_h)
+        return doc, y_offset
+
+    def _paint_html_box(self, painter, box_data, doc, y_offset):
+        painter.save()
+
+        w = box_data.get("w", 300)
+        h = box_data.get("h", 100)
+        rotation = box_data.get("rotation", 0)
 
         # --- NOVA LÓGICA DE POSICIONAMENTO COM ROTAÇÃO ---
         # 1. Translada para o centro da caixa (X + W/2, Y + H/2)
@@ -91,6 +91,8 @@ class SheetAssembler:
         """
         Recebe uma lista de cartões (até o limite da capacidade)
         e retorna uma QImage única da folha A4 montada.
+        None ocupa a posição em branco (cartão que falhou), para os
+        seguintes não mudarem de lugar.
         """
         # 1. Cria a folha em branco
         sheet = QImage(self.sheet_w, self.sheet_h, QImage.Format_ARGB32)
@@ -112,6 +114,9 @@ class SheetAssembler:
                 
                 # Pega a imagem original
                 original_img = cards[idx]
+                if original_img is None:
+                    idx += 1
+                    continue
                 
                 # Calcula posição X, Y na folha
                 x = self.margin_left + (c * self.card_w_px)
@@ -0,0 +1,141 @@
+# core/stats.py
+"""
+Tempos por etapa do pipeline de render.
+
+Cada worker mede as etapas de cada cartão/folha e registra aqui; o
+RenderManager publica o agregado (count, total, p50, p95, max) pelo sinal
+`stats_updated` e escreve um resumo no log ao final.
+
+Etapas:
+- resolve:  substituição dos placeholders / decisão de pular caixas
+- layout:   montagem do QTextDocument (setHtml, largura, altura)
+- paint:    desenho no QPainter (fundo, textos, assinaturas)
+- assemble: montagem da folha (imposição)
+- encode:   compressão PNG em memória
+- write:    gravação do arquivo no disco
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+STAGES = ("resolve", "layout", "paint", "assemble", "encode", "write")
+
+# Limite de amostras guardadas por etapa para os percentis (reservoir sampling).
+# count/total/max continuam exatos.
+MAX_SAMPLES = 10_000
+
+
+class _StageAccumulator:
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = []
+
+
+class StageStats:
+    """Acumulador thread-safe de tempos por etapa (em segundos)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._rng = random.Random(0)
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            acc = self._stages.get(stage)
+            if acc is None:
+                acc = self._stages[stage] = _StageAccumulator()
+            acc.count += 1
+            acc.total += seconds
+            if seconds > acc.max:
+                acc.max = seconds
+            if len(acc.samples) < MAX_SAMPLES:
+                acc.samples.append(seconds)
+            else:
+                j = self._rng.randrange(acc.count)
+                if j < MAX_SAMPLES:
+                    acc.samples[j] = seconds
+
+    @contextmanager
+    def measure(self, stage: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - t0)
+
+    def snapshot(self) -> dict:
+        """{etapa: {count, total, p50, p95, max}} com tempos em segundos."""
+        with self._lock:
+            items = [(name, acc.count, acc.total, acc.max, list(acc.samples))
+                     for name, acc in self._stages.items()]
+
+        result = {}
+        for name, count, total, mx, samples in items:
+            samples.sort()
+            result[name] = {
+                "count": count,
+                "total": total,
+                "p50": _percentile(samples, 0.50),
+                "p95": _percentile(samples, 0.95),
+                "max": mx,
+            }
+        return result
+
+    def format_summary(self) -> list[str]:
+        """Linhas legíveis (ms) na ordem do pipeline, para o log."""
+        snap = self.snapshot()
+        order = [s for s in STAGES if s in snap] + sorted(s for s in snap if s not in STAGES)
+        lines = []
+        for name in order:
+            s = snap[name]
+            lines.append(f"{name:<9} n={s['count']:<6} total={s['total']:.2f}s  "
+                         f"p50={s['p50'] * 1000:.1f}ms  p95={s['p95'] * 1000:.1f}ms  "
+                         f"max={s['max'] * 1000:.1f}ms")
+        return lines
+
+
+class StageTimer:
+    """
+    Cronômetro local de um cartão/folha: soma o tempo de cada etapa (várias
+    caixas de texto viram um único 'layout'/'paint') e registra tudo de uma vez.
+    """
+    __slots__ = ("times",)
+
+    def __init__(self):
+        self.times = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] = self.times.get(name, 0.0) + (time.perf_counter() - t0)
+
+    def commit(self, stats: "StageStats | None"):
+        if stats is None:
+            return
+        for name, seconds in self.times.items():
+            stats.record(name, seconds)
+
+
+def _percentile(sorted_samples: list, q: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    idx = min(len(sorted_samples) - 1, int(round(q * (len(sorted_samples) - 1))))
+    return sorted_samples[idx]
+
+
+@contextmanager
+def _no_measure():
+    yield
+
+
+def measure(stats: "StageStats | None", stage: str):
+    """Atalho para código que pode rodar sem estatísticas (stats=None)."""
+    return stats.measure(stage) if stats is not None else _no_measure()
@@ -0,0 +1,173 @@
+# core/template_v4.py
+"""
+Formato compacto de modelo (v4).
+
+No v3 cada caixa guarda o `toHtml()` completo do Qt (DOCTYPE, <head>, <style>
+e CSS inline repetido em todo <p>/<span>). No v4:
+- 'styles' é uma tabela compartilhada de trechos CSS (sem duplicatas);
+- cada caixa guarda só o miolo do <body> em 'content', com style="..."
+  trocado por class="sN" (índice na tabela);
+- 'body_style' e 'sheet' apontam para o CSS do <body> e do <style> do <head>.
+
+A migração é sem perdas: `expand_box_html(..., full=True)` reconstrói o HTML
+original byte a byte quando ele veio do Qt.
+"""
+import json
+import os
+import re
+from pathlib import Path
+
+TEMPLATE_FORMAT_VERSION = 4
+
+_QT_DOCTYPE = '<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.0//EN" "http://www.w3.org/TR/REC-html40/strict.dtd">\n'
+_QT_HEAD_RE = re.compile(
+    r'^<!DOCTYPE[^>]*>\n<html><head><meta name="qrichtext" content="1" />'
+    r'<meta charset="utf-8" /><style type="text/css">\n(.*?)</style></head>'
+    r'<body style="([^"]*)">\n(.*)</body></html>$',
+    re.DOTALL,
+)
+_STYLE_ATTR_RE = re.compile(r' style="([^"]*)"')
+_CLASS_REF_RE = re.compile(r' class="s(\d+)"')
+
+
+class _StyleTable:
+    """Tabela de CSS compartilhada (string -> índice estável)."""
+    def __init__(self, styles=None):
+        self.styles = list(styles or [])
+        self._index = {s: i for i, s in enumerate(self.styles)}
+
+    def ref(self, css: str) -> int:
+        idx = self._index.get(css)
+        if idx is None:
+            idx = len(self.styles)
+            self.styles.append(css)
+            self._index[css] = idx
+        return idx
+
+
+def compact_box_html(html: str, table: _StyleTable) -> dict:
+    """
+    Converte o HTML de uma caixa (v3) nos campos compactos do v4.
+    HTML que não veio do Qt é guardado como está em 'content' (sem refs).
+    """
+    m = _QT_HEAD_RE.match(html or "")
+    if not m:
+        return {"content": html or ""}
+
+    sheet_css, body_css, body = m.groups()
+    content = _STYLE_ATTR_RE.sub(lambda sm: f' class="s{table.ref(sm.group(1))}"', body)
+    return {
+        "content": content,
+        "body_style": table.ref(body_css),
+        "sheet": table.ref(sheet_css),
+    }
+
+
+def expand_box_html(box: dict, styles: list, full: bool = False) -> str:
+    """
+    Reconstrói o HTML de uma caixa v4.
+    - full=True: HTML idêntico ao `toHtml()` original (usado pelo editor)
+    - full=False: marcação mínima sem <head> (usada pelo renderizador, que
+      injeta o CSS de 'sheet' via setDefaultStyleSheet)
+    """
+    if "content" not in box:
+        return box.get("html", "")
+
+    content = _CLASS_REF_RE.sub(lambda m: f' style="{styles[int(m.group(1))]}"', box["content"])
+    if "body_style" not in box:
+        return content
+
+    body_css = styles[box["body_style"]]
+    if not full:
+        return f'<html><body style="{body_css}">\n{content}</body></html>'
+
+    sheet_css = styles[box["sheet"]]
+    return (f'{_QT_DOCTYPE}<html><head><meta name="qrichtext" content="1" />'
+            f'<meta charset="utf-8" /><style type="text/css">\n{sheet_css}</style></head>'
+            f'<body style="{body_css}">\n{content}</body></html>')
+
+
+def compact_template(data: dict) -> dict:
+    """Converte um modelo v3 (ou v4) para o formato compacto v4."""
+    if data.get("format_version") == TEMPLATE_FORMAT_VERSION:
+        return data
+
+    out = {k: v for k, v in data.items() if k != "boxes"}
+    table = _StyleTable()
+    boxes = []
+    for b in data.get("boxes", []):
+        nb = {k: v for k, v in b.items() if k not in ("html", "css")}
+        nb.update(compact_box_html(b.get("html", ""), table))
+        boxes.append(nb)
+
+    out["format_version"] = TEMPLATE_FORMAT_VERSION
+    out["styles"] = table.styles
+    out["boxes"] = boxes
+    return out
+
+
+def expand_template(data: dict, full: bool = False) -> dict:
+    """
+    Converte um modelo (v3 ou v4) para a forma de execução: cada caixa
+    com 'html' pronto. No modo mínimo também preenche 'css' (folha do <head>).
+    """
+    if data.get("format_version") != TEMPLATE_FORMAT_VERSION:
+        return data
+
+    styles = data.get("styles", [])
+    out = {k: v for k, v in data.items() if k not in ("boxes", "styles", "format_version")}
+    boxes = []
+    for b in data.get("boxes", []):
+        nb = {k: v for k, v in b.items() if k not in ("content", "body_style", "sheet")}
+        nb["html"] = expand_box_html(b, styles, full=full)
+        if not full and "sheet" in b:
+            nb["css"] = styles[b["sheet"]]
+        boxes.append(nb)
+    out["boxes"] = boxes
+    return out
+
+
+def resolve_asset_paths(data: dict, model_dir: Path) -> dict:
+    """
+    Transforma caminhos relativos de assets em absolutos (relativos à pasta do
+    modelo). A pasta é resolvida, então o resultado não depende do diretório
+    de trabalho nem de quem o usa juntar de novo com a pasta do modelo.
+    """
+    model_dir = Path(model_dir).resolve()
+    for key in ("background_path", "background_render_path"):
+        if data.get(key) and not Path(data[key]).is_absolute():
+            data[key] = str(model_dir / data[key])
+    for sig in data.get("signatures", []):
+        for key in ("path", "render_path"):
+            if sig.get(key) and not Path(sig[key]).is_absolute():
+                sig[key] = str(model_dir / sig[key])
+    return data
+
+
+def read_template_file(json_path: Path) -> dict:
+    """Lê o JSON do modelo como está no disco (v3 ou v4)."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_template(json_path: Path, full_html: bool = False) -> dict:
+    """
+    Carrega um modelo do disco (v3 ou v4) pronto para uso:
+    HTML expandido e caminhos de assets absolutos.
+    """
+    json_path = Path(json_path)
+    data = expand_template(read_template_file(json_path), full=full_html)
+    return resolve_asset_paths(data, json_path.parent)
+
+
+def save_template(json_path: Path, data: dict):
+    """
+    Grava o modelo sempre no formato compacto v4.
+    Escrita atômica (.tmp + os.replace): nunca deixa JSON pela metade e não
+    altera outro modelo que compartilhe o arquivo por hardlink.
+    """
+    json_path = Path(json_path)
+    tmp = json_path.with_name(json_path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(compact_template(data), f, indent=4, ensure_ascii=False)
+    os.replace(tmp, json_path)
@@ -0,0 +1,94 @@
+# core/tracing.py
+"""
+Trace opcional da execução do lote no formato Chrome trace-event
+(abre em chrome://tracing, Perfetto ou speedscope).
+
+Ativação: variável de ambiente GCL_TRACE=1 (ou `python main.py --trace`).
+Desligado, `span()` devolve um contexto vazio compartilhado e nada é gravado.
+
+Cada span vira um evento "X" (completo) com pid/tid da thread que o
+executou; as threads recebem nome (metadado "thread_name") para aparecerem
+como "PageWorker-0", "GUI" etc. no visualizador.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+TRACE_ENV = "GCL_TRACE"
+
+_NULL_SPAN = nullcontext()
+
+
+def tracing_enabled() -> bool:
+    return os.environ.get(TRACE_ENV, "").strip().lower() not in ("", "0", "false", "no")
+
+
+class Tracer:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._events = []
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter_ns()
+        self._pid = os.getpid()
+        self._named_threads = set()
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        return cls(tracing_enabled())
+
+    def _now_us(self) -> float:
+        return (time.perf_counter_ns() - self._t0) / 1000.0
+
+    def name_thread(self, name: str):
+        """
+        Dá nome à thread atual no trace (metadado 'thread_name'), uma vez por
+        thread: no RenderPool a mesma thread pode rodar mais de um worker.
+        """
+        if not self.enabled:
+            return
+        tid = threading.get_ident()
+        with self._lock:
+            if tid in self._named_threads:
+                return
+            self._named_threads.add(tid)
+            self._events.append({"name": "thread_name", "ph": "M", "pid": self._pid,
+                                 "tid": tid, "args": {"name": name}})
+
+    def span(self, name: str, cat: str = "render", **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name, cat, args)
+
+    @contextmanager
+    def _span(self, name, cat, args):
+        start = self._now_us()
+        try:
+            yield
+        finally:
+            event = {"name": name, "cat": cat, "ph": "X", "ts": start,
+                     "dur": self._now_us() - start, "pid": self._pid,
+                     "tid": threading.get_ident()}
+            if args:
+                event["args"] = args
+            with self._lock:
+                self._events.append(event)
+
+    def write(self, path: Path) -> Path | None:
+        """Grava o JSON do trace. Retorna o caminho (ou None se desligado)."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            events = list(self._events)
+        path = Path(path)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return path
+
+
+def trace_path_for(output_dir: Path) -> Path:
+    """Lote_AA.MM.DD_... -> Lote_AA.MM.DD_....trace.json (ao lado da pasta)."""
+    output_dir = Path(output_dir)
+    return output_dir.parent / f"{output_dir.name}.trace.json"
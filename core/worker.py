@@ -1,13 +1,192 @@
 # core/worker.py
-from PySide6.QtCore import QThread, Signal, QObject
+from PySide6.QtCore import QThread, Signal, QObject, QTimer
 from PySide6.QtGui import QImage
 from pathlib import Path
-import os
+import json
 import math
-from core.naming import build_output_filename
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import datetime
+from core.naming import FilenameAllocator, OutputLayout
 from core.sheet_assembler import SheetAssembler
+from core.renderer_v3 import write_png, encode_png
+from core.assets import link_or_copy
+from core.stats import StageStats, measure
+from core.tracing import Tracer, trace_path_for
+from core.memprof import MemoryProfiler, available_memory, estimate_batch_peak
+from core.render_cache import RenderCache, CardKeyer
+from core.journal import BatchJournal
+from core.archive_sink import ArchiveSink
+from core.manifest import load_manifest, write_manifest, changed_rows, changed_sheets, orphan_files
+from core.concurrency import (SharedTaskQueue, AdaptiveConcurrency, iter_tasks, memory_budget,
+                              max_workers_for, cpu_ceiling)
 
-class PageRenderWorker(QThread):
+BATCH_LOG_NAME = "lote.log"
+FAILURE_REPORT_NAME = "falhas.json"
+# Novas tentativas por cartão/folha antes de registrar a falha
+DEFAULT_RETRIES = 1
+
+# Gerentes parados cujos workers ainda não saíram (ver RenderManager.stop)
+_stopping_managers = set()
+
+
+def run_with_retry(fn, retries: int):
+    """Executa fn(); em exceção tenta de novo até `retries` vezes e relança a última."""
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception:
+            if attempt >= retries:
+                raise
+
+
+def failure_record(row_index: int, card: str, filename: str, exc: Exception, stage: str, attempts: int,
+                   page: int | None = None) -> dict:
+    """
+    Entrada do falhas.json. `row` é 1-based, na ordem das linhas do lote;
+    `card` é o nome do cartão (sem extensão) e `filename` o arquivo que não
+    foi gerado (o PNG do cartão, ou a folha na imposição).
+    """
+    return {
+        "row": row_index + 1,
+        "card": card,
+        "filename": filename,
+        "page": page,
+        "stage": stage,
+        "error": f"{type(exc).__name__}: {exc}",
+        "attempts": attempts,
+        "traceback": "".join(traceback.format_exception(exc)),
+    }
+
+
+class ProgressBuffer:
+    """
+    Conclusões acumuladas por um worker entre dois flushes do RenderManager.
+    Substitui um sinal por cartão: o worker só anexa aqui e o gerente drena
+    tudo num timer (FLUSH_INTERVAL_MS), então 20k cartões não viram 20k
+    eventos atravessando threads.
+    """
+
+    def __init__(self):
+        self._items = []  # (num_cartoes, nome_arquivo, msg_log)
+        self._failures = []  # failure_record(...)
+        self._lock = threading.Lock()
+
+    def add(self, num_cards: int, filename: str, msg: str):
+        with self._lock:
+            self._items.append((num_cards, filename, msg))
+
+    def fail(self, record: dict):
+        with self._lock:
+            self._failures.append(record)
+
+    def drain(self) -> tuple[list, list]:
+        """Retorna (concluídos, falhas) desde o último dreno."""
+        with self._lock:
+            items, self._items = self._items, []
+            failures, self._failures = self._failures, []
+        return items, failures
+
+
+class SharedCardImages:
+    """
+    Cartões repetidos na imposição: a QImage renderizada é reaproveitada
+    (por qualquer worker) enquanto ainda houver cópias pendentes daquela
+    linha. Só chaves com mais de um uso entram; o nº de imagens guardadas é
+    limitado para o pool não virar um vazamento em lotes muito repetidos.
+    """
+    MAX_IMAGES = 64
+
+    def __init__(self, uses: Counter):
+        self._remaining = {key: n for key, n in uses.items() if n > 1}
+        self._images = {}
+        self._lock = threading.Lock()
+        self.reused = 0
+
+    def get(self, key):
+        """QImage já renderizada para a chave (e consome um uso), ou None."""
+        with self._lock:
+            img = self._images.get(key)
+            if img is not None:
+                self.reused += 1
+                self._consume(key)
+            return img
+
+    def put(self, key, img):
+        """Registra o render da chave (que também consome um uso)."""
+        with self._lock:
+            if key not in self._remaining:
+                return
+            self._consume(key)
+            if key in self._remaining and len(self._images) < self.MAX_IMAGES:
+                self._images[key] = img
+
+    def release(self, keys):
+        """Usos que não vão passar por get/put (ex.: a folha inteira veio do cache)."""
+        with self._lock:
+            for key in keys:
+                if key in self._remaining:
+                    self._consume(key)
+
+    def _consume(self, key):
+        self._remaining[key] -= 1
+        if self._remaining[key] <= 0:
+            del self._remaining[key]
+            self._images.pop(key, None)
+
+
+class RenderWorker(QObject):
+    """
+    Base dos workers de lote. O worker não é uma thread: run() roda numa
+    thread do RenderPool ou numa WorkerThread (lote sem pool). `done` fica
+    setado quando run() termina, nos dois casos.
+    """
+    # Conclusões e falhas vão para self.progress (ver ProgressBuffer)
+    error_occurred = Signal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.progress = ProgressBuffer()
+        self.between_tasks = None # RenderPool.run_urgent quando roda no pool (previews no meio do lote)
+        self.done = threading.Event()
+        self._is_running = True
+        self._retiring = False
+
+    def stop(self):
+        self._is_running = False
+
+    def retire(self):
+        """Termina a tarefa atual e não pega outra (o lote continua nos demais workers)."""
+        self._retiring = True
+
+    def _should_stop(self):
+        return not self._is_running or self._retiring
+
+    def run(self):
+        try:
+            self._run()
+        finally:
+            self.done.set()
+
+    def _run(self):
+        raise NotImplementedError
+
+
+class WorkerThread(QThread):
+    """QThread dedicada a um worker (lote sem RenderPool)."""
+
+    def __init__(self, worker: RenderWorker):
+        super().__init__()
+        self.worker = worker
+        self.setObjectName(worker.objectName())
+
+    def run(self):
+        self.worker.run()
+
+
+class PageRenderWorker(RenderWorker):
     """
     O Operário de Folhas.
     Diferente das versões anteriores, este worker recebe PACOTES DE FOLHAS.
@@ -18,119 +197,349 @@ class PageRenderWorker(QThread):
     
     Isso elimina completamente a necessidade de sincronização ou buffers no Gerente.
     """
-    # Emite: (numero_cartoes_processados, nome_arquivo_gerado, msg_log)
-    page_finished = Signal(int, str, str) 
-    error_occurred = Signal(str)
 
-    def __init__(self, tasks, renderer, output_dir, imposition_settings):
+    def __init__(self, tasks, renderer, output_dir, imposition_settings, stats=None, tracer=None, memprof=None,
+                 retries=DEFAULT_RETRIES, cache=None, keyer=None, shared_images=None, sink=None, spooler=None):
         super().__init__()
-        self.tasks = tasks # Lista de pacotes de página
+        self.tasks = tasks # Lista (ou SharedTaskQueue) de pacotes de página
         self.renderer = renderer
         self.output_dir = output_dir
+        self.stats = stats # StageStats compartilhado (opcional)
+        self.tracer = tracer or Tracer() # Trace desligado por padrão
+        self.memprof = memprof or MemoryProfiler() # Perfil de memória desligado por padrão
+        self.retries = retries
+        self.cache = cache # RenderCache (opcional) + CardKeyer do lote
+        self.keyer = keyer
+        self.shared_images = shared_images # SharedCardImages (linhas repetidas), opcional
+        self.sink = sink # ArchiveSink: folhas vão para o ZIP/TAR em vez de arquivos soltos
+        self.spooler = spooler # PrintSpooler: cada folha pronta já segue para a impressora
         
         # Cada worker tem seu próprio montador para segurança total de thread
         w_mm = imposition_settings.get("target_w_mm", 100)
         h_mm = imposition_settings.get("target_h_mm", 150)
         self.assembler = SheetAssembler(w_mm, h_mm)
-        
-        self._is_running = True
 
-    def stop(self):
-        self._is_running = False
+    def _run(self):
+        name = self.objectName() or "PageRenderWorker"
+        self.tracer.name_thread(name)
+        with self.memprof.tracemalloc_window(name):
+            self._run_pages(name)
 
-    def run(self):
+    def _run_pages(self, name):
+        mem = self.memprof
         try:
-            for page_task in self.tasks:
-                if not self._is_running: break
-
+            for page_task in iter_tasks(self.tasks, self._should_stop, self.between_tasks):
                 # page_task contém: 
-                # { "page_num": int, "cards": [ (row_plain, row_rich, filename), ... ] }
-                
-                page_num = page_task["page_num"]
-                cards_data = page_task["cards"]
-                
-                # 1. Renderiza os cartões desta folha em memória
-                card_images = []
-                for (r_plain, r_rich, fname) in cards_data:
-                    img = self.renderer.render_to_qimage(r_plain, r_rich)
+                # { "page_num": int, "cards": [ (row_index, row_plain, row_rich, filename), ... ] }
+                try:
+                    self._render_page(name, page_task)
+                finally:
+                    mem.release_images(name)
+
+        except Exception as e:
+            self.error_occurred.emit(f"Erro no Worker: {str(e)}\n{traceback.format_exc()}")
+
+    def _render_page(self, name, page_task):
+        """Uma folha. Cartão com erro fica de fora da folha; erro na folha marca todos os cartões dela."""
+        mem = self.memprof
+        attempts = self.retries + 1
+        page_num = page_task["page_num"]
+        cards_data = page_task["cards"]
+
+        out_name = page_task["output_filename"]
+        out_path = self.output_dir / out_name
+
+        card_keys = [self.keyer.card_key(c[2]) for c in cards_data] if self.keyer is not None else None
+
+        # 0. Folha idêntica já gerada em outro lote?
+        sheet_key = None
+        if self.cache is not None:
+            sheet_key = self.keyer.sheet_key(card_keys)
+            with self.tracer.span("cache_lookup", page=page_num):
+                if self.sink is not None:
+                    data = self.cache.fetch_bytes(sheet_key)
+                    hit = data is not None
+                    if hit:
+                        self.sink.add(out_name, data)
+                else:
+                    hit = self.cache.fetch(sheet_key, out_path)
+            if hit:
+                if self.shared_images is not None:
+                    self.shared_images.release(card_keys) # senão as imagens ficam presas até o fim do lote
+                self._spool(page_num, data=data if self.sink is not None else None, path=out_path)
+                self.progress.add(len(cards_data), out_name, f"🖨️  FOLHA {page_num:02d} OK (cache, {len(cards_data)} itens)")
+                return
+
+        # 1. Renderiza os cartões desta folha em memória
+        card_images, placed = [], []
+        for i, (row_idx, r_plain, r_rich, fname) in enumerate(cards_data):
+            key = card_keys[i] if card_keys is not None else None
+            if key is not None and self.shared_images is not None:
+                img = self.shared_images.get(key)
+                if img is not None:
                     card_images.append(img)
-                
-                # 2. Monta a folha usando o Assembler
+                    placed.append((row_idx, fname))
+                    continue
+
+            def render():
+                with self.tracer.span("card_render", card=fname), mem.stage(name, "render"):
+                    return self.renderer.render_to_qimage(r_plain, r_rich, stats=self.stats)
+            try:
+                img = run_with_retry(render, self.retries)
+            except Exception as e:
+                self.progress.fail(failure_record(row_idx, fname, out_name, e, "render", attempts, page_num))
+                card_images.append(None) # posição fica em branco: slot do manifesto = posição na folha
+                continue
+            mem.track_image(name, img)
+            if key is not None and self.shared_images is not None:
+                self.shared_images.put(key, img)
+            card_images.append(img)
+            placed.append((row_idx, fname))
+
+        if not placed:
+            self._spool(page_num)
+            return
+
+        sheet = []
+
+        def assemble_and_save():
+            # 2. Monta a folha usando o Assembler
+            with self.tracer.span("sheet_assembly", page=page_num), measure(self.stats, "assemble"), \
+                    mem.stage(name, "assemble"):
                 sheet_img = self.assembler.render_sheet(card_images)
-                
-                # 3. Salva
-                # Padrão de nome: NOME_DO_PRIMEIRO_ARQUIVO_Folha_XX.png
-                # Ou pega o padrão do gerenciador. Vamos usar um padrão limpo.
-                # Como 'cards_data' tem o nome individual, vamos pegar o prefixo comum ou usar o padrão.
-                # Simplificação: Usamos o nome do primeiro cartão como base ou um nome genérico da tarefa.
-                
-                # Para manter consistência com o Manager, o nome do arquivo foi passado na task?
-                # Vamos ajustar o Manager para mandar o nome da folha.
-                out_name = page_task["output_filename"]
-                out_path = self.output_dir / out_name
-                
-                sheet_img.save(str(out_path))
-                
-                # 4. Reporta sucesso
-                msg = f"🖨️  FOLHA {page_num:02d} OK ({len(card_images)} itens)"
-                self.page_finished.emit(len(card_images), out_name, msg)
-                
-                # Limpa memória explicitamente (embora Python faça garbage collection)
-                card_images.clear()
-                del sheet_img
+            mem.track_image(name, sheet_img)
+            sheet[:] = [sheet_img]
+            # 3. Salva
+            with self.tracer.span("save", file=out_name), mem.stage(name, "save"):
+                if self.sink is None:
+                    write_png(sheet_img, out_path, self.stats)
+                    return None
+                data = encode_png(sheet_img, self.stats)
+                with measure(self.stats, "write"):
+                    self.sink.add(out_name, data)
+                return data
 
+        try:
+            data = run_with_retry(assemble_and_save, self.retries)
         except Exception as e:
-            import traceback
-            self.error_occurred.emit(f"Erro no Worker: {str(e)}\n{traceback.format_exc()}")
+            for row_idx, fname in placed:
+                self.progress.fail(failure_record(row_idx, fname, out_name, e, "sheet", attempts, page_num))
+            self._spool(page_num)
+            return
+        self._spool(page_num, sheet[0], data, out_path)
+        # Folha com cartão faltando não entra no cache (a chave é da folha completa)
+        if sheet_key is not None and len(placed) == len(cards_data):
+            if data is not None:
+                self.cache.store_bytes(sheet_key, data)
+            else:
+                self.cache.store(sheet_key, out_path)
+
+        # 4. Reporta sucesso
+        msg = f"🖨️  FOLHA {page_num:02d} OK ({len(placed)} itens)"
+        self.progress.add(len(placed), out_name, msg)
+
+    def _spool(self, page_num, image=None, data=None, path=None):
+        """Entrega a folha ao spooler de impressão (sem nada = folha não saiu, pular)."""
+        if self.spooler is None:
+            return
+        if image is None and data is None and path is None:
+            self.spooler.skip(page_num)
+        else:
+            self.spooler.submit(page_num, image, data, None if self.sink is not None else path)
 
 
-class DirectRenderWorker(QThread):
+class DirectRenderWorker(RenderWorker):
     """
     Operário Clássico (Um cartão = Um arquivo).
     Usado quando a imposição está DESLIGADA.
     """
-    card_finished = Signal(str)
-    error_occurred = Signal(str)
 
-    def __init__(self, chunk_data, renderer, output_dir):
+    def __init__(self, chunk_data, renderer, output_dir, stats=None, tracer=None, memprof=None,
+                 retries=DEFAULT_RETRIES, cache=None, keyer=None, sink=None):
         super().__init__()
-        self.chunk_data = chunk_data # Lista de (row_plain, row_rich, filename)
+        # Lista (ou SharedTaskQueue) de (row_index, row_plain, row_rich, filename, cópias);
+        # cópias = [(row_index, filename)] de linhas repetidas, materializadas por hardlink
+        self.chunk_data = chunk_data
         self.renderer = renderer
         self.output_dir = output_dir
-        self._is_running = True
-
-    def stop(self):
-        self._is_running = False
+        self.stats = stats # StageStats compartilhado (opcional)
+        self.tracer = tracer or Tracer() # Trace desligado por padrão
+        self.memprof = memprof or MemoryProfiler() # Perfil de memória desligado por padrão
+        self.retries = retries
+        self.cache = cache # RenderCache (opcional) + CardKeyer do lote
+        self.keyer = keyer
+        self.sink = sink # ArchiveSink: cartões vão para o ZIP/TAR em vez de arquivos soltos
 
-    def run(self):
+    def _run(self):
+        name = self.objectName() or "DirectRenderWorker"
+        self.tracer.name_thread(name)
         try:
-            for (row_plain, row_rich, filename) in self.chunk_data:
-                if not self._is_running: break
-                
+            for (row_idx, row_plain, row_rich, filename, copies) in iter_tasks(self.chunk_data, self._should_stop,
+                                                                                   self.between_tasks):
                 out_path = self.output_dir / f"{filename}.png"
-                self.renderer.render_row(row_plain, row_rich, out_path)
-                self.card_finished.emit(f"{filename}.png")
+                try:
+                    data = self._produce_card(name, row_plain, row_rich, filename, out_path)
+                except Exception as e:
+                    for idx, fname in [(row_idx, filename)] + copies:
+                        self.progress.fail(failure_record(idx, fname, f"{fname}.png", e, "render", self.retries + 1))
+                    continue
+                self.progress.add(1, f"{filename}.png", "")
+                self._materialize_copies(out_path, copies, data)
         except Exception as e:
             self.error_occurred.emit(str(e))
 
+    def _produce_card(self, name, row_plain, row_rich, filename, out_path):
+        """
+        Cache (se houver) ou render + gravação, com novas tentativas.
+        Retorna os bytes do PNG quando a saída é um pacote (sink), senão None.
+        """
+        key = None
+        if self.cache is not None:
+            key = self.keyer.card_key(row_rich)
+            with self.tracer.span("cache_lookup", card=filename):
+                if self.sink is not None:
+                    data = self.cache.fetch_bytes(key)
+                    if data is not None:
+                        self.sink.add(f"{filename}.png", data)
+                        return data
+                elif self.cache.fetch(key, out_path):
+                    return None
+        try:
+            data = run_with_retry(lambda: self._render_card(name, row_plain, row_rich, filename, out_path),
+                                  self.retries)
+        finally:
+            self.memprof.release_images(name)
+        if key is not None:
+            if data is not None:
+                self.cache.store_bytes(key, data)
+            else:
+                self.cache.store(key, out_path)
+        return data
+
+    def _materialize_copies(self, out_path, copies, data=None):
+        """Linhas repetidas viram hardlinks (ou cópias) do arquivo já gerado; no pacote, os mesmos bytes."""
+        for row_idx, fname in copies:
+            dup_path = self.output_dir / f"{fname}.png"
+            try:
+                if data is not None:
+                    self.sink.add(f"{fname}.png", data)
+                else:
+                    dup_path.unlink(missing_ok=True)
+                    link_or_copy(out_path, dup_path)
+            except OSError as e:
+                self.progress.fail(failure_record(row_idx, fname, f"{fname}.png", e, "duplicate", 1))
+                continue
+            self.progress.add(1, f"{fname}.png", "")
+
+    def _render_card(self, name, row_plain, row_rich, filename, out_path):
+        mem = self.memprof
+        # Mesmo que render_row, separado em duas etapas para o trace
+        with self.tracer.span("card_render", card=filename), mem.stage(name, "render"):
+            img = self.renderer.render_to_qimage(row_plain, row_rich, stats=self.stats)
+        mem.track_image(name, img)
+        with self.tracer.span("save", file=out_path.name), mem.stage(name, "save"):
+            if self.sink is None:
+                write_png(img, out_path, self.stats)
+                return None
+            data = encode_png(img, self.stats)
+            with measure(self.stats, "write"):
+                self.sink.add(f"{filename}.png", data)
+            return data
+
 
 class RenderManager(QObject):
     """
     O Gerente Logístico.
     Agora ele PREPARA os pacotes antes de chamar os operários.
+
+    Os pacotes ficam numa fila compartilhada (core/concurrency.py). Com
+    num_threads=None o nº de workers é automático: limitado pelo orçamento de
+    memória (memory_budget_mb / GCL_MEMORY_BUDGET_MB) e ajustado durante o
+    lote pelo throughput medido. num_threads fixo desliga o ajuste.
+
+    Cada cartão/folha tem tratamento de erro próprio (com `retries` novas
+    tentativas): uma linha ruim vira uma entrada no falhas.json da pasta do
+    lote e o resto continua. Para reprocessar só as falhas, passe as linhas
+    com `row_numbers` (índices originais) e `card_names` (nomes já usados).
+
+    Antes de renderizar, cada cartão (ou folha) é procurado no cache
+    persistente (core/render_cache.py); use_cache=False desliga.
+    Linhas repetidas no lote são renderizadas uma vez só.
+
+    Ao terminar, grava o manifest.json do lote (core/manifest.py). Com
+    patch=True, output_dir é um lote existente: só os cartões/folhas que
+    mudaram em relação ao manifesto são refeitos, e arquivos que saíram do
+    plano são apagados.
+
+    Todo lote escreve um journal.jsonl (core/journal.py); reprocessamento e
+    patch escrevem journal_reprocesso.jsonl. Para retomar um lote
+    interrompido, recrie o gerente com o plano do diário e resume_done =
+    arquivos já concluídos; eles são pulados.
+
+    layout (modo direto) distribui os cartões em subpastas (ver
+    core/naming.OutputLayout); os nomes de arquivo passam a ser caminhos
+    relativos à pasta do lote, inclusive no manifesto e no diário.
+
+    archive={"format": "zip"|"tar", "split_mb": N} grava os PNGs direto num
+    pacote na pasta do lote (core/archive_sink.py), sem arquivos soltos.
+    Não combina com patch (o lote em pacote não tem os arquivos para
+    comparar); retomar refaz o pacote inteiro.
+
+    pool (core/render_pool.RenderPool) roda os workers nas threads da
+    sessão em vez de QThreads novas e reaproveita o RenderCache e os
+    CardKeyer entre lotes; pool=None mantém as QThreads por lote.
+
+    spooler (core/print_spooler.PrintSpooler, já com a impressora
+    configurada) imprime durante o lote: na imposição cada folha segue para
+    a impressora assim que fica pronta, na ordem; no modo direto os cartões
+    são enviados ao final.
     """
     progress_updated = Signal(int)
     log_updated = Signal(str)
     finished_process = Signal()
+    # Fim de um stop(): os workers saíram e pacote/diário/logs foram fechados
+    stopped = Signal()
     error_occurred = Signal(str)
+    # Emite: {etapa: {count, total, p50, p95, max}} (segundos) - ver core/stats.py
+    stats_updated = Signal(dict)
 
-    def __init__(self, renderer, rows_plain, rows_rich, output_dir, filename_pattern, imposition_settings=None):
+    # Intervalo mínimo entre emissões de stats_updated durante o lote
+    STATS_INTERVAL_S = 1.0
+    # Progresso e log dos workers são drenados neste intervalo (10 Hz)
+    FLUSH_INTERVAL_MS = 100
+
+    def __init__(self, renderer, rows_plain, rows_rich, output_dir, filename_pattern, imposition_settings=None,
+                 num_threads=None, memory_budget_mb=None, retries=DEFAULT_RETRIES, row_numbers=None,
+                 card_names=None, use_cache=True, patch=False, template_path=None, resume_done=None,
+                 layout="", archive=None, spooler=None, pool=None):
         super().__init__()
+        self.num_threads = num_threads # None = automático (memória + throughput)
+        self.memory_budget_mb = memory_budget_mb # None = GCL_MEMORY_BUDGET_MB ou fração da memória livre
         self.renderer = renderer
         self.rows_plain = rows_plain
         self.rows_rich = rows_rich
         self.output_dir = output_dir
         self.pattern = filename_pattern
+        self.retries = retries
+        # Índices das linhas no lote original (reprocessamento) e nomes fixos dos cartões
+        self.row_numbers = list(row_numbers) if row_numbers is not None else list(range(len(rows_plain)))
+        self.card_names = card_names
+        self.use_cache = use_cache
+        self.patch = patch
+        self.template_path = template_path # Só informativo, vai para o manifesto/diário
+        self._manifest = None
+        self.resume_done = resume_done # set de arquivos já gerados (retomada) ou None
+        self.layout = OutputLayout(layout) # Subpastas do modo direto ("" = pasta única)
+        self.archive = archive if not patch else None # {"format", "split_mb"} ou None = PNGs soltos
+        self.sink = None
+        self.spooler = spooler # PrintSpooler (impressão durante o lote) ou None
+        self.pool = pool # RenderPool da sessão ou None (QThreads por lote)
+        self._threads = {} # worker -> WorkerThread (lote sem pool)
+        self.journal = BatchJournal(self.output_dir, reprocess=self.card_names is not None or self.patch)
+        self.render_cache = None
+        self._keyer = None
+        self._shared_images = None
+        self.duplicates_saved = 0
         
         self.imposition_settings = imposition_settings or {"enabled": False}
         self.is_imposition = self.imposition_settings.get("enabled", False)
@@ -139,42 +548,83 @@ class RenderManager(QObject):
         self.total_cards = len(rows_plain)
         self.cards_done = 0
         self.generated_files = [] # Lista para guardar os caminhos dos arquivos gerados
+        self.failures = [] # failure_record(...) de cada cartão que não saiu
         self._is_running = False
+        self._stopping = False
+        self.stats = StageStats()
+        self._last_stats_emit = 0.0
+        self.tracer = Tracer()
+        self.memprof = MemoryProfiler()
+        self._task_queue = None
+        self._spawn_worker = None
+        self._adaptive = None
+        self._batch_log = None
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setInterval(self.FLUSH_INTERVAL_MS)
+        self._flush_timer.timeout.connect(self._flush_progress)
 
     def start(self):
         self._is_running = True
+        self._stopping = False
         self.cards_done = 0
         self.generated_files = []
+        self.failures = []
         self.workers = []
+        self.stats = StageStats()
+        self._last_stats_emit = time.monotonic()
+        # Trace opcional (GCL_TRACE=1 / --trace), gravado ao lado da pasta do lote
+        self.tracer = Tracer.from_env()
+        self.tracer.name_thread("GUI / RenderManager")
+        # Perfil de memória opcional (GCL_MEMPROF=1 / --memprof)
+        self.memprof = MemoryProfiler.from_env()
+        self.memprof.start()
+        self._open_batch_log()
         
-        self.log_updated.emit("📋 Planejando produção...")
+        self._log("📋 Planejando produção...")
+        self._open_journal()
+        self.render_cache = None
+        if self.use_cache:
+            self.render_cache = self.pool.render_cache() if self.pool is not None else RenderCache.from_env()
+        if self.render_cache is not None:
+            self.render_cache.reset_stats()
+        self._threads = {}
+        if self.pool is not None:
+            self.pool.worker_done.connect(self._on_pool_worker_done)
+        self._shared_images = None
+        self.duplicates_saved = 0
+        self._manifest = None
+        self._rerun_plan = None
+        self._open_sink()
         
         # 1. Gera todos os nomes de arquivo virtuais
-        all_tasks_data = [] # Lista de tuplas (plain, rich, filename)
-        used_names = set()
+        all_tasks_data = [] # Lista de tuplas (row_index, plain, rich, filename)
+        names = FilenameAllocator(self.pattern)
         for i, row in enumerate(self.rows_plain):
-            fname = build_output_filename(self.pattern, row, used_names)
-            all_tasks_data.append( (self.rows_plain[i], self.rows_rich[i], fname) )
-
-        cpu_count = os.cpu_count() or 4
-        # Usa (Núcleos - 2) para deixar o sistema respirar
-        num_threads = max(1, cpu_count - 2)
+            if self.card_names is not None:
+                fname = self.card_names[i]
+            else:
+                fname = names.allocate(row)
+                if self.layout and not self.is_imposition:
+                    fname = self.layout.place(self.row_numbers[i], row, fname)
+            all_tasks_data.append( (self.row_numbers[i], self.rows_plain[i], self.rows_rich[i], fname) )
 
         if self.is_imposition:
-            self._start_imposition_mode(all_tasks_data, num_threads)
+            self._start_imposition_mode(all_tasks_data)
         else:
-            self._start_direct_mode(all_tasks_data, num_threads)
+            self._start_direct_mode(all_tasks_data)
+        self._flush_timer.start()
 
-    def _start_imposition_mode(self, all_data, num_threads):
+    def _start_imposition_mode(self, all_data):
         # 1. Instancia um assembler temporário só para descobrir a capacidade da folha
         w_mm = self.imposition_settings.get("target_w_mm", 100)
         h_mm = self.imposition_settings.get("target_h_mm", 150)
         temp_asm = SheetAssembler(w_mm, h_mm)
         capacity = temp_asm.capacity
+        self._prepare_keys({"kind": "sheet", "target_mm": [w_mm, h_mm],
+                            "sheet": [temp_asm.sheet_w, temp_asm.sheet_h, temp_asm.cols, temp_asm.rows]})
         
         total_pages = math.ceil(len(all_data) / capacity)
-        self.log_updated.emit(f"📚 Modo Imposição: {len(all_data)} cartões cabem em {total_pages} folhas (Capacidade: {capacity}/fl).")
-        self.log_updated.emit(f"🚀 Distribuindo trabalho para {num_threads} threads...")
+        self._log(f"📚 Modo Imposição: {len(all_data)} cartões cabem em {total_pages} folhas (Capacidade: {capacity}/fl).")
 
         # 2. Cria os pacotes de PÁGINAS (Jobs)
         # pages_jobs será uma lista de dicionários
@@ -197,76 +647,555 @@ class RenderManager(QObject):
             }
             pages_jobs.append(job)
 
-        # 3. Distribui os pacotes de páginas entre as threads (Round Robin ou Chunk)
-        # Vamos dividir a lista de páginas igualmente
-        chunk_size = math.ceil(total_pages / num_threads)
-        
-        for i in range(num_threads):
-            start = i * chunk_size
-            end = start + chunk_size
-            worker_tasks = pages_jobs[start:end]
-            
-            if not worker_tasks: continue
-            
-            w = PageRenderWorker(worker_tasks, self.renderer, self.output_dir, self.imposition_settings)
-            w.page_finished.connect(self._on_page_finished)
-            w.error_occurred.connect(self.error_occurred)
-            w.finished.connect(self._check_all_finished)
-            
-            self.workers.append(w)
-            w.start()
+        # Manifesto: folha/posição de cada linha; em patch, só folhas que mudaram
+        keys = [self._card_key(task[2]) for task in all_data]
+        cards = [{"key": keys[i], "card": task[3], "file": pages_jobs[i // capacity]["output_filename"],
+                  "page": i // capacity + 1, "slot": i % capacity} for i, task in enumerate(all_data)]
+        sheets = {job["output_filename"]: keys[(job["page_num"] - 1) * capacity:
+                                               (job["page_num"] - 1) * capacity + len(job["cards"])]
+                  for job in pages_jobs}
+        self._plan_manifest("imposition", cards, sheets)
+        if self.patch:
+            old = load_manifest(self.output_dir)
+            todo = changed_sheets(old, sheets, self.output_dir)
+            self._remove_orphans(old, set(sheets))
+            pages_jobs = [job for job in pages_jobs if job["output_filename"] in todo]
+            self._log(f"🩹 Regenerar alterações: {len(pages_jobs)} de {total_pages} folhas mudaram.")
+        if self.resume_done is not None:
+            pages_jobs = [job for job in pages_jobs if job["output_filename"] not in self.resume_done]
+            self._log(f"⏯️ Retomando: faltam {len(pages_jobs)} de {total_pages} folhas.")
+        self.total_cards = sum(len(job["cards"]) for job in pages_jobs)
+        if self.spooler is not None:
+            self.spooler.expect([job["page_num"] for job in pages_jobs])
+            self.spooler.start()
 
-    def _start_direct_mode(self, all_data, num_threads):
-        self.log_updated.emit(f"🚀 Modo Direto: Processando {len(all_data)} arquivos em {num_threads} threads...")
-        
-        chunk_size = math.ceil(len(all_data) / num_threads)
-        
-        for i in range(num_threads):
-            start = i * chunk_size
-            end = start + chunk_size
-            chunk = all_data[start:end]
-            
-            if not chunk: continue
-            
-            w = DirectRenderWorker(chunk, self.renderer, self.output_dir)
-            w.card_finished.connect(self._on_direct_card_finished)
-            w.error_occurred.connect(self.error_occurred)
-            w.finished.connect(self._check_all_finished)
-            
+        if self._keyer is not None:
+            uses = Counter(self._card_key(c[2]) for job in pages_jobs for c in job["cards"])
+            repeated = sum(n - 1 for n in uses.values())
+            if repeated:
+                self._shared_images = SharedCardImages(uses)
+                self._log(f"♻️ {repeated} linha(s) repetida(s): a imagem do cartão será reaproveitada.")
+
+        # 3. As páginas vão para a fila compartilhada; cada worker puxa a próxima
+        def spawn(i):
+            w = PageRenderWorker(self._task_queue, self.renderer, self.output_dir, self.imposition_settings,
+                                 self.stats, self.tracer, self.memprof, self.retries, self.render_cache, self._keyer,
+                                 self._shared_images, self.sink, self.spooler)
+            w.setObjectName(f"PageWorker-{i}")
+            return w
+
+        num_threads = self._plan_concurrency(pages_jobs, spawn, temp_asm)
+        self._log(f"🚀 Distribuindo trabalho para {num_threads} threads...")
+        self._launch_workers(num_threads)
+
+    def _start_direct_mode(self, all_data):
+        canvas = self.renderer.tpl.get("canvas_size", {})
+        self._prepare_keys({"kind": "card", "format": "png", "size": [canvas.get("w"), canvas.get("h")]})
+
+        cards = [{"key": self._card_key(task[2]), "card": task[3], "file": f"{task[3]}.png"} for task in all_data]
+        self._plan_manifest("direct", cards)
+        if self.patch:
+            old = load_manifest(self.output_dir)
+            todo = changed_rows(old, cards, self.output_dir)
+            self._remove_orphans(old, {c["file"] for c in cards})
+            all_data = [task for i, task in enumerate(all_data) if i in todo]
+            self._log(f"🩹 Regenerar alterações: {len(all_data)} de {len(cards)} cartões mudaram.")
+        if self.resume_done is not None:
+            all_data = [task for task in all_data if f"{task[3]}.png" not in self.resume_done]
+            self._log(f"⏯️ Retomando: faltam {len(all_data)} de {len(cards)} cartões.")
+        self.total_cards = len(all_data)
+        if self.sink is None:
+            self._make_subdirs(all_data)
+        all_data = self._group_duplicates(all_data)
+
+        def spawn(i):
+            w = DirectRenderWorker(self._task_queue, self.renderer, self.output_dir, self.stats, self.tracer,
+                                   self.memprof, self.retries, self.render_cache, self._keyer, self.sink)
+            w.setObjectName(f"DirectWorker-{i}")
+            return w
+
+        num_threads = self._plan_concurrency(all_data, spawn)
+        self._log(f"🚀 Modo Direto: Processando {len(all_data)} arquivos em {num_threads} threads...")
+        self._launch_workers(num_threads)
+
+    def _prepare_keys(self, profile):
+        """Chaves de conteúdo do lote (cache e linhas repetidas); hash do modelo calculado uma vez, aqui."""
+        try:
+            if self.pool is not None:
+                self._keyer = self.pool.keyer_for(self.renderer, profile)
+            else:
+                self._keyer = CardKeyer(self.renderer.tpl, profile)
+        except Exception as e:
+            self._log(f"[AVISO] Cache de render e deduplicação desligados neste lote: {e}")
+            self._keyer = None
+            self.render_cache = None
+
+    def _card_key(self, row_rich):
+        return self._keyer.card_key(row_rich) if self._keyer is not None else None
+
+    # --- Manifesto do lote ---
+    def _plan_manifest(self, mode, cards, sheets=None):
+        """
+        Rascunho do manifesto (gravado no fim). Reprocessar falhas guarda só as
+        linhas refeitas, que são mescladas no manifesto do lote no fim.
+        """
+        if self.card_names is not None:
+            self._rerun_plan = (cards, sheets)
+            return
+        self._manifest = {
+            "mode": mode,
+            "pattern": self.pattern,
+            "template_path": str(self.template_path) if self.template_path else None,
+            "imposition_settings": self.imposition_settings if self.is_imposition else None,
+            "layout": self.layout.spec,
+            "archive": self.archive,
+            "cards": cards,
+        }
+        if sheets is not None:
+            self._manifest["sheets"] = sheets
+
+    # --- Diário (retomada) ---
+    def _open_journal(self):
+        """Novo lote: grava o plano. Retomada: continua o diário existente."""
+        plan = None
+        if self.resume_done is None:
+            plan = {
+                "pattern": self.pattern,
+                "template_path": str(self.template_path) if self.template_path else None,
+                "imposition_settings": self.imposition_settings,
+                "layout": self.layout.spec,
+                "archive": self.archive,
+                "patch": self.patch,
+                "row_numbers": self.row_numbers,
+                "card_names": self.card_names,
+                "rows_plain": self.rows_plain,
+                "rows_rich": self.rows_rich,
+            }
+        try:
+            self.journal.open(plan)
+        except OSError as e:
+            self._log(f"[AVISO] Não foi possível gravar o diário do lote (sem retomada): {e}")
+
+    def _remove_orphans(self, old, new_files):
+        root = Path(self.output_dir)
+        for name in orphan_files(old, new_files):
+            path = root / name
+            try:
+                path.unlink(missing_ok=True)
+            except OSError as e:
+                self._log(f"[AVISO] Não foi possível apagar {name}: {e}")
+                continue
+            if path.parent != root:
+                try:
+                    path.parent.rmdir() # só sai se ficou vazia
+                except OSError:
+                    pass
+
+    # --- Saída em pacote (ZIP/TAR) ---
+    def _open_sink(self):
+        """Pacote <pasta do lote>.zip/.tar (reprocessamento: <pasta>_reprocesso.*)."""
+        name = Path(self.output_dir).name + ("_reprocesso" if self.card_names is not None else "")
+        try:
+            self.sink = ArchiveSink.from_settings(self.output_dir, name, self.archive)
+        except ValueError as e:
+            self._log(f"[AVISO] {e}; gravando PNGs soltos.")
+            self.sink = None
+
+    def _close_sink(self):
+        if self.sink is None:
+            return
+        try:
+            parts = self.sink.close()
+        except OSError as e:
+            self._log(f"❌ [ERRO] Não foi possível finalizar o pacote: {e}")
+            return
+        if self._manifest is not None:
+            self._manifest["archive_parts"] = [p.name for p in parts]
+        names = ", ".join(p.name for p in parts)
+        self._log(f"📦 {self.sink.entries} arquivo(s) em {len(parts)} pacote(s): {names}")
+
+    # --- Impressão ---
+    def _finish_spooler(self):
+        """Imposição: avisa que não vem mais folha. Modo direto: envia os cartões agora."""
+        if self.spooler is None:
+            return
+        if not self.is_imposition:
+            files = list(self.generated_files)
+            self.spooler.expect(range(len(files)))
+            for i, name in enumerate(files):
+                self.spooler.submit(i, path=Path(self.output_dir) / name)
+            self.spooler.start()
+        self.spooler.finish_input()
+
+    def _make_subdirs(self, all_data):
+        """Cria as subpastas do layout uma vez no planejamento (os workers só gravam)."""
+        root = Path(self.output_dir)
+        for sub in {Path(task[3]).parent for task in all_data} - {Path(".")}:
+            (root / sub).mkdir(parents=True, exist_ok=True)
+
+    def _write_manifest(self):
+        """Grava o manifesto; linhas que falharam ficam sem chave (refeitas na próxima vez)."""
+        if self._rerun_plan is not None:
+            self._update_rerun_manifest()
+            return
+        if self._manifest is None:
+            return
+        cards = self._manifest["cards"]
+        sheets = self._manifest.get("sheets")
+        for rec in self.failures:
+            card = cards[rec["row"] - 1]
+            card["key"] = None
+            if sheets is not None:
+                sheets[card["file"]][card["slot"]] = None
+        self._manifest["created"] = datetime.now().isoformat(timespec="seconds")
+        try:
+            write_manifest(self.output_dir, self._manifest)
+        except OSError as e:
+            self._log(f"[AVISO] Não foi possível gravar o manifesto do lote: {e}")
+
+    def _update_rerun_manifest(self):
+        """
+        Reprocessamento: as linhas refeitas com sucesso ganham a chave (e, na
+        imposição, a folha _reprocesso/posição) no manifesto do lote; as que
+        falharam de novo continuam sem chave.
+        """
+        manifest = load_manifest(self.output_dir)
+        if manifest is None:
+            return
+        cards, sheets = self._rerun_plan
+        by_row = dict(zip(self.row_numbers, cards))
+        failed = {rec["row"] - 1 for rec in self.failures}
+        for row in failed:
+            card = by_row.get(row)
+            if card is not None:
+                card["key"] = None
+                if sheets is not None:
+                    sheets[card["file"]][card["slot"]] = None
+        old_cards = manifest["cards"]
+        for row, card in by_row.items():
+            if row not in failed and card["key"] is not None and row < len(old_cards):
+                old_cards[row] = card
+        if sheets is not None:
+            manifest.setdefault("sheets", {}).update(
+                (name, keys) for name, keys in sheets.items() if any(k is not None for k in keys))
+        if self.sink is not None:
+            parts = manifest.setdefault("archive_parts", [])
+            parts += [p.name for p in self.sink.parts if p.name not in parts]
+        try:
+            write_manifest(self.output_dir, manifest)
+        except OSError as e:
+            self._log(f"[AVISO] Não foi possível atualizar o manifesto do lote: {e}")
+
+    def _group_duplicates(self, all_data):
+        """
+        Modo direto: uma tarefa por conteúdo único, com as linhas repetidas
+        penduradas como cópias [(row_index, filename)].
+        """
+        groups = {}
+        unique = []
+        for task in all_data:
+            key = self._keyer.card_key(task[2]) if self._keyer is not None else id(task)
+            first = groups.get(key)
+            if first is None:
+                first = groups[key] = task + ([],)
+                unique.append(first)
+            else:
+                first[4].append((task[0], task[3]))
+        repeated = len(all_data) - len(unique)
+        if repeated:
+            self.duplicates_saved = repeated
+            self._log(f"♻️ {repeated} linha(s) repetida(s): renderizadas uma vez e gravadas como hardlink.")
+        return unique
+
+    def _emit_dedup_summary(self):
+        if self._shared_images is not None:
+            self.duplicates_saved = self._shared_images.reused
+        if self.duplicates_saved:
+            self._log(f"♻️ Linhas repetidas: {self.duplicates_saved} render(s) economizado(s).")
+
+    def _emit_cache_summary(self):
+        if self.render_cache is not None:
+            self._log(f"💾 Cache de render: {self.render_cache.format_summary()}")
+
+    # --- Concorrência ---
+    def _plan_concurrency(self, tasks, spawn, assembler=None):
+        """Monta a fila e decide quantos workers começam (e o teto, se automático)."""
+        self._task_queue = SharedTaskQueue(tasks)
+        self._spawn_worker = spawn
+        self._adaptive = None
+        if self.num_threads:
+            num_threads = max(1, min(self.num_threads, len(tasks)))
+            if self.pool is not None:
+                num_threads = min(num_threads, self.pool.max_threads)
+            self._warn_if_low_memory(num_threads, assembler)
+            return num_threads
+
+        canvas = self.renderer.tpl.get("canvas_size", {})
+        per_worker = estimate_batch_peak(canvas.get("w", 0), canvas.get("h", 0), 1, assembler)
+        budget = memory_budget(self.memory_budget_mb)
+        cap = max_workers_for(per_worker, budget, len(tasks) or 1)
+        if self.pool is not None:
+            cap = min(cap, self.pool.max_threads)
+        self._adaptive = AdaptiveConcurrency(cap)
+        mb = 1024 * 1024
+        limit = "memória" if cap < min(cpu_ceiling(), len(tasks) or 1) else "CPU/tarefas"
+        self._log(f"🧮 Concorrência automática: teto de {cap} threads (limite: {limit}; "
+                  f"~{per_worker / mb:.0f} MB por thread, orçamento {budget / mb:.0f} MB)")
+        self._warn_if_low_memory(cap, assembler)
+        return self._adaptive.current
+
+    def _launch_workers(self, count):
+        for _ in range(count):
+            w = self._spawn_worker(len(self.workers))
+            w.error_occurred.connect(self._on_worker_error)
             self.workers.append(w)
-            w.start()
+            if self.pool is not None:
+                w.between_tasks = self.pool.run_urgent
+                self.pool.run_worker(w)
+            else:
+                thread = self._threads[w] = WorkerThread(w)
+                thread.finished.connect(self._check_all_finished)
+                thread.start()
+
+    def _worker_finished(self, w):
+        return w.done.is_set()
+
+    def _on_pool_worker_done(self, w):
+        if w in self.workers:
+            self._check_all_finished()
+
+    def _release_pool(self):
+        if self.pool is not None:
+            try:
+                self.pool.worker_done.disconnect(self._on_pool_worker_done)
+            except (RuntimeError, TypeError):
+                pass
+
+    # --- Progresso e log ---
+    def _open_batch_log(self):
+        """Log completo (uma linha por arquivo) em <pasta do lote>/lote.log."""
+        try:
+            self._batch_log = open(Path(self.output_dir) / BATCH_LOG_NAME, "a", encoding="utf-8")
+        except OSError as e:
+            self._batch_log = None
+            self.log_updated.emit(f"[AVISO] Não foi possível criar o {BATCH_LOG_NAME}: {e}")
+
+    def _close_batch_log(self):
+        if self._batch_log is not None:
+            self._batch_log.close()
+            self._batch_log = None
+
+    def _write_batch_log(self, msg):
+        if self._batch_log is not None:
+            self._batch_log.write(f"{time.strftime('%H:%M:%S')} {msg}\n")
+
+    def _log(self, msg):
+        """Mensagem para o painel e para o lote.log."""
+        self._write_batch_log(msg)
+        self.log_updated.emit(msg)
+
+    def _flush_progress(self):
+        """
+        Drena o que os workers concluíram desde o último flush: o lote.log
+        recebe todas as linhas, o painel recebe um resumo por flush.
+        """
+        if not self._is_running: return
+        items, failures = [], []
+        for w in self.workers:
+            done, failed = w.progress.drain()
+            items.extend(done)
+            failures.extend(failed)
+        if not items and not failures:
+            return
+        with self.tracer.span("signal:flush_progress", cat="signal", items=len(items)):
+            for num_cards, filename, msg in items:
+                self.cards_done += num_cards
+                self.generated_files.append(filename)
+                self.journal.done(filename)
+                self._write_batch_log(msg or f"[{self.cards_done}/{self.total_cards}] Salvo: {filename}")
+
+            if self.is_imposition:
+                # Poucas folhas por flush: mostra cada uma
+                for _, _, msg in items:
+                    self.log_updated.emit(msg)
+            elif items:
+                extra = f" (+{len(items) - 1})" if len(items) > 1 else ""
+                self.log_updated.emit(f"[{self.cards_done}/{self.total_cards}] Salvo: {items[-1][1]}{extra}")
+
+            for rec in failures:
+                self.failures.append(rec)
+                self.journal.failed(rec["row"])
+                self._write_batch_log(f"[FALHA] linha {rec['row']} ({rec['card']}): {rec['traceback']}")
+                self.log_updated.emit(f"❌ [FALHA] linha {rec['row']} ({rec['card']}): {rec['error']}")
+
+            self.journal.flush()
+            self._update_progress()
+            self._adapt_concurrency(len(items) + len(failures))
+
+    def _write_failure_report(self):
+        """Grava <pasta do lote>/falhas.json (ou remove um antigo se não houve falhas)."""
+        path = Path(self.output_dir) / FAILURE_REPORT_NAME
+        if not self.failures:
+            path.unlink(missing_ok=True)
+            return
+        report = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "pattern": self.pattern,
+            "imposition": bool(self.is_imposition),
+            "total_rows": self.total_cards,
+            "failed_rows": len(self.failures),
+            "failures": sorted(self.failures, key=lambda rec: rec["row"]),
+        }
+        try:
+            path.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        except OSError as e:
+            self._log(f"[AVISO] Não foi possível gravar o {FAILURE_REPORT_NAME}: {e}")
+            return
+        self._log(f"⚠️ {len(self.failures)} de {self.total_cards} cartões falharam. Detalhes em {FAILURE_REPORT_NAME}.")
+
+    def _on_worker_error(self, msg):
+        self._write_batch_log(f"[ERRO] {msg}")
+        self.error_occurred.emit(msg)
+
+    def _active_workers(self):
+        return [w for w in self.workers if not self._worker_finished(w) and not w._retiring]
+
+    def _adapt_concurrency(self, events=1):
+        """Aplica o nº de workers pedido pelo AdaptiveConcurrency (só no modo automático)."""
+        if self._adaptive is None:
+            return
+        target = self._adaptive.observe(self.cards_done, events=events)
+        active = self._active_workers()
+        if target > len(active) and len(self._task_queue):
+            self._launch_workers(min(target - len(active), len(self._task_queue)))
+        elif target < len(active):
+            # Nunca aposenta o último; os demais terminam a tarefa atual e saem
+            for w in active[target:] if target >= 1 else active[1:]:
+                w.retire()
+        else:
+            return
+        self._log(f"🧮 Concorrência ajustada: {self._adaptive.describe()}")
+
+    def _warn_if_low_memory(self, num_threads, assembler=None):
+        """Avisa antes de começar se o pico estimado passa da memória disponível."""
+        canvas = self.renderer.tpl.get("canvas_size", {})
+        peak = estimate_batch_peak(canvas.get("w", 0), canvas.get("h", 0), num_threads, assembler)
+        avail = available_memory()
+        mb = 1024 * 1024
+        if self.memprof.enabled:
+            avail_txt = f"{avail / mb:.0f} MB" if avail is not None else "desconhecida"
+            self._log(f"🧠 Pico estimado do lote: {peak / mb:.0f} MB (disponível: {avail_txt})")
+        if avail is not None and peak > avail:
+            self._log(f"⚠️ [AVISO] Memória: o pico estimado ({peak / mb:.0f} MB com {num_threads} threads) "
+                      f"passa da memória disponível ({avail / mb:.0f} MB). Risco de falta de memória.")
+
+    def _emit_memory_report(self):
+        self.memprof.stop()
+        lines = self.memprof.format_report()
+        if lines:
+            self._log("🧠 Memória:")
+            for line in lines:
+                self._log(f"   {line}")
 
     def stop(self):
+        """
+        Pede para os workers pararem e volta na hora (não bloqueia a
+        interface). Cada worker termina a tarefa atual; quando o último sai,
+        _check_all_finished fecha pacote, diário e logs e emite `stopped`.
+        """
+        if not self._is_running:
+            return # já terminou ou já está parando
+        self._flush_timer.stop()
+        self._flush_progress()
         self._is_running = False
-        self.log_updated.emit("🛑 Parando threads...")
+        self._stopping = True
+        self._log("🛑 Parando threads...")
         for w in self.workers:
             w.stop()
-            w.quit()
-            w.wait()
+        if self.spooler is not None:
+            self.spooler.cancel()
+            self.spooler.wait() # no máximo a página que está sendo desenhada
+        _stopping_managers.add(self) # vivo até os workers saírem, mesmo se o app trocar de gerente
+        self._check_all_finished()
 
-    def _on_page_finished(self, num_cards, filename, msg):
-        if not self._is_running: return
-        self.cards_done += num_cards
-        self.log_updated.emit(msg)
-        self.generated_files.append(filename)
-        self._update_progress()
+    def wait(self):
+        """
+        Bloqueia até os workers saírem; depois de um stop(), faz a limpeza
+        na hora (e emite `stopped`) em vez de esperar o event loop. Para a
+        saída do app, quando não haverá event loop depois.
+        """
+        for w in self.workers:
+            w.done.wait()
+        for thread in self._threads.values():
+            thread.wait()
+        self._check_all_finished()
 
-    def _on_direct_card_finished(self, filename):
-        if not self._is_running: return
-        self.cards_done += 1
-        self.log_updated.emit(f"[{self.cards_done}/{self.total_cards}] Salvo: {filename}")
-        self.generated_files.append(filename)
-        self._update_progress()
+    def _finish_stop(self):
+        _stopping_managers.discard(self)
+        self._release_pool()
+        self._write_trace()
+        self._emit_memory_report()
+        self._close_sink()
+        self._write_failure_report()
+        self.journal.close()
+        self._log("🛑 Lote interrompido.")
+        self._close_batch_log()
+        self.stopped.emit()
+
+    def _write_trace(self):
+        try:
+            path = self.tracer.write(trace_path_for(self.output_dir))
+        except OSError as e:
+            self._log(f"[AVISO] Não foi possível gravar o trace: {e}")
+            return
+        if path:
+            self._log(f"🧭 Trace salvo em: {path.name}")
 
     def _update_progress(self):
-        # Garante que não passe de 100%
-        done = min(self.cards_done, self.total_cards)
-        percent = int((done / self.total_cards) * 100)
+        # Garante que não passe de 100% (falhas também contam como processadas)
+        done = min(self.cards_done + len(self.failures), self.total_cards)
+        percent = int((done / self.total_cards) * 100) if self.total_cards else 100
         self.progress_updated.emit(percent)
 
+        now = time.monotonic()
+        if now - self._last_stats_emit >= self.STATS_INTERVAL_S:
+            self._last_stats_emit = now
+            self.stats_updated.emit(self.stats.snapshot())
+
+    def _emit_stats_summary(self):
+        """Publica o agregado final e escreve o resumo por etapa no log."""
+        self.stats_updated.emit(self.stats.snapshot())
+        lines = self.stats.format_summary()
+        if lines:
+            self._log("⏱️ Tempos por etapa:")
+            for line in lines:
+                self._log(f"   {line}")
+
     def _check_all_finished(self):
-        if all(w.isFinished() for w in self.workers):
-            if self._is_running:
+        if all(self._worker_finished(w) for w in self.workers):
+            if self._stopping:
+                if self in _stopping_managers:
+                    self._finish_stop()
+            elif self._is_running:
+                self._release_pool()
+                self._flush_timer.stop()
+                self._flush_progress()
+                self._is_running = False # os demais avisos de fim (uma thread cada) não refazem isto
                 self.progress_updated.emit(100)
+                self._emit_stats_summary()
+                self._emit_cache_summary()
+                self._emit_dedup_summary()
+                self._emit_memory_report()
+                self._write_trace()
+                self._close_sink()
+                self._finish_spooler()
+                self._write_failure_report()
+                self._write_manifest()
+                self.journal.finished()
+                self.journal.close()
                 self.finished_process.emit()
-                self.log_updated.emit("✅ Processo finalizado com sucesso!")
\ No newline at end of file
+                if self.failures:
+                    self._log(f"⚠️ Processo finalizado com {len(self.failures)} falha(s).")
+                else:
+                    self._log("✅ Processo finalizado com sucesso!")
+                self._close_batch_log()
\ No newline at end of file
@@ -9,12 +9,34 @@ os.environ.setdefault("XMODIFIERS", "@im=ibus")
 
 from PySide6.QtWidgets import QApplication
 from app_window import MainWindow
+from core.render_pool import shutdown_pool
 
 
 def main():
+    # --trace: grava um trace (Chrome trace-event) de cada lote ao lado da pasta Lote_*
+    if "--trace" in sys.argv:
+        sys.argv.remove("--trace")
+        os.environ["GCL_TRACE"] = "1"
+    # --memprof: amostra RSS/imagens/tracemalloc e mostra o relatório de memória no log
+    if "--memprof" in sys.argv:
+        sys.argv.remove("--memprof")
+        os.environ["GCL_MEMPROF"] = "1"
+
+    # --resume <pasta Lote_*>: retoma um lote interrompido pelo journal.jsonl
+    resume_dir = None
+    if "--resume" in sys.argv:
+        i = sys.argv.index("--resume")
+        resume_dir = sys.argv[i + 1] if i + 1 < len(sys.argv) else None
+        del sys.argv[i:i + 2]
+
     app = QApplication(sys.argv)
     w = MainWindow()
+    # Nesta ordem: o lote para (e grava diário/log) antes de o pool encerrar as threads
+    app.aboutToQuit.connect(w.stop_batch)
+    app.aboutToQuit.connect(shutdown_pool)
     w.show()
+    if resume_dir:
+        w.resume_batch(resume_dir)
     sys.exit(app.exec())
 
 
@@ -1,9 +1,11 @@
 # ui/editor/canvas_items.py
 from PySide6.QtWidgets import (QGraphicsLineItem, QGraphicsRectItem, QGraphicsTextItem, 
-                               QGraphicsItem, QInputDialog, QLineEdit, QGraphicsPixmapItem)
+                               QGraphicsItem, QInputDialog, QLineEdit, QGraphicsPixmapItem,
+                               QGraphicsScene)
 from PySide6.QtCore import Qt, QPointF
 from PySide6.QtGui import (QPen, QBrush, QColor, QFont, QTextCursor, 
                            QTextBlockFormat, QPixmap, QPainterPath, QPainterPathStroker)
+from bisect import bisect_left
 import re
 
 
@@ -16,6 +18,125 @@ def mm_to_px(mm):
 def px_to_mm(px):
     return (px * 25.4) / DPI
 
+# --- 0. Índice de Snap (guias e bordas de caixas) ---
+class _SortedAxis:
+    """Coordenadas ordenadas de um eixo + dono de cada uma (listas paralelas)."""
+    def __init__(self):
+        self.coords = []
+        self.owners = []
+
+    def add(self, coord, owner):
+        i = bisect_left(self.coords, coord)
+        self.coords.insert(i, coord)
+        self.owners.insert(i, owner)
+
+    def remove(self, coord, owner):
+        i = bisect_left(self.coords, coord)
+        while i < len(self.coords) and self.coords[i] == coord:
+            if self.owners[i] == owner:
+                del self.coords[i]
+                del self.owners[i]
+                return
+            i += 1
+
+    def nearest(self, value, max_dist, exclude=None):
+        """(distância, coordenada) mais próxima com distância < max_dist, ou None."""
+        coords, owners = self.coords, self.owners
+        best = None
+        i = bisect_left(coords, value)
+
+        # Anda para a direita e para a esquerda a partir do ponto de inserção,
+        # parando assim que a distância passa do melhor resultado.
+        j = i
+        while j < len(coords) and coords[j] - value < max_dist:
+            if owners[j] != exclude:
+                best, max_dist = (coords[j] - value, coords[j]), coords[j] - value
+                break
+            j += 1
+        j = i - 1
+        while j >= 0 and value - coords[j] < max_dist:
+            if owners[j] != exclude:
+                best = (value - coords[j], coords[j])
+                break
+            j -= 1
+        return best
+
+    def clear(self):
+        self.coords.clear()
+        self.owners.clear()
+
+
+class SnapIndex:
+    """
+    Índice ordenado das coordenadas de atração do editor.
+    - Guias verticais -> eixo X; guias horizontais -> eixo Y.
+    - Caixas (opcional, snap_to_boxes) -> bordas e centro em X e Y.
+    Consultas por bisseção: custo logarítmico no número de guias.
+    """
+    def __init__(self):
+        self.guides_x = _SortedAxis()
+        self.guides_y = _SortedAxis()
+        self.boxes_x = _SortedAxis()
+        self.boxes_y = _SortedAxis()
+        self.snap_to_boxes = False
+        self._entries = {}  # id(item) -> (eixo_x, xs, eixo_y, ys)
+
+    def update_item(self, item, xs=(), ys=(), is_box=False):
+        """(Re)registra as coordenadas do item."""
+        self.remove_item(item)
+        ax = self.boxes_x if is_box else self.guides_x
+        ay = self.boxes_y if is_box else self.guides_y
+        key = id(item)
+        for x in xs: ax.add(x, key)
+        for y in ys: ay.add(y, key)
+        self._entries[key] = (ax, tuple(xs), ay, tuple(ys))
+
+    def remove_item(self, item):
+        entry = self._entries.pop(id(item), None)
+        if entry:
+            ax, xs, ay, ys = entry
+            for x in xs: ax.remove(x, id(item))
+            for y in ys: ay.remove(y, id(item))
+
+    def snap(self, candidates, max_dist, vertical_axis: bool, exclude=None):
+        """
+        candidates: [(coordenada, offset), ...] (ex.: borda esq., centro, borda dir.)
+        Retorna a nova origem (coord_alvo - offset) do candidato mais próximo, ou None.
+        """
+        axes = [self.guides_x if vertical_axis else self.guides_y]
+        if self.snap_to_boxes:
+            axes.append(self.boxes_x if vertical_axis else self.boxes_y)
+
+        best = None
+        for (c, offset) in candidates:
+            for axis in axes:
+                hit = axis.nearest(c, max_dist, exclude=id(exclude) if exclude is not None else None)
+                if hit:
+                    max_dist = hit[0]
+                    best = hit[1] - offset
+        return best
+
+    def clear(self):
+        for axis in (self.guides_x, self.guides_y, self.boxes_x, self.boxes_y):
+            axis.clear()
+        self._entries.clear()
+
+
+class EditorScene(QGraphicsScene):
+    """QGraphicsScene com o índice de snap compartilhado pelos itens."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.snap_index = SnapIndex()
+
+    def clear(self):
+        super().clear()
+        self.snap_index.clear()
+
+
+def _snap_index_of(scene):
+    return getattr(scene, "snap_index", None)
+
+
 # --- 1. A Linha Guia Editável ---
 class Guideline(QGraphicsLineItem):
     def __init__(self, position_px, is_vertical=True):
@@ -97,7 +218,23 @@ class Guideline(QGraphicsLineItem):
 
         super().mouseDoubleClickEvent(event)
 
+    def _sync_snap_index(self):
+        index = _snap_index_of(self.scene())
+        if index is None: return
+        if self.is_vertical:
+            index.update_item(self, xs=(self.x(),))
+        else:
+            index.update_item(self, ys=(self.y(),))
+
     def itemChange(self, change, value):
+        # Mantém o índice de snap da cena em dia (entrada, saída e movimento)
+        if change == QGraphicsItem.GraphicsItemChange.ItemSceneChange:
+            index = _snap_index_of(self.scene())
+            if index is not None: index.remove_item(self)
+        elif change in (QGraphicsItem.GraphicsItemChange.ItemSceneHasChanged,
+                        QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged):
+            if self.scene(): self._sync_snap_index()
+
         if change == QGraphicsItem.GraphicsItemChange.ItemPositionChange and self.scene():
             new_pos = value
             rect = self.scene().sceneRect()
@@ -133,6 +270,12 @@ class Guideline(QGraphicsLineItem):
 class DesignerBox(QGraphicsRectItem):
     SNAP_DISTANCE = 15
 
+    # Canetas/pincéis pré-calculados (compartilhados por todas as caixas)
+    PEN_SELECTED = QPen(Qt.GlobalColor.blue, 2, Qt.PenStyle.DashLine)
+    BRUSH_SELECTED = QBrush(QColor(0, 100, 255, 30))
+    PEN_NORMAL = QPen(Qt.GlobalColor.gray, 1, Qt.PenStyle.DotLine)
+    BRUSH_NORMAL = QBrush(QColor(255, 255, 255, 10))
+
     def __init__(self, x=0, y=0, w=300, h=60, text="Placeholder"):
         super().__init__(0, 0, w, h)
         self.setPos(x, y)
@@ -143,8 +286,7 @@ class DesignerBox(QGraphicsRectItem):
             QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges
         )
         
-        self.setPen(QPen(Qt.GlobalColor.red, 2, Qt.PenStyle.DashLine))
-        self.setBrush(QBrush(QColor(255, 255, 255, 50)))
+        self._apply_selection_style(False)
         self.setZValue(100)
 
         # Estado interno
@@ -162,6 +304,21 @@ class DesignerBox(QGraphicsRectItem):
         # [NOVO] Define o ponto de rotação inicial
         self.update_center()
 
+    def setRect(self, *args):
+        super().setRect(*args)
+        self._sync_snap_index()
+
+    def _sync_snap_index(self):
+        """Registra bordas e centro da caixa no índice de snap (para snap entre caixas)."""
+        index = _snap_index_of(self.scene())
+        if index is None: return
+        r = self.rect()
+        x, y = self.x(), self.y()
+        index.update_item(self,
+                          xs=(x, x + r.width() / 2, x + r.width()),
+                          ys=(y, y + r.height() / 2, y + r.height()),
+                          is_box=True)
+
     def update_center(self):
         """Atualiza o ponto de pivô da rotação para o centro da caixa."""
         rect = self.rect()
@@ -209,6 +366,15 @@ class DesignerBox(QGraphicsRectItem):
         cursor.mergeBlockFormat(fmt)
 
     def itemChange(self, change, value):
+        if change == QGraphicsItem.GraphicsItemChange.ItemSelectedHasChanged:
+            self._apply_selection_style(self.isSelected())
+        elif change == QGraphicsItem.GraphicsItemChange.ItemSceneChange:
+            index = _snap_index_of(self.scene())
+            if index is not None: index.remove_item(self)
+        elif change in (QGraphicsItem.GraphicsItemChange.ItemSceneHasChanged,
+                        QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged):
+            if self.scene(): self._sync_snap_index()
+
         if change == QGraphicsItem.GraphicsItemChange.ItemPositionChange and self.scene():
             new_pos = value
             rect = self.rect()
@@ -218,8 +384,18 @@ class DesignerBox(QGraphicsRectItem):
             y_candidates = [(new_pos.y(), 0), (new_pos.y() + h/2, h/2), (new_pos.y() + h, h)]
             
             best_x, best_y = new_pos.x(), new_pos.y()
-            min_dist_x, min_dist_y = self.SNAP_DISTANCE, self.SNAP_DISTANCE
 
+            # [PERF] Busca por bisseção no índice ordenado da cena (sem varrer items())
+            index = _snap_index_of(self.scene())
+            if index is not None:
+                sx = index.snap(x_candidates, self.SNAP_DISTANCE, vertical_axis=True, exclude=self)
+                sy = index.snap(y_candidates, self.SNAP_DISTANCE, vertical_axis=False, exclude=self)
+                if sx is not None: best_x = sx
+                if sy is not None: best_y = sy
+                return QPointF(best_x, best_y)
+
+            # Fallback: cena sem índice (varredura linear)
+            min_dist_x, min_dist_y = self.SNAP_DISTANCE, self.SNAP_DISTANCE
             for item in self.scene().items():
                 if isinstance(item, Guideline):
                     if item.is_vertical:
@@ -235,14 +411,17 @@ class DesignerBox(QGraphicsRectItem):
             return QPointF(best_x, best_y)
         return super().itemChange(change, value)
 
-    def paint(self, painter, option, widget=None):
-        if self.isSelected():
-            self.setPen(QPen(Qt.GlobalColor.blue, 2, Qt.PenStyle.DashLine))
-            self.setBrush(QBrush(QColor(0, 100, 255, 30)))
+    def _apply_selection_style(self, selected: bool):
+        """
+        Troca caneta/pincel só quando a seleção muda.
+        (Antes isso era feito dentro do paint(), o que agendava um novo repaint a cada frame.)
+        """
+        if selected:
+            self.setPen(self.PEN_SELECTED)
+            self.setBrush(self.BRUSH_SELECTED)
         else:
-            self.setPen(QPen(Qt.GlobalColor.gray, 1, Qt.PenStyle.DotLine))
-            self.setBrush(QBrush(QColor(255, 255, 255, 10)))
-        super().paint(painter, option, widget)
+            self.setPen(self.PEN_NORMAL)
+            self.setBrush(self.BRUSH_NORMAL)
 
 
 
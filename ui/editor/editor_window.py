@@ -1,19 +1,20 @@
 # ui/editor/editor_window.py
 
-import json
-from PySide6.QtWidgets import (QMainWindow, QGraphicsView, QGraphicsScene, QWidget, 
+from PySide6.QtWidgets import (QMainWindow, QGraphicsView, QWidget, 
                                QHBoxLayout, QVBoxLayout, QFrame, QLabel, QPushButton, 
                                QMessageBox, QInputDialog, QListWidget, QAbstractItemView,
-                               QListWidgetItem)
+                               QListWidgetItem, QCheckBox, QGraphicsItem)
 from PySide6.QtGui import (QPainter, QBrush, QPen, QColor, QAction, QShortcut, 
                            QKeySequence, QTextCursor, QTextCharFormat)
-from PySide6.QtCore import Qt, Signal, QEvent
+from PySide6.QtCore import Qt, Signal, QEvent, QTimer
+from collections import Counter
 from pathlib import Path
-import shutil
 
 # Importa os módulos que acabamos de separar
-from .canvas_items import DesignerBox, Guideline, px_to_mm, SignatureItem
+from .canvas_items import DesignerBox, Guideline, px_to_mm, SignatureItem, EditorScene
 from .panels import CaixaDeTextoPanel, EditorDeTextoPanel, AssinaturaPanel
+from core.template_v4 import load_template
+from .save_worker import ModelSaveWorker
 
 
 class EditorWindow(QMainWindow):
@@ -48,7 +49,7 @@ class EditorWindow(QMainWindow):
 
         # --- 1. ÁREA DE DESENHO (CENA) ---
         # Tamanho fixo inicial de 1000x1000 (será dinâmico no futuro com a imagem de fundo)
-        self.scene = QGraphicsScene(0, 0, 1000, 1000)
+        self.scene = EditorScene(0, 0, 1000, 1000)
         
         self.view = QGraphicsView(self.scene)
         self.view.setRenderHint(QPainter.RenderHint.Antialiasing)
@@ -56,10 +57,15 @@ class EditorWindow(QMainWindow):
         self.view.setDragMode(QGraphicsView.DragMode.RubberBandDrag)
         # Captura teclas pressionadas quando o foco está na view (setas, delete)
         self.view.installEventFilter(self)
+        # Ctrl+roda do mouse = zoom (a roda chega no viewport, não na view)
+        self.view.viewport().installEventFilter(self)
         
         # Referências para o fundo (Imagem ou Fallback branco)
         self.bg_item = None  # Armazenará o QGraphicsPixmapItem da imagem
         self.background_path = None
+        self._bg_full = None   # Pixmap em resolução total
+        self._bg_proxy = None  # Pixmap reduzido (usado com zoom afastado)
+        self.performance_mode = True
         
         # Retângulo branco de fallback (mantém a área visível se não houver imagem)
         self.fallback_bg = self.scene.addRect(0, 0, 1000, 1000, QPen(Qt.PenStyle.NoPen), QBrush(Qt.GlobalColor.white))
@@ -95,6 +101,11 @@ class EditorWindow(QMainWindow):
         row_guides.addWidget(btn_guide_h)
         ly_guides.addLayout(row_guides)
 
+        # Snap opcional nas bordas/centros das outras caixas
+        self.chk_snap_boxes = QCheckBox("Atrair também às outras caixas")
+        self.chk_snap_boxes.toggled.connect(self._on_snap_boxes_toggled)
+        ly_guides.addWidget(self.chk_snap_boxes)
+
         right_layout.addWidget(grp_guides)
 
         # Separador
@@ -200,8 +211,15 @@ class EditorWindow(QMainWindow):
         self.assinatura_panel.sideChanged.connect(self.update_signature_size)
         right_layout.addWidget(self.assinatura_panel)
 
-        # Botão Salvar
+        # Modo desempenho (cache do fundo, proxy reduzido, updates mínimos)
         right_layout.addStretch()
+        self.chk_performance = QCheckBox("Modo desempenho (canvas grande)")
+        self.chk_performance.setToolTip("Usa cache e uma versão reduzida do fundo enquanto o zoom está afastado.")
+        self.chk_performance.setChecked(self.performance_mode)
+        self.chk_performance.toggled.connect(self.set_performance_mode)
+        right_layout.addWidget(self.chk_performance)
+
+        # Botão Salvar
         self.btn_save = QPushButton("Salvar Modelo (JSON)")
         self.btn_save.setMinimumHeight(50)
         self.btn_save.setStyleSheet("background-color: #27ae60; color: white; font-weight: bold; font-size: 14px;")
@@ -215,6 +233,22 @@ class EditorWindow(QMainWindow):
 
         self._updating_selection = False
 
+        # Salvamento assíncrono (ModelSaveWorker) e snapshot que aguarda a vez
+        self._save_worker = None
+        self._pending_save = None
+
+        # --- SINCRONIA INCREMENTAL (camadas / placeholders) ---
+        # Cada item guarda sua linha na lista de camadas e seus placeholders;
+        # a digitação só atualiza o item alterado, e com debounce.
+        self._layer_rows = {}                 # item -> QListWidgetItem
+        self._box_placeholders = {}           # DesignerBox -> set de placeholders
+        self._placeholder_counts = Counter()  # placeholder -> nº de caixas que o usam
+        self._pending_content_items = set()
+        self._content_sync_timer = QTimer(self)
+        self._content_sync_timer.setSingleShot(True)
+        self._content_sync_timer.setInterval(self.CONTENT_SYNC_DELAY_MS)
+        self._content_sync_timer.timeout.connect(self._flush_content_sync)
+
         # --- ATALHOS ---
         self.shortcut_dup = QShortcut(QKeySequence("Ctrl+J"), self)
         self.shortcut_dup.activated.connect(self.duplicate_selected)
@@ -222,6 +256,8 @@ class EditorWindow(QMainWindow):
         self.shortcut_save = QShortcut(QKeySequence("Ctrl+S"), self)
         self.shortcut_save.activated.connect(self.export_to_json)
 
+        self.set_performance_mode(self.performance_mode)
+
     def showEvent(self, event):
         super().showEvent(event)
         # Garante o fit ao exibir a janela pela primeira vez
@@ -236,11 +272,72 @@ class EditorWindow(QMainWindow):
             view_rect = self.scene.sceneRect().adjusted(-margin, -margin, margin, margin)
             
             self.view.fitInView(view_rect, Qt.AspectRatioMode.KeepAspectRatio)
+            self._apply_background_lod()
+
+    ZOOM_STEP = 1.25
+
+    def _zoom_by(self, factor: float):
+        """Zoom a partir do ponto sob o mouse; reavalia o fundo (proxy ou completo)."""
+        anchor = self.view.transformationAnchor()
+        self.view.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
+        self.view.scale(factor, factor)
+        self.view.setTransformationAnchor(anchor)
+        self._apply_background_lod()
+
+    # --- MODO DESEMPENHO ---
+    BG_PROXY_SCALE = 0.5  # Proxy com metade da resolução
+
+    def set_performance_mode(self, enabled: bool):
+        """
+        Liga/desliga as otimizações de desenho do canvas:
+        - cache do item de fundo em coordenadas de tela (DeviceCoordinateCache);
+        - fundo reduzido (proxy) enquanto o zoom estiver afastado.
+        O fundo do cartão é um QGraphicsPixmapItem, não o drawBackground da
+        cena, então o CacheBackground da view não teria efeito.
+        """
+        self.performance_mode = enabled
+        self._apply_background_lod()
+
+    def _apply_background_lod(self):
+        """Escolhe entre o fundo completo e o proxy conforme o zoom atual."""
+        if not self.bg_item or self._bg_full is None:
+            return
+
+        zoom = self.view.transform().m11()
+        use_proxy = self.performance_mode and zoom <= self.BG_PROXY_SCALE
+
+        if use_proxy:
+            if self._bg_proxy is None:
+                self._bg_proxy = self._bg_full.scaled(
+                    int(self._bg_full.width() * self.BG_PROXY_SCALE),
+                    int(self._bg_full.height() * self.BG_PROXY_SCALE),
+                    Qt.AspectRatioMode.IgnoreAspectRatio,
+                    Qt.TransformationMode.SmoothTransformation)
+            self.bg_item.setPixmap(self._bg_proxy)
+            self.bg_item.setScale(1 / self.BG_PROXY_SCALE)
+        else:
+            self.bg_item.setPixmap(self._bg_full)
+            self.bg_item.setScale(1)
+
+        self.bg_item.setCacheMode(
+            QGraphicsItem.CacheMode.DeviceCoordinateCache if self.performance_mode
+            else QGraphicsItem.CacheMode.NoCache)
     
     def sync_placeholders_list(self):
-        """Sincroniza a QListWidget com os itens da cena, preservando ordem manual."""
+        """
+        Sincronia completa da QListWidget com os itens da cena, preservando ordem manual.
+        Também reconstrói o índice de placeholders por caixa (usado na sincronia incremental).
+        """
+        self._box_placeholders.clear()
+        self._placeholder_counts.clear()
+        for item in self.scene.items():
+            if isinstance(item, DesignerBox):
+                found = set(item.get_placeholders())
+                self._box_placeholders[item] = found
+                self._placeholder_counts.update(found)
+
         # 1. O que existe na cena agora?
-        current_vars = set(self.get_all_model_placeholders())
+        current_vars = set(self._placeholder_counts)
 
         # 2. O que já está na lista visual?
         existing_items_map = {} # map: text -> row
@@ -258,34 +355,30 @@ class EditorWindow(QMainWindow):
         for var in sorted(list(current_vars)):
             if var not in existing_items_map:
                 self.lst_placeholders.addItem(var)
-    
-    def _import_asset(self, source_path: str, model_dir: Path) -> str | None:
-        """Copia o arquivo para a pasta assets/ do modelo e retorna caminho relativo."""
-        if not source_path: 
-            return None
-        
-        src = Path(source_path)
-        if not src.exists():
-            return None
-            
-        # Se já é relativo ou está dentro da pasta assets, assume que está ok
-        # (Isso evita copiar recursivamente se salvar múltiplas vezes)
-        if "assets" in src.parts and model_dir in src.parents:
-            return f"assets/{src.name}"
-
-        assets_dir = model_dir / "assets"
-        assets_dir.mkdir(parents=True, exist_ok=True)
-        
-        dest = assets_dir / src.name
-        
-        # Copia o arquivo (sobrescreve se existir para garantir atualização)
-        try:
-            shutil.copy2(src, dest)
-            return f"assets/{src.name}"
-        except Exception as e:
-            print(f"Erro ao copiar asset: {e}")
-            return source_path # Fallback para o original
-    
+
+    def _update_box_placeholders(self, box):
+        """Sincronia incremental: aplica à lista só a diferença de placeholders desta caixa."""
+        new = set(box.get_placeholders()) if box.scene() is self.scene else set()
+        old = self._box_placeholders.get(box, set())
+        if new == old:
+            return
+        if new:
+            self._box_placeholders[box] = new
+        else:
+            self._box_placeholders.pop(box, None)
+
+        for var in old - new:
+            self._placeholder_counts[var] -= 1
+            if self._placeholder_counts[var] <= 0:
+                del self._placeholder_counts[var]
+                for row in self.lst_placeholders.findItems(var, Qt.MatchFlag.MatchExactly):
+                    self.lst_placeholders.takeItem(self.lst_placeholders.row(row))
+
+        for var in sorted(new - old):
+            self._placeholder_counts[var] += 1
+            if self._placeholder_counts[var] == 1 and not self.lst_placeholders.findItems(var, Qt.MatchFlag.MatchExactly):
+                self.lst_placeholders.addItem(var)
+
     def _add_separator(self, layout):
         sep = QFrame()
         sep.setFrameShape(QFrame.Shape.HLine)
@@ -294,6 +387,11 @@ class EditorWindow(QMainWindow):
 
     # --- Lógica de Eventos (Filtro) ---
     def eventFilter(self, source, event):
+        if (source == self.view.viewport() and event.type() == QEvent.Type.Wheel
+                and event.modifiers() & Qt.KeyboardModifier.ControlModifier):
+            self._zoom_by(self.ZOOM_STEP if event.angleDelta().y() > 0 else 1 / self.ZOOM_STEP)
+            return True
+
         if source == self.view and event.type() == QEvent.Type.KeyPress:
             key = event.key()
             
@@ -302,8 +400,8 @@ class EditorWindow(QMainWindow):
                 selected = self.scene.selectedItems()
                 for item in selected: 
                     self.scene.removeItem(item)
+                    self._forget_item(item)
                 self.on_selection_changed()
-                self.sync_placeholders_list()
                 return True # Evento consumido
             
             # 2. Mover itens (Setas)
@@ -327,6 +425,9 @@ class EditorWindow(QMainWindow):
         
         return super().eventFilter(source, event)
 
+    def _on_snap_boxes_toggled(self, checked):
+        self.scene.snap_index.snap_to_boxes = checked
+
     def add_guide(self, vertical):
         # Calcula o centro exato do documento atual
         rect = self.scene.sceneRect()
@@ -534,6 +635,7 @@ class EditorWindow(QMainWindow):
         """
         Gera a estrutura de dados JSON unificada para o novo modelo V3.
         Salva: Background, Assinaturas e Caixas de Texto.
+        Aqui só tiramos o snapshot da cena; assets e gravação rodam no ModelSaveWorker.
         """
         boxes_data = []
         signatures_data = []
@@ -608,34 +710,64 @@ class EditorWindow(QMainWindow):
             self.setWindowTitle(f"Editor Visual de Modelo - {model_name}")
 
         slug = slugify_model_name(model_name)
-        model_dir = Path("models") / slug
-        model_dir.mkdir(parents=True, exist_ok=True)
-        
-        # --- Lógica de Assets (Portabilidade) ---
-        # 1. Processa Background
-        if self.background_path:
-            rel_bg = self._import_asset(self.background_path, model_dir)
-            data["background_path"] = rel_bg
-
-        # 2. Processa Assinaturas
-        for sig in data["signatures"]:
-            # O item guarda o path original em "path", precisamos atualizá-lo no JSON
-            rel_sig = self._import_asset(sig["path"], model_dir)
-            if rel_sig:
-                sig["path"] = rel_sig
-        # ----------------------------------------
-
-        file_path = model_dir / "template_v3.json"
-        
-        # 2. Salva o JSON
         data["name"] = model_name
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-            
+        self._start_save(data, Path("models") / slug)
+
+    def _start_save(self, data: dict, model_dir: Path):
+        """
+        Dispara o salvamento em background. Se já houver um em andamento,
+        guarda só o snapshot mais recente e salva quando o atual terminar.
+        """
+        if self._save_worker is not None and self._save_worker.isRunning():
+            self._pending_save = (data, model_dir)
+            return
+
+        self.statusBar().showMessage(f"Salvando '{data['name']}'...")
+        worker = ModelSaveWorker(data, model_dir)
+        worker.saved.connect(self._on_model_saved)
+        worker.error_occurred.connect(self._on_save_error)
+        worker.finished.connect(self._on_save_worker_finished)
+        self._save_worker = worker
+        worker.start()
+
+    def _on_model_saved(self, model_name, placeholders, file_path):
+        self.statusBar().showMessage(f"Modelo '{model_name}' salvo em {file_path}", 5000)
         # Avisa aos interessados: (Nome do Modelo, Variáveis)
-        self.modelSaved.emit(model_name, data["placeholders"])
-        
-        QMessageBox.information(self, "Sucesso", f"Modelo '{model_name}' salvo com sucesso em:\n{file_path}")
+        self.modelSaved.emit(model_name, placeholders)
+
+    def _on_save_error(self, msg):
+        self.statusBar().clearMessage()
+        QMessageBox.critical(self, "Erro ao salvar", f"Não foi possível salvar o modelo:\n{msg}")
+
+    def _on_save_worker_finished(self):
+        # finished é enfileirado: pode chegar de um worker que já foi substituído
+        if self.sender() is not self._save_worker:
+            return
+        self._save_worker = None
+        if self._pending_save:
+            data, model_dir = self._pending_save
+            self._pending_save = None
+            self._start_save(data, model_dir)
+
+    def wait_for_save(self):
+        """
+        Bloqueia até gravar o salvamento em andamento (e o pendente, se houver).
+        Só QThread.wait(): nenhum evento da interface é processado no meio
+        (fechar o editor/excluir o modelo não é reentrado). saved/error
+        chegam depois, pelo event loop.
+        """
+        while self._save_worker is not None:
+            self._save_worker.wait()
+            self._save_worker = None # o finished enfileirado deste worker é ignorado
+            if self._pending_save:
+                data, model_dir = self._pending_save
+                self._pending_save = None
+                self._start_save(data, model_dir)
+
+    def closeEvent(self, event):
+        # Não perde um salvamento em andamento ao fechar o editor
+        self.wait_for_save()
+        super().closeEvent(event)
 
     def update_signature_size(self, size):
         sel = self.scene.selectedItems()
@@ -653,6 +785,8 @@ class EditorWindow(QMainWindow):
             self.scene.removeItem(self.bg_item)
             
         self.background_path = path
+        self._bg_full = pixmap
+        self._bg_proxy = None
         self.bg_item = self.scene.addPixmap(pixmap)
         self.bg_item.setZValue(-95) # Acima do fallback, abaixo dos itens
         
@@ -691,24 +825,48 @@ class EditorWindow(QMainWindow):
                 placeholders.update(item.get_placeholders())
         return sorted(list(placeholders))
     
+    # Espera a digitação "parar" antes de sincronizar camadas/placeholders
+    CONTENT_SYNC_DELAY_MS = 150
+
     def _on_content_updated(self, html):
-        # Atualiza o texto na box (já existente)
-        self.update_text_html(html)
-        # Sincroniza lista visual
-        self.sync_placeholders_list()
-        self.refresh_layer_list()
+        # O texto da box já foi aplicado por update_text_html (mesmo sinal).
+        # Aqui só agenda a sincronia das listas para a caixa editada.
+        box = self._get_selected()
+        if box is None:
+            return
+        self._pending_content_items.add(box)
+        self._content_sync_timer.start()
+
+    def _flush_content_sync(self):
+        """Aplica as sincronias pendentes: só as linhas das caixas que mudaram."""
+        pending, self._pending_content_items = self._pending_content_items, set()
+        for box in pending:
+            if box.scene() is not self.scene:
+                continue
+            self._update_box_placeholders(box)
+            self._update_layer_row(box)
+
+    def _forget_item(self, item):
+        """Remove um item das listas (camada e placeholders) sem varrer a cena."""
+        self._pending_content_items.discard(item)
+        if isinstance(item, DesignerBox):
+            self._update_box_placeholders(item)
+        row = self._layer_rows.pop(item, None)
+        if row is not None:
+            self.layer_list.takeItem(self.layer_list.row(row))
 
     def load_from_json(self, file_path):
-        """Carrega um modelo V3 e reconstrói o canvas."""
-        import json
+        """Carrega um modelo (v3 ou v4) e reconstrói o canvas."""
         path = Path(file_path)
         if not path.exists():
             return
 
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        # HTML completo (igual ao toHtml original) para edição sem perdas
+        data = load_template(path, full_html=True)
 
         # 1. Limpa o canvas atual
+        self._content_sync_timer.stop()
+        self._pending_content_items.clear()
         self.scene.clear()
         self.background_path = None
         self.bg_item = None
@@ -722,11 +880,9 @@ class EditorWindow(QMainWindow):
         self.fallback_bg = self.scene.addRect(0, 0, canvas_w, canvas_h, QPen(Qt.PenStyle.NoPen), QBrush(Qt.GlobalColor.white))
         self.fallback_bg.setZValue(-100)
 
-        # 2. Restaura o Fundo
+        # 2. Restaura o Fundo (caminhos já resolvidos pelo load_template)
         if data.get("background_path"):
-            bg_path_raw = data["background_path"]
-            # Resolve caminho relativo vs absoluto
-            bg_path = path.parent / bg_path_raw if not Path(bg_path_raw).is_absolute() else Path(bg_path_raw)
+            bg_path = Path(data["background_path"])
             
             if bg_path.exists():
                 self.load_background_image(str(bg_path))
@@ -734,9 +890,7 @@ class EditorWindow(QMainWindow):
         # 3. Restaura as Assinaturas
         from .canvas_items import SignatureItem
         for sig_data in data.get("signatures", []):
-            raw_path = sig_data["path"]
-            # Resolve caminho relativo
-            sig_path = path.parent / raw_path if not Path(raw_path).is_absolute() else Path(raw_path)
+            sig_path = Path(sig_data["path"])
 
             if sig_path.exists():
                 sig = SignatureItem(str(sig_path))
@@ -780,20 +934,21 @@ class EditorWindow(QMainWindow):
             # Força a atualização da posição do texto dentro da caixa
             box.recalculate_text_position()
 
-            # 5. Restaura Ordem das Colunas (Placeholders)
-            saved_placeholders = data.get("placeholders", [])
-            self.lst_placeholders.clear()
-            # Primeiro adiciona na ordem salva
-            for p in saved_placeholders:
-                self.lst_placeholders.addItem(p)
-            # Depois roda o sync para garantir que nada faltou ou sobrou
-            self.sync_placeholders_list()
-            
             # Aplica recuo e entrelinha salvos
             box.set_block_format(
                 indent=b.get("indent_px", 0),
                 line_height=b.get("line_height", 1.15)
             )
+
+        # 5. Restaura Ordem das Colunas (Placeholders) - uma vez, após todas as caixas
+        saved_placeholders = data.get("placeholders", [])
+        self.lst_placeholders.clear()
+        # Primeiro adiciona na ordem salva
+        for p in saved_placeholders:
+            self.lst_placeholders.addItem(p)
+        # Depois roda o sync para garantir que nada faltou ou sobrou
+        self.sync_placeholders_list()
+
         # Ajusta o zoom ao terminar de carregar
         self._zoom_to_fit()
 
@@ -801,12 +956,13 @@ class EditorWindow(QMainWindow):
         self.refresh_layer_list()
 
     # --- SISTEMA DE CAMADAS (Helpers) ---
-    def _get_next_layer_id(self):
+    def _get_next_layer_id(self, used=None):
         """Retorna o menor ID (0-99) disponível na cena."""
-        used = set()
-        for item in self.scene.items():
-            if hasattr(item, 'layer_id') and item.layer_id is not None:
-                used.add(item.layer_id)
+        if used is None:
+            used = set()
+            for item in self.scene.items():
+                if hasattr(item, 'layer_id') and item.layer_id is not None:
+                    used.add(item.layer_id)
         for i in range(100):
             if i not in used: return i
         return 99
@@ -833,20 +989,27 @@ class EditorWindow(QMainWindow):
         return f"{prefix}_Objeto"
 
     def refresh_layer_list(self):
-        """Reconstroi a lista da esquerda (Unidirecional: Cena -> Lista)."""
+        """
+        Reconstroi a lista da esquerda (Unidirecional: Cena -> Lista).
+        Usado em mudanças estruturais (adicionar/duplicar/carregar); edição de
+        texto usa _update_layer_row, que só renomeia a linha do item.
+        """
         self.layer_list.clear()
+        self._layer_rows.clear()
         
         # Pega itens da cena
         items = self.scene.items()
         
         valid_items = []
+        used_ids = {i.layer_id for i in items if getattr(i, 'layer_id', None) is not None}
         for item in items:
             if isinstance(item, (DesignerBox, SignatureItem)) or item == self.bg_item:
                 valid_items.append(item)
                 
                 # Garante ID se não tiver
                 if not hasattr(item, 'layer_id') or item.layer_id is None:
-                    item.layer_id = self._get_next_layer_id()
+                    item.layer_id = self._get_next_layer_id(used_ids)
+                    used_ids.add(item.layer_id)
 
         # Adiciona na lista
         for item in valid_items:
@@ -855,6 +1018,17 @@ class EditorWindow(QMainWindow):
             # Guarda a referência do objeto real "escondida" no item da lista
             list_item.setData(Qt.ItemDataRole.UserRole, item)
             self.layer_list.addItem(list_item)
+            self._layer_rows[item] = list_item
+
+    def _update_layer_row(self, item):
+        """Atualiza só o nome da linha deste item (sem reconstruir a lista)."""
+        row = self._layer_rows.get(item)
+        if row is None:
+            self.refresh_layer_list()
+            return
+        name = self._generate_layer_name(item.layer_id, item)
+        if row.text() != name:
+            row.setText(name)
 
     def _on_layer_list_clicked(self, list_item):
         """
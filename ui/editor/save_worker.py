@@ -0,0 +1,45 @@
+# ui/editor/save_worker.py
+from PySide6.QtCore import QThread, Signal
+from pathlib import Path
+
+from core.assets import import_model_asset, build_render_assets
+from core.template_v4 import save_template
+
+
+class ModelSaveWorker(QThread):
+    """
+    Salva um modelo do editor fora da thread da interface.
+    Recebe um snapshot (dict) já extraído da cena e cuida do que é lento:
+    importar assets para o store (hash), gerar derivados e gravar o JSON.
+    """
+    # Emite: (nome_do_modelo, placeholders, caminho_do_json)
+    saved = Signal(str, list, str)
+    error_occurred = Signal(str)
+
+    def __init__(self, data, model_dir):
+        super().__init__()
+        self.data = data
+        self.model_dir = Path(model_dir)
+
+    def run(self):
+        try:
+            data = self.data
+            self.model_dir.mkdir(parents=True, exist_ok=True)
+
+            # 1. Background e assinaturas vão para o store (por hash)
+            if data.get("background_path"):
+                data["background_path"] = import_model_asset(data["background_path"], self.model_dir)
+            for sig in data["signatures"]:
+                rel_sig = import_model_asset(sig["path"], self.model_dir)
+                if rel_sig:
+                    sig["path"] = rel_sig
+
+            # 2. Derivados prontos para render (originais ficam para reedição)
+            build_render_assets(data, self.model_dir)
+
+            # 3. JSON compacto v4, escrita atômica
+            file_path = self.model_dir / "template_v3.json"
+            save_template(file_path, data)
+            self.saved.emit(data["name"], data["placeholders"], str(file_path))
+        except Exception as e:
+            self.error_occurred.emit(str(e))
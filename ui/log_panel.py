@@ -1,6 +1,10 @@
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QTextEdit
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QPlainTextEdit
 from PySide6.QtCore import Qt
 
+# O painel guarda só as últimas linhas (buffer circular); o log completo
+# do lote fica no lote.log da pasta de saída.
+MAX_LOG_LINES = 5000
+
 
 class LogPanel(QWidget):
     def __init__(self):
@@ -14,13 +18,14 @@ class LogPanel(QWidget):
         title.setStyleSheet("font-size: 14px; font-weight: 600;")
         layout.addWidget(title)
 
-        self.text = QTextEdit()
+        self.text = QPlainTextEdit()
         self.text.setReadOnly(True)
         self.text.setMinimumHeight(180)
+        self.text.setMaximumBlockCount(MAX_LOG_LINES)
         layout.addWidget(self.text, 1)
 
     def append(self, msg: str):
-        self.text.append(msg)
+        self.text.appendPlainText(msg)
 
     def clear(self):
         self.text.clear()
@@ -1,19 +1,40 @@
 # ui/naming_dialog.py
 from PySide6.QtWidgets import (QDialog, QVBoxLayout, QLabel, QLineEdit, 
                                QPushButton, QHBoxLayout, QFrame, QGridLayout, 
-                               QDialogButtonBox, QCheckBox, QGroupBox, QDoubleSpinBox)
+                               QDialogButtonBox, QCheckBox, QGroupBox, QDoubleSpinBox,
+                               QComboBox, QMessageBox, QSpinBox)
 from PySide6.QtCore import Qt
 
+from core.naming import OutputLayout
+
+# (rótulo, tipo do OutputLayout, valor sugerido)
+_LAYOUT_CHOICES = [
+    ("Pasta única", "", ""),
+    ("A cada N cartões", "count", "1000"),
+    ("Por coluna", "column", "{coluna}"),
+    ("Por hash do nome", "hash", "2"),
+]
+
+# (rótulo, formato do core/archive_sink.ArchiveSink)
+_ARCHIVE_CHOICES = [
+    ("Arquivos PNG", ""),
+    ("Pacote ZIP", "zip"),
+    ("Pacote TAR", "tar"),
+]
+
 class NamingDialog(QDialog):
     def __init__(self, parent, model_slug: str, available_vars: list[str], 
                  current_pattern: str = "", model_size_px: tuple[int, int] = (1000, 1000),
-                 current_imposition: dict = None):
+                 current_imposition: dict = None, current_layout: str = "",
+                 current_archive: dict = None):
         super().__init__(parent)
         self.setWindowTitle("Configurar Saída e Impressão")
         self.resize(500, 450) # Aumentei a altura para caber a nova seção
         
         self.model_slug = model_slug
         self.result_pattern = current_pattern
+        self.result_layout = current_layout or ""
+        current_archive = current_archive or {}
         self.model_w, self.model_h = model_size_px
         self.ratio = self.model_w / self.model_h if self.model_h > 0 else 1.0
         
@@ -73,6 +94,46 @@ class NamingDialog(QDialog):
                     row += 1
             layout.addLayout(grid_vars)
 
+        # Subpastas (modo direto), para lotes muito grandes
+        ly_layout = QHBoxLayout()
+        ly_layout.addWidget(QLabel("Subpastas:"))
+        self.cbo_layout = QComboBox()
+        for label, _, _ in _LAYOUT_CHOICES:
+            self.cbo_layout.addItem(label)
+        self.txt_layout_arg = QLineEdit()
+        self.txt_layout_arg.setToolTip("N de cartões por pasta, {coluna} (aceita {a}/{b}) ou nº de dígitos do hash")
+        ly_layout.addWidget(self.cbo_layout)
+        ly_layout.addWidget(self.txt_layout_arg)
+        layout.addLayout(ly_layout)
+
+        kind, _, arg = self.result_layout.partition(":")
+        kinds = [k for _, k, _ in _LAYOUT_CHOICES]
+        self.cbo_layout.setCurrentIndex(kinds.index(kind) if kind in kinds else 0)
+        self.txt_layout_arg.setText(arg)
+        self.txt_layout_arg.setEnabled(self.cbo_layout.currentIndex() > 0)
+        self.cbo_layout.currentIndexChanged.connect(self._on_layout_changed)
+
+        # Saída em pacote (ZIP/TAR), sem PNGs soltos
+        ly_archive = QHBoxLayout()
+        ly_archive.addWidget(QLabel("Saída:"))
+        self.cbo_archive = QComboBox()
+        for label, _ in _ARCHIVE_CHOICES:
+            self.cbo_archive.addItem(label)
+        formats = [f for _, f in _ARCHIVE_CHOICES]
+        fmt = current_archive.get("format", "")
+        self.cbo_archive.setCurrentIndex(formats.index(fmt) if fmt in formats else 0)
+        self.spin_split_mb = QSpinBox()
+        self.spin_split_mb.setRange(0, 100000)
+        self.spin_split_mb.setSuffix(" MB")
+        self.spin_split_mb.setSpecialValueText("Sem dividir")
+        self.spin_split_mb.setToolTip("Divide o pacote em partes de até N MB")
+        self.spin_split_mb.setValue(int(current_archive.get("split_mb", 0)))
+        self.spin_split_mb.setEnabled(self.cbo_archive.currentIndex() > 0)
+        self.cbo_archive.currentIndexChanged.connect(lambda i: self.spin_split_mb.setEnabled(i > 0))
+        ly_archive.addWidget(self.cbo_archive)
+        ly_archive.addWidget(self.spin_split_mb)
+        layout.addLayout(ly_archive)
+
         # Separador visual
         line = QFrame()
         line.setFrameShape(QFrame.Shape.HLine)
@@ -171,12 +232,36 @@ class NamingDialog(QDialog):
         self.txt_pattern.insert(f"{{{var_name}}}")
         self.txt_pattern.setFocus()
 
+    def _on_layout_changed(self, index):
+        _, _, default_arg = _LAYOUT_CHOICES[index]
+        self.txt_layout_arg.setEnabled(index > 0)
+        self.txt_layout_arg.setText(default_arg)
+
     def _on_accept(self):
+        _, kind, _ = _LAYOUT_CHOICES[self.cbo_layout.currentIndex()]
+        spec = f"{kind}:{self.txt_layout_arg.text().strip()}" if kind else ""
+        try:
+            OutputLayout(spec)
+        except ValueError as e:
+            QMessageBox.warning(self, "Subpastas", f"Configuração inválida:\n{e}")
+            return
         self.result_pattern = self.txt_pattern.text().strip()
+        self.result_layout = spec
         self.accept()
 
     def get_pattern(self):
         return self.result_pattern
+
+    def get_archive(self):
+        """{"format", "split_mb"} para core/archive_sink.py, ou None (PNGs soltos)."""
+        _, fmt = _ARCHIVE_CHOICES[self.cbo_archive.currentIndex()]
+        if not fmt:
+            return None
+        return {"format": fmt, "split_mb": self.spin_split_mb.value()}
+
+    def get_layout(self):
+        """Spec do core/naming.OutputLayout ("" = pasta única)."""
+        return self.result_layout
     
     def get_imposition_settings(self):
         """Retorna o dict configurado."""